@@ -1,12 +1,67 @@
 import sh  # to interact with the shell
 import re  # for regular expressions
-import requests  # to download JIRA Bug list
-import csv  # to save the results
-import time
+import asyncio  # to run the JIRA client
+import os
+import sys
+import argparse  # command line arguments
+import numpy as np  # types of the output columns
 from collections import Counter, defaultdict  # useful structures
+from bisect import bisect_right
+from datetime import datetime
+
+# the git helpers are shared with the scripts of the final report
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'report', 'Data collection'))
+from blame_cache import BlameCache
+from forward_blame import ForwardBlame
+from git_executor import GitTaskExecutor, default_jobs
+from git_backend import open_backend
+from jira_client import JiraClient
+from jira_cache import JiraCache, CachedJira
+from identities import AuthorTable, PathTable
+from rename_index import RenameIndex
+from columnar_output import ColumnarWriter, columnar_formats, \
+    default_format, extensions
+from ownership import Contributions, compute_ownership
+from szz import BugFixClassifier, read_removed_lines, bug_introducing_lines
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--jobs', type=int, default=default_jobs(),
+                    help='number of git tasks run in parallel '
+                         '(default: number of cores)')
+parser.add_argument('--jira-refresh', default='incremental',
+                    choices=['incremental', 'full', 'none'],
+                    help='how the cached JIRA responses are refreshed: only '
+                         'the issues updated since the last run (default), '
+                         'all of them, or none')
+parser.add_argument('--output-format', default='csv',
+                    choices=['csv', 'auto'] + columnar_formats,
+                    help='format of the results: CSV (default) or a typed '
+                         'columnar format (auto for Parquet if available, '
+                         'else compressed CSV)')
+args = parser.parse_args()
 
 git = sh.git.bake(_cwd='lucene-solr')
 
+# the changed files and the diffs of the commits are read through long-lived
+# git processes instead of starting a new "git show" for each of them
+backend = open_backend('lucene-solr')
+
+# every file is blamed both in the 1st and in the 3rd step, and at every run
+# of the script, so we keep the blame results in a cache on disk
+blame_cache = BlameCache('lucene-solr', 'blame_cache')
+
+# the per-file git tasks are run in parallel by this executor, and their
+# results are merged in the order of the tasks
+executor = GitTaskExecutor(args.jobs)
+
+# the paths and the authors are identified by integer ids in all the
+# structures below. the emails of the same developer are merged according
+# to the .mailmap of the repository and to the groups of aliases listed here
+author_aliases = []
+paths = PathTable()
+authors = AuthorTable(os.path.join('lucene-solr', '.mailmap'), author_aliases)
+
 # regex that matches path of Java files inside the core
 core_regex = r'^lucene\/core\/src\/java\/org\/apache\/lucene.*?\.java$'
 
@@ -30,7 +85,8 @@ log_output = str(git('--no-pager', 'log', '--name-only', after=start_date,
 
 splitted_output = (s.split('\n') for s in log_output.split('\n\n'))
 
-# this structure is used to store all the results of the analysis
+# this structure is used to store all the results of the analysis,
+# with a (commit_hash, path_id) pair as key
 struct = {}
 
 for commit_group in splitted_output:
@@ -48,9 +104,10 @@ for commit_group in splitted_output:
     changed_files = filter(lambda f: re.search(core_regex, f), changed_files)
 
     for file_path in changed_files:
-        struct[(commit_hash, file_path)] = {
+        struct[(commit_hash, paths.id(file_path))] = {
             'author_date': author_date,
             'author_email': author_email,
+            'author_id': authors.id(author_email),
             'bugs_info': {
                 'counters': defaultdict(int),
                 'lists': defaultdict(list)
@@ -58,64 +115,107 @@ for commit_group in splitted_output:
         }
 
 
-def computeMetrics(counter, commit_author):
+# names of the metrics computed from the contributors of a (commit, file)
+# pair, both for the line metrics and for the commit metrics
+metric_names = ['total_contributors',
+                'minor_contributors',
+                'major_contributors',
+                'ownership_best_contributor',
+                'commit_author_ratio',
+                'commit_author_is_best_contributor']
+
+
+def store_metrics(name, keys, contributions, commit_authors):
     """
     Used to compute commit/line metrics
 
-    First argument is the contributors counter that looks like this:
-    Counter({
-        'contributor_mail_1': contributed_lines_1/contributed_commits_1,
-        'contributor_mail_2': contributed_lines_2/contributed_commits_2,
-        ...
-    })
+    Computes at once the metrics of all the (commit_hash, path_id) keys,
+    given the Contributions with the contributors of each of them (the
+    number of lines/commits of each contributor id) and the author id of
+    each commit, and stores them in the struct with the given name
+    """
+    metrics = compute_ownership(contributions, commit_authors)
+    columns = [metrics[metric_name].tolist() for metric_name in metric_names]
+
+    for key, values in zip(keys, zip(*columns)):
+        key_metrics = dict(zip(metric_names, values))
+
+        # the ratio is 0 only if the author is not a contributor, and in
+        # that case it's always been written as an integer
+        if not key_metrics['commit_author_ratio']:
+            key_metrics['commit_author_ratio'] = 0
+
+        struct[key][name] = key_metrics
+
+# line contributors metrics computation.
+# instead of blaming each file from scratch at every commit, we walk the
+# history of each file forward only once, getting the blame at all the
+# commits that we need, and we keep the results in the blame cache
+
+
+def compute_line_metrics(file_path, commits):
+    """
+    Counts the lines of each contributor of the file at each of the given
+    (commit_hash, author_id) pairs, returning a list of
+    (commit_hash, contributor_ids, line_counts) tuples
     """
+    revisions = [commit_hash + '^1' for commit_hash, _ in commits]
 
-    total_contributors = len(counter)
-    total_value = sum(counter.values())
-
-    minor_contributors = sum(1 for contributor, value in counter.items()
-                             if value/total_value <= 0.05)
-    major_contributors = sum(1 for contributor, value in counter.items()
-                             if value/total_value > 0.05)
-
-    commit_author_ratio = \
-        counter[commit_author]/total_value if commit_author in counter else 0
-
-    max_value_contributor = max(counter.keys(), key=(lambda k: counter[k]))
-
-    ownership_best_contributor = counter[max_value_contributor] / total_value
-
-    commit_author_is_best_contributor = \
-        True if max_value_contributor == commit_author else False
-
-    return {
-        'total_contributors': total_contributors,
-        'minor_contributors': minor_contributors,
-        'major_contributors': major_contributors,
-        'ownership_best_contributor': ownership_best_contributor,
-        'commit_author_ratio': commit_author_ratio,
-        'commit_author_is_best_contributor': commit_author_is_best_contributor
-    }
-
-# line contributors metrics computation
-for ((commit_hash, file_path), info) in struct.items():
-    try:
-        blame_out = str(git('--no-pager', 'blame', file_path,
-                            commit_hash + '^1', '--line-porcelain'))
-    except sh.ErrorReturnCode_128:
-        # the file was not found at that specific commit, meaning that it still
-        # didn't exist. in this case we leave the line metrics empty
-        continue
-
-    # the output of git blame contains a contributors' email as many times as
-    # the number of lines that he has written, so we just search
-    # for all the emails in the output
-    line_contributors = re.findall(r'author-mail <(.+?)>', blame_out,
-                                   flags=re.M)
-    line_contributors_counter = Counter(line_contributors)
-
-    info['line_metrics'] = computeMetrics(line_contributors_counter,
-                                          info['author_email'])
+    if all(blame_cache.cached(revision, file_path) for revision in revisions):
+        forward_blame = None
+    else:
+        forward_blame = ForwardBlame(git, file_path, revisions)
+
+    results = []
+    for revision, (commit_hash, author_id) in zip(revisions, commits):
+        if forward_blame is None:
+            blame = blame_cache.blame(revision, file_path)
+        else:
+            blame = forward_blame.blame(revision)
+
+            # the file was not found at that specific commit, meaning that it
+            # still didn't exist. in this case we leave the line metrics empty
+            if blame is None:
+                continue
+
+            blame_cache.put(revision, file_path, blame)
+
+        # the blame contains a contributor as many times as the number of
+        # lines that he has written. the authors are interned in the blame,
+        # so we translate each of them to its author id only once.
+        # (this runs in a worker, so the ids of the authors never seen by
+        # the main process are only valid here. they are only compared with
+        # each other and with the id of the commit author, which was seen
+        # by the main process, so they are enough to compute the metrics)
+        blame_author_ids = [authors.id(email) for email in blame.authors]
+        line_contributors_counter = Counter(
+            blame_author_ids[blame_author_id]
+            for blame_author_id in blame.author_ids)
+
+        results.append((commit_hash,
+                        list(line_contributors_counter.keys()),
+                        list(line_contributors_counter.values())))
+
+    return results
+
+commits_of_file = defaultdict(list)
+for ((commit_hash, path_id), info) in struct.items():
+    commits_of_file[paths[path_id]].append((commit_hash, info['author_id']))
+
+# the contributors of all the (commit, file) pairs are collected, and their
+# metrics are computed all at once
+line_keys, line_authors = [], []
+line_contributions = Contributions()
+
+for (file_path, _), results in executor.map(compute_line_metrics,
+                                            commits_of_file.items()):
+    path_id = paths.get(file_path)
+    for commit_hash, contributor_ids, line_counts in results:
+        line_keys.append((commit_hash, path_id))
+        line_authors.append(struct[(commit_hash, path_id)]['author_id'])
+        line_contributions.add(contributor_ids, line_counts)
+
+store_metrics('line_metrics', line_keys, line_contributions, line_authors)
 
 #########################################
 # 2ND STEP ##############################
@@ -124,24 +224,77 @@ for ((commit_hash, file_path), info) in struct.items():
 # commit contributors metrics computation
 start_date = "2011-01-01 00:00"
 
-for ((commit_hash, file_path), info) in struct.items():
-    end_date = info['author_date']
-    contributors = str(git('--no-pager', 'log', '--after="%s"' % start_date,
-                           '--before=%s' % end_date, '--follow',
-                           '--pretty=%ae', '--', file_path))
-    # output of log will be the list of authors of each commit one per line
-
-    # if the file was created in the commit that we're analyzing, the output
-    # will be empty. in that case we leave the commit metrics empty
-    if not contributors:
-        continue
 
-    # last item is always an empty string
-    commit_contributors = contributors.split('\n')[:-1]
-    commit_contributors_counter = Counter(commit_contributors)
-
-    info['commit_metrics'] = computeMetrics(commit_contributors_counter,
-                                            info['author_email'])
+# instead of running "git log --follow" for every (commit, file) pair, the
+# commits that changed each file (following its renames) are taken from an
+# index of the whole history, built with a single "git log"
+rename_index = RenameIndex.from_repo('lucene-solr')
+
+start_timestamp = datetime.strptime(start_date, '%Y-%m-%d %H:%M').timestamp()
+
+# the commit metrics of a (commit, file) pair count the authors of the
+# commits made to the file from start_date to the author date of the commit,
+# which is a prefix of the time-ordered list of the commits made to the file
+# since start_date. so for each file we sort its commits once, and answer
+# all its queries in order of date, bisecting to the cutoff of each of them
+# and updating a running counter of the authors
+queries_of_file = defaultdict(list)
+for ((commit_hash, path_id), info) in struct.items():
+    end_timestamp = datetime.strptime(info['author_date'],
+                                      '%Y-%m-%d %H:%M:%S %z').timestamp()
+    queries_of_file[path_id].append((end_timestamp, commit_hash,
+                                     info['author_id']))
+
+commit_keys, commit_authors = [], []
+commit_contributions = Contributions()
+
+for path_id, queries in queries_of_file.items():
+    # (commit_time, author_id) of the commits made to the file since
+    # start_date, following its renames like "git log --follow", from the
+    # oldest to the newest (the log is from the newest to the oldest)
+    file_history = sorted(
+        ((commit_time, authors.id(author_email))
+         for _, author_email, commit_time
+         in reversed(rename_index.file_commits(paths[path_id]))
+         if commit_time >= start_timestamp),
+        key=lambda commit: commit[0])
+    commit_times = [commit_time for commit_time, _ in file_history]
+
+    contributors_counter = Counter()
+    # index in file_history of the last commit of each contributor
+    last_commits = {}
+    counted_commits = 0
+
+    for end_timestamp, commit_hash, author_id in sorted(queries):
+        cutoff = bisect_right(commit_times, end_timestamp)
+
+        for index in range(counted_commits, cutoff):
+            contributor_id = file_history[index][1]
+            contributors_counter[contributor_id] += 1
+            last_commits[contributor_id] = index
+
+        counted_commits = cutoff
+
+        # if the file was created in the commit that we're analyzing, there
+        # could be no commits. in that case we leave the commit metrics empty
+        if not contributors_counter:
+            continue
+
+        # the contributors are ordered from the one who committed last, as
+        # they appear in the log, so that the best contributor among the
+        # ones with the same number of commits is always the same
+        contributor_ids = sorted(contributors_counter,
+                                 key=last_commits.__getitem__, reverse=True)
+
+        commit_keys.append((commit_hash, path_id))
+        commit_authors.append(author_id)
+        commit_contributions.add(
+            contributor_ids,
+            [contributors_counter[contributor_id]
+             for contributor_id in contributor_ids])
+
+store_metrics('commit_metrics', commit_keys, commit_contributions,
+              commit_authors)
 
 #########################################
 # 3RD STEP ##############################
@@ -164,183 +317,139 @@ commits_3rd_step = ({'title': commit[52:],
 
 # we have to get from the Jira REST API the lists of issue IDs that
 # correspond to a bug. the API allows the retrieval of only 100
-# results at time, meaning we have to repeat the request multiple
-# times in order to get all the issue IDs
-jira_api_url = 'https://issues.apache.org/jira/rest/api/2/search'
-
-payload = {
-    'jql': 'project = LUCENE AND issuetype = Bug',
-    'fields': ['key']
-}
-first_results = requests.post(jira_api_url, json=payload).json()
-maxResults = first_results['maxResults']
-total = first_results['total']
-
-# we store in a list the issue IDs that correspond to a bug
-bugs_issue_ids = []
-
-for startAt in range(0, total, maxResults):
-    payload = {
-        'jql': 'project = LUCENE AND issuetype = Bug',
-        'fields': ['key'],
-        'startAt': startAt
-    }
-    results = requests.post(jira_api_url, json=payload).json()
-
-    for issue in results['issues']:
-        bugs_issue_ids.append(issue['key'])
-
-    time.sleep(5)  # in order not to trigger the rate limiter
-
-for commit in commits_3rd_step:
-    post_release_bugs, dev_time_bugs = 0, 0
-
-    # we look first for a Jira issue id in the commit message
-    jira_match = re.search(r'LUCENE-\d{1,4}', commit['title'])
-
-    if jira_match and jira_match.group() in bugs_issue_ids:
-        post_release_bugs = 1
-    else:
-        # if we didn't find an issue id in the message, we look for a keyword
-        keywords = ('error', 'bug', 'fix', 'issue', 'mistake', 'incorrect',
-                    'fault', 'defect', 'flaw', 'typo')
-
-        if any(keyword in commit['title'] for keyword in keywords):
-            dev_time_bugs = 1
-
+# results at time, so the client requests all the pages in parallel
+# (while respecting the rate limiter of JIRA).
+# the results are cached on disk, so after the first run only the issues
+# updated in the meantime are requested again
+
+
+async def search_bugs(jira_cache):
+    async with JiraClient() as jira_client:
+        jira = CachedJira(jira_client, jira_cache, args.jira_refresh)
+        return await jira.search('project = LUCENE AND issuetype = Bug',
+                                 fields=['key'])
+
+# we store in a set the issue IDs that correspond to a bug
+with JiraCache('jira_cache.sqlite') as jira_cache:
+    bugs_issue_ids = set(issue['key']
+                         for issue in asyncio.run(search_bugs(jira_cache)))
+
+# a commit fixed a post release bug if the first Jira issue id in its
+# message is a bug, otherwise it fixed a bug found during development if its
+# message contains a keyword (error, bug, fix, ...). all the commits are
+# classified with the same precompiled patterns
+classifier = BugFixClassifier(['LUCENE'], bugs_issue_ids)
+
+bugfix_commits = {}
+bug_introduction_tasks = []
+
+for commit, post_release_bugs, dev_time_bugs in classifier.fixes(
+        commits_3rd_step, key=lambda commit: commit['title']):
+    bugfix_commits[commit['hash']] = (commit, post_release_bugs,
+                                      dev_time_bugs)
+
+    # we are interested only in Java files in the core.
+    # theoretically, a bug introduced in one of the Java core files
+    # could have been "propagated" outside of the core directory, for
+    # example if the buggy file was moved. we assume this is not the case
+    # to reduce the complexity of the analysis.
+    for file_path in backend.changed_files(commit['hash']):
+        if re.search(core_regex, file_path):
+            bug_introduction_tasks.append((commit['hash'], file_path))
+
+
+# after getting the list of files changed by the bugfix commits we need to
+# know for each file which lines were removed, since we assume that those
+# lines contained the bug. the ranges of the removed lines are read from the
+# diffs of all the bugfix commits at once, with a single git process.
+# (the pairs with no removed lines are not in the result)
+removed_lines = read_removed_lines('lucene-solr', bug_introduction_tasks,
+                                   'lucene/core/src/java')
+
+
+def get_bug_introductions(bugfix_commit_hash, file_path, line_ranges):
+    """
+    Returns the set of the (commit_hash, file_path) pairs that introduced
+    the given ranges of lines removed from the file by the bugfix commit
+    """
+    # we blame only the removed lines to understand from where each line
+    # comes from. (if the whole file was already blamed in the 1st step or
+    # in a previous run, the lines are taken from the cache)
+    # we assume that a (commit, filepath) pair can be the cause of
+    # just one bug in a file, hence we put the pairs in a set.
+    return set((line.commit, line.filename)
+               for line in bug_introducing_lines(blame_cache,
+                                                 bugfix_commit_hash,
+                                                 file_path, line_ranges))
+
+# the removed lines of all the (bugfix commit, file) pairs are blamed in
+# parallel, and the results are merged in the order of the commits
+blame_tasks = ((bugfix_commit_hash, file_path,
+                removed_lines[(bugfix_commit_hash, file_path)])
+               for bugfix_commit_hash, file_path in bug_introduction_tasks
+               if (bugfix_commit_hash, file_path) in removed_lines)
+
+for (bugfix_commit_hash, _, _), bug_introductions in executor.map(
+        get_bug_introductions, blame_tasks):
+    commit, post_release_bugs, dev_time_bugs = \
+        bugfix_commits[bugfix_commit_hash]
     bugs_induced_qty = dev_time_bugs + post_release_bugs
 
-    if bugs_induced_qty > 0:
-        # if the commit was a bugfix, we get the list of files that it changed
-        changed_files = str(git('--no-pager', 'show', '--name-only',
-                                '--pretty=', commit['hash'])).split('\n')[:-1]
-        # output is list of changed files one per line
-
-        # we are interested only in Java files in the core.
-        # theoretically, a bug introduced in one of the Java core files
-        # could have been "propagated" outside of the core directory, for
-        # example if the buggy file was moved. we assume this is not the case
-        # to reduce the complexity of the analysis.
-        changed_files = filter(lambda f: re.search(core_regex, f),
-                               changed_files)
-
-        for file_path in changed_files:
-            # after getting the list of files changed by the "bugfix" commit
-            # we need to know for each file which lines were removed,
-            # since we assume that those lines contained the bug
-            raw_show_output = str(git('--no-pager', 'show', '--no-color',
-                                      '--format=', '--unified=0',
-                                      commit['hash'], '--', file_path))
-
-            # the output of git show contains the removed line groups
-            # each one in the following format:
-            # @@ -X,Y +Z,W @@
-            # ..content of removed lines..
-            # where X is the start line of the removed group
-            # and Y is the number of lines removed.
-            # if Y = 0 no lines were removed.
-            # if Y is not present it means 1 line was removed.
-
-            # this regex matches the removed lines ranges
-            removed_linenumbers_regex = \
-                r'^@@ -(\d+)(?:,(\d+))? \+\d+(?:,\d+)? @@'
-
-            removed_lines_matches = re.finditer(removed_linenumbers_regex,
-                                                raw_show_output, flags=re.M)
-
-            # for convenience we add to a list the ranges of removed lines
-            removed_lines_ranges = []
-            for match in removed_lines_matches:
-                _start_line, _n_lines = match.groups()
-                start_line = int(_start_line)
-                n_lines = int(_n_lines) if _n_lines is not None else 1
-
-                if n_lines != 0:
-                    end_line_included = start_line + n_lines - 1
-
-                    removed_lines_ranges.append((start_line,
-                                                 end_line_included))
-
-            # if no line was removed from the file we are analyzing, we skip
-            # to the next file
-            if not removed_lines_ranges:
-                continue
-
-            # now that we know the ranges of removed lines, we blame the file
-            # to understand from where each line comes from
-            blame_out = str(git('--no-pager', 'blame', '--line-porcelain',
-                                commit['hash'] + '^1', '--', file_path))
-
-            # this regex matches the (commit, filepath) pair of each line
-            # where 'commit' is the commit hash in which the line was
-            # introduced and filepath is the original path of the file
-            commit_and_filename_regex = \
-                r'^([0-9a-f]{40}) \d+ (\d+)(?: \d+)?(?:\n.*?)+?filename (.+?)$'
-
-            commit_filename_matches = re.finditer(commit_and_filename_regex,
-                                                  blame_out, flags=re.M)
+    # (the paths never seen in the 1st step have no id, and
+    # are not in the results anyway)
+    for commit_hash, file_path in bug_introductions:
+        commit_file_pair = (commit_hash, paths.get(file_path))
 
-            # we assume that a (commit, filepath) pair can be the cause of
-            # just one bug in a file, hence we put the pairs in a set
-            buggy_commit_file_pairs = set()
-            for match in commit_filename_matches:
-                commit_hash, _line_n, file_path = match.groups()
-                line_n = int(_line_n)
+        if commit_file_pair in struct:
+            bugs_info = struct[commit_file_pair]['bugs_info']
 
-                # we iterate over all the lines of the file and add to the set
-                # only the ones that were removed
-                if any(start_line <= line_n <= end_line
-                       for start_line, end_line in removed_lines_ranges):
-                    buggy_commit_file_pairs.add((commit_hash, file_path))
-
-            for commit_file_pair in buggy_commit_file_pairs:
-                if commit_file_pair in struct:
-                    bugs_info = struct[commit_file_pair]['bugs_info']
-
-                    bugs_counters = bugs_info['counters']
-                    bugs_lists = bugs_info['lists']
+            bugs_counters = bugs_info['counters']
+            bugs_lists = bugs_info['lists']
 
-                    bugs_counters['dev_time_bugs'] += dev_time_bugs
-                    bugs_counters['post_release_bugs'] += post_release_bugs
-                    bugs_counters['bugs_induced_qty'] += bugs_induced_qty
+            bugs_counters['dev_time_bugs'] += dev_time_bugs
+            bugs_counters['post_release_bugs'] += post_release_bugs
+            bugs_counters['bugs_induced_qty'] += bugs_induced_qty
 
-                    bugs_lists['fix_commits_hashes'].append(commit['hash'])
-                    bugs_lists['fix_commits_tstamps'].append(commit['tstamp'])
+            bugs_lists['fix_commits_hashes'].append(commit['hash'])
+            bugs_lists['fix_commits_tstamps'].append(commit['tstamp'])
 
 #########################################
 # 4TH STEP ##############################
 #########################################
 
-with open('assignment2.csv', 'w', newline='') as csvfile:
-    fieldnames = ['commit_hash',
-                  'file_name',
-                  'directory_name',
-                  'commit_author',
-                  'timestamp',
-                  'line_contributors_total',
-                  'line_contributors_minor',
-                  'line_contributors_major',
-                  'line_contributors_ownership',
-                  'line_contributors_author',
-                  'line_contributors_author_owner',
-                  'commit_contributors_total',
-                  'commit_contributors_minor',
-                  'commit_contributors_major',
-                  'commit_contributors_ownership',
-                  'commit_contributors_author',
-                  'commit_contributors_author_owner',
-                  'bugs_induced_qty',
-                  'post_release_bugs',
-                  'dev_time_bugs',
-                  'fix_commits_hash',
-                  'fix_commits_timestamp']
-
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames, delimiter=',')
-
-    writer.writeheader()
-
-    for ((commit_hash, file_path), info) in struct.items():
-        splitted_filepath = file_path.split('/')
+# the results are written streaming, as a CSV file or as a typed columnar
+# file (see --output-format), where the missing values are left empty
+output_format = args.output_format
+if output_format == 'auto':
+    output_format = default_format()
+
+fields = [('commit_hash', str),
+          ('file_name', str),
+          ('directory_name', str),
+          ('commit_author', str),
+          ('timestamp', str),
+          ('line_contributors_total', np.int32),
+          ('line_contributors_minor', np.int32),
+          ('line_contributors_major', np.int32),
+          ('line_contributors_ownership', np.float64),
+          ('line_contributors_author', np.float64),
+          ('line_contributors_author_owner', np.bool_),
+          ('commit_contributors_total', np.int32),
+          ('commit_contributors_minor', np.int32),
+          ('commit_contributors_major', np.int32),
+          ('commit_contributors_ownership', np.float64),
+          ('commit_contributors_author', np.float64),
+          ('commit_contributors_author_owner', np.bool_),
+          ('bugs_induced_qty', np.int32),
+          ('post_release_bugs', np.int32),
+          ('dev_time_bugs', np.int32),
+          ('fix_commits_hash', str),
+          ('fix_commits_timestamp', str)]
+
+with ColumnarWriter('assignment2' + extensions[output_format], fields,
+                    output_format) as writer:
+    for ((commit_hash, path_id), info) in struct.items():
+        splitted_filepath = paths[path_id].split('/')
         file_name = splitted_filepath[-1]
         directory_name = '/'.join(splitted_filepath[:-1])
 
@@ -359,9 +468,9 @@ with open('assignment2.csv', 'w', newline='') as csvfile:
             line_contributors_author_owner = \
                 line_metrics['commit_author_is_best_contributor']
         else:
-            line_contributors_total, line_contributors_minor = '', ''
-            line_contributors_major, line_contributors_ownership = '', ''
-            line_contributors_author, line_contributors_author_owner = '', ''
+            line_contributors_total = line_contributors_minor = None
+            line_contributors_major = line_contributors_ownership = None
+            line_contributors_author = line_contributors_author_owner = None
 
         if 'commit_metrics' in info:
             commit_metrics = info['commit_metrics']
@@ -375,10 +484,10 @@ with open('assignment2.csv', 'w', newline='') as csvfile:
             commit_contributors_author_owner = \
                 commit_metrics['commit_author_is_best_contributor']
         else:
-            commit_contributors_total, commit_contributors_minor = '', ''
-            commit_contributors_major, commit_contributors_ownership = '', ''
-            commit_contributors_author = ''
-            commit_contributors_author_owner = ''
+            commit_contributors_total = commit_contributors_minor = None
+            commit_contributors_major = commit_contributors_ownership = None
+            commit_contributors_author = None
+            commit_contributors_author_owner = None
 
         bugs_info = info['bugs_info']
 
@@ -395,10 +504,10 @@ with open('assignment2.csv', 'w', newline='') as csvfile:
                 '|'.join(bugs_lists['fix_commits_tstamps'])
         else:
             bugs_induced_qty = 0
-            post_release_bugs, dev_time_bugs = '', ''
-            fix_commits_hash, fix_commits_timestamp = '', ''
+            post_release_bugs = dev_time_bugs = None
+            fix_commits_hash = fix_commits_timestamp = None
 
-        writer.writerow({
+        writer.write_row({
             'commit_hash': commit_hash,
             'file_name': file_name,
             'directory_name': directory_name,
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+"""
+Runs Project_Analysis.py on all the projects of a manifest, a JSON file
+like:
+
+    {"projects": [{"name": "hadoop",
+                   "repo": "repos/hadoop",
+                   "release_tags": ["release-2.4.1", "release-2.5.0"],
+                   "jira_keys": ["HADOOP", "HDFS"]}]}
+
+where the paths of the repositories are relative to the manifest.
+
+Each project is analyzed by its own process in output_dir/<name>, which
+contains its CSV files, its log, its checkpoints and its caches. With
+another output format the results of all the projects are written to a
+single dataset in output_dir/dataset instead of the CSV files. The
+projects are run in parallel within a budget of CPUs, and all of them
+share the same JIRA rate limit. The failure of a project doesn't stop the
+others, and the status of all the projects is kept up to date in
+output_dir/status.csv and output_dir/status.json.
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from git_executor import default_jobs
+from columnar_output import columnar_formats
+
+parser = argparse.ArgumentParser()
+parser.add_argument('manifest', help='JSON file with the projects to analyze')
+parser.add_argument('--output-dir', default='batch_output',
+                    help='directory of the outputs (default: batch_output)')
+parser.add_argument('--cpus', type=int, default=default_jobs(),
+                    help='CPUs used by all the projects together '
+                         '(default: number of cores)')
+parser.add_argument('--jobs-per-project', type=int, default=4,
+                    help='git tasks run in parallel by each project '
+                         '(default: 4)')
+parser.add_argument('--resume', action='store_true',
+                    help='resume the projects from their checkpoints')
+parser.add_argument('--jira-refresh', default='incremental',
+                    choices=['incremental', 'full', 'none'],
+                    help='how the cached JIRA responses are refreshed')
+parser.add_argument('--output-format', default='csv',
+                    choices=['csv', 'auto'] + columnar_formats,
+                    help='format of the results: CSV files in the directory '
+                         'of each project (default), or a single dataset in '
+                         'output_dir/dataset partitioned by project and '
+                         'release')
+args = parser.parse_args()
+
+analysis_script = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               'Project_Analysis.py')
+output_dir = os.path.abspath(args.output_dir)
+# State of the JIRA rate limit shared by all the projects
+jira_rate_file = os.path.join(output_dir, 'jira_rate')
+# Dataset with the results of all the projects, if not in CSV files
+dataset_dir = os.path.join(output_dir, 'dataset')
+
+jobs = max(1, min(args.jobs_per_project, args.cpus))
+parallel_projects = max(1, args.cpus // jobs)
+
+with open(args.manifest) as manifest_file:
+    projects = json.load(manifest_file)['projects']
+
+manifest_dir = os.path.dirname(os.path.abspath(args.manifest))
+
+# The names are used for the output directories, so they must be unique
+names = [project.get('name') for project in projects]
+if None in names or len(set(names)) != len(names):
+    sys.exit("Each project of the manifest must have a unique name")
+
+os.makedirs(output_dir, exist_ok=True)
+
+
+statuses = [{'name': name, 'status': 'pending'} for name in names]
+# The statuses are updated by the threads that run the projects
+statuses_lock = threading.Lock()
+
+
+def write_summary():
+    """
+    Writes the status of all the projects in CSV and JSON format
+    """
+    fieldnames = ['name', 'status', 'returncode', 'duration_seconds',
+                  'output_dir', 'error']
+
+    for extension in ('csv', 'json'):
+        path = os.path.join(output_dir, 'status.{}'.format(extension))
+        tmp_path = path + '.tmp'
+
+        with open(tmp_path, 'w', newline='') as summary:
+            if extension == 'json':
+                json.dump(statuses, summary, indent=2)
+            else:
+                writer = csv.DictWriter(summary, fieldnames=fieldnames,
+                                        restval='')
+                writer.writeheader()
+                writer.writerows(statuses)
+
+        os.replace(tmp_path, path)
+
+
+def update_status(index, status):
+    with statuses_lock:
+        statuses[index] = status
+        write_summary()
+
+
+def run_project(index, project):
+    """
+    Runs the analysis of a project and returns its status
+    """
+    project_dir = os.path.join(output_dir, project['name'])
+    status = {'name': project['name'], 'output_dir': project_dir}
+    start_time = time.time()
+
+    update_status(index, dict(status, status='running'))
+
+    try:
+        os.makedirs(project_dir, exist_ok=True)
+
+        project_config = {
+            'name': project['name'],
+            'repo': os.path.join(manifest_dir, project['repo']),
+            'release_tags': project['release_tags'],
+            'jira_keys': project['jira_keys']
+        }
+        with open(os.path.join(project_dir, 'project.json'), 'w') as f:
+            json.dump(project_config, f, indent=2)
+
+        command = [sys.executable, analysis_script, 'analysis.log',
+                   '--project', 'project.json',
+                   '--jobs', str(jobs),
+                   '--jira-rate-file', jira_rate_file,
+                   '--jira-refresh', args.jira_refresh,
+                   '--output-format', args.output_format,
+                   '--dataset-dir', dataset_dir]
+        if args.resume:
+            command.append('--resume')
+
+        # The output of the script is kept together with its log
+        with open(os.path.join(project_dir, 'output.txt'), 'w') as output:
+            returncode = subprocess.call(command, cwd=project_dir,
+                                         stdout=output,
+                                         stderr=subprocess.STDOUT)
+
+        status['returncode'] = returncode
+        status['status'] = 'completed' if returncode == 0 else 'failed'
+        if returncode != 0:
+            status['error'] = 'see {}'.format(
+                os.path.join(project_dir, 'output.txt'))
+    except (OSError, KeyError, TypeError) as e:
+        status['status'] = 'failed'
+        status['error'] = repr(e)
+
+    status['duration_seconds'] = round(time.time() - start_time, 1)
+    update_status(index, status)
+
+    return status
+
+
+write_summary()
+
+print("Analyzing {} projects, {} at a time with {} jobs each".format(
+    len(projects), parallel_projects, jobs))
+
+with ThreadPoolExecutor(max_workers=parallel_projects) as pool:
+    futures = [pool.submit(run_project, index, project)
+               for index, project in enumerate(projects)]
+
+    for future in as_completed(futures):
+        status = future.result()
+
+        print("Project {} {} in {} seconds".format(
+            status['name'], status['status'], status['duration_seconds']))
+
+n_failed = sum(1 for status in statuses if status['status'] != 'completed')
+print("{} projects completed, {} failed".format(
+    len(statuses) - n_failed, n_failed))
+
+sys.exit(1 if n_failed else 0)
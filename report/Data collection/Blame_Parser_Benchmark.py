@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+
+"""
+Micro-benchmark of the parsing of "git blame --line-porcelain" outputs:
+the regular expressions that were used by Project_Analysis.py against
+the streaming parser of blame_cache.py.
+
+By default a synthetic blame output is generated, otherwise the blame
+of a real file can be used with --repo, --revision and --file. In that
+case git blame is also run, to compare the whole process: reading the
+output with sh and matching the regular expressions against parsing it
+while it is read from the pipe.
+"""
+
+import io
+import re
+import sh
+import time
+import random
+import argparse
+import subprocess
+from datetime import datetime, timezone
+from blame_cache import parse_line_porcelain, stream_line_porcelain, \
+    chunk_size
+
+# Patterns previously used to parse the blame output, in the bug
+# introduction and in the OWN/MINOR computation respectively
+line_tstamp_file_pattern = re.compile(
+    r'^([0-9a-f]{40}) \d+ (\d+)(?: \d+)?(?:\n.*?)+'
+    r'author-time (\d+)(?:\n.*?)+'
+    r'filename (.+?)$',
+    flags=re.M)
+author_email_pattern = re.compile(r'author-mail <(.+?)>\nauthor-time (\d+)',
+                                  flags=re.M)
+
+
+def synthetic_blame_output(n_lines, n_commits, seed=0):
+    """
+    Returns a --line-porcelain output of a file with n_lines lines
+    introduced by n_commits different commits, as bytes
+    """
+    rnd = random.Random(seed)
+    n_authors = n_commits // 4 + 1
+    commits = [('{:040x}'.format(rnd.getrandbits(160)),
+                'author{}@example.com'.format(rnd.randrange(n_authors)),
+                1300000000 + rnd.randrange(10 ** 8))
+               for _ in range(n_commits)]
+
+    blocks = []
+    for line_number in range(1, n_lines + 1):
+        commit, email, timestamp = rnd.choice(commits)
+        blocks.append(
+            '{commit} {line} {line}\n'
+            'author Author\n'
+            'author-mail <{email}>\n'
+            'author-time {timestamp}\n'
+            'author-tz +0000\n'
+            'committer Author\n'
+            'committer-mail <{email}>\n'
+            'committer-time {timestamp}\n'
+            'committer-tz +0000\n'
+            'summary Change number {line}\n'
+            'filename src/main/java/org/example/Example.java\n'
+            '\t    int value{line} = compute({line});\n'.format(
+                commit=commit, line=line_number, email=email,
+                timestamp=timestamp))
+
+    return ''.join(blocks).encode('utf-8')
+
+
+def chunks(raw_blame_output):
+    """
+    Yields the output in chunks, as they are read from the git process
+    """
+    stream = io.BytesIO(raw_blame_output)
+    return iter(lambda: stream.read(chunk_size), b'')
+
+
+def regex_bug_introduction(raw_blame_output):
+    blame_out = raw_blame_output.decode('utf-8')
+    return [(commit, int(line_number),
+             datetime.fromtimestamp(int(timestamp), timezone.utc), filename)
+            for commit, line_number, timestamp, filename
+            in (match.groups()
+                for match in line_tstamp_file_pattern.finditer(blame_out))]
+
+
+def regex_own_minor(raw_blame_output, start_date):
+    blame_out = raw_blame_output.decode('utf-8')
+    line_contributors = []
+    for match in author_email_pattern.finditer(blame_out):
+        author_email, timestamp = match.groups()
+        if datetime.fromtimestamp(int(timestamp), timezone.utc) > start_date:
+            line_contributors.append(author_email)
+    return line_contributors
+
+
+def streaming_bug_introduction(raw_blame_output):
+    return [(commit, line_number, author_time, filename)
+            for commit, line_number, _, author_time, filename
+            in parse_line_porcelain(chunks(raw_blame_output))]
+
+
+def streaming_own_minor(raw_blame_output, start_date):
+    start_timestamp = start_date.timestamp()
+    return [author_email
+            for _, _, author_email, author_time, _
+            in parse_line_porcelain(chunks(raw_blame_output))
+            if author_time > start_timestamp]
+
+
+def best_time(function, repeat, *args):
+    """
+    Returns the best time in seconds of repeat calls of the function
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--lines', type=int, default=200000,
+                    help='lines of the synthetic file (default: 200000)')
+parser.add_argument('--commits', type=int, default=500,
+                    help='commits of the synthetic file (default: 500)')
+parser.add_argument('--repo', help='repository of a real file to blame')
+parser.add_argument('--revision', default='HEAD')
+parser.add_argument('--file', help='path of the real file to blame')
+parser.add_argument('--repeat', type=int, default=3)
+args = parser.parse_args()
+
+if args.repo:
+    raw_blame_output = subprocess.check_output(
+        ('git', '--no-pager', 'blame', '--line-porcelain', args.revision,
+         '--', args.file), cwd=args.repo)
+else:
+    raw_blame_output = synthetic_blame_output(args.lines, args.commits)
+
+start_date = datetime(2015, 1, 1, tzinfo=timezone.utc)
+n_lines = raw_blame_output.count(b'\n\t')
+
+print("Blame output of {} lines ({:.1f} MB)".format(
+    n_lines, len(raw_blame_output) / 1024 ** 2))
+
+# Both parsers must agree before being compared
+assert [(commit, int(line_number), int(timestamp.timestamp()), filename)
+        for commit, line_number, timestamp, filename
+        in regex_bug_introduction(raw_blame_output)] == \
+    streaming_bug_introduction(raw_blame_output)
+assert regex_own_minor(raw_blame_output, start_date) == \
+    streaming_own_minor(raw_blame_output, start_date)
+
+for name, regex_function, streaming_function, extra_args in [
+        ('bug introduction', regex_bug_introduction,
+         streaming_bug_introduction, ()),
+        ('OWN/MINOR', regex_own_minor, streaming_own_minor, (start_date,))]:
+    regex_time = best_time(regex_function, args.repeat,
+                           raw_blame_output, *extra_args)
+    streaming_time = best_time(streaming_function, args.repeat,
+                               raw_blame_output, *extra_args)
+
+    print("{:<18} regex {:8.3f}s  streaming {:8.3f}s  speedup {:.2f}x".format(
+        name, regex_time, streaming_time, regex_time / streaming_time))
+
+if args.repo:
+    git = sh.git.bake(_cwd=args.repo)
+    blame_args = (args.revision, '--', args.file)
+
+    def regex_end_to_end():
+        raw_blame_output = str(git('--no-pager', 'blame', '--line-porcelain',
+                                   *blame_args)).encode('utf-8')
+        regex_bug_introduction(raw_blame_output)
+
+    def streaming_end_to_end():
+        list(stream_line_porcelain(args.repo, *blame_args))
+
+    regex_time = best_time(regex_end_to_end, args.repeat)
+    streaming_time = best_time(streaming_end_to_end, args.repeat)
+
+    print("{:<18} regex {:8.3f}s  streaming {:8.3f}s  speedup {:.2f}x".format(
+        'git blame + parse', regex_time, streaming_time,
+        regex_time / streaming_time))
@@ -1,30 +1,73 @@
 #!/usr/bin/env python3
 
-import requests
-import sys
+"""
+Computes the Gini index of the contributions of the contributors of each
+project of a CSV file exported from GHTorrent, whose contributors are
+retrieved from the GitHub API:
+
+    Gini_Computation.py GHTorrent_Results.csv Gini_Indexes.csv
+
+The projects are requested concurrently, sharing a pool of connections
+and the rate limit of GitHub (the token can be given with --token or with
+the GITHUB_TOKEN environment variable). The responses are cached in
+github_cache.sqlite (see github_cache), shared with Gini_Index_Plot.py, so
+running the script again only revalidates them.
+
+With --repos-dir the contributions are instead the commits of each author
+in the local clone of each project (repos_dir/<name>), counted with a
+single "git log", so no network is needed. The commits can be limited to
+a period with --since and --until, and the emails of the same developer
+can be merged according to the .mailmap of the repository with --mailmap.
+"""
+
+import os
 import csv
-import re
-import numpy as np
-
-
-def gini_index(array):
-    """
-    Calculate the Gini coefficient of a numpy array
-    """
-    array = array.flatten()
-    if np.amin(array) < 0:
-        array -= np.amin(array)  # values cannot be negative
-    array += 0.0000001  # values cannot be 0
-    array = np.sort(array)  # values must be sorted
-    index = np.arange(1, array.shape[0]+1)  # index per array element
-    n = array.shape[0]  # number of array elements
-    return ((np.sum((2 * index - n - 1) * array)) / (n * np.sum(array)))
-
-input_file = sys.argv[1]
+import asyncio
+import argparse
+import subprocess
+from github_client import GitHubClient, GitHubError
+from github_cache import GitHubCache
+from git_executor import GitTaskExecutor, default_jobs
+from git_history import count_author_commits
+from identities import AuthorTable
+from inequality import gini_indexes, concatenate
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('input_file', help='CSV file with the projects')
+parser.add_argument('output_file', help='CSV file of the results')
+parser.add_argument('--token', default=os.environ.get('GITHUB_TOKEN'),
+                    help='GitHub token (default: $GITHUB_TOKEN)')
+parser.add_argument('--concurrency', type=int, default=8,
+                    help='requests made at the same time (default: 8)')
+parser.add_argument('--base-url', default='https://api.github.com',
+                    help='URL of the GitHub API, e.g. of a stub server')
+parser.add_argument('--cache', default='github_cache.sqlite',
+                    help='SQLite database of the cached GitHub responses '
+                         '(default: github_cache.sqlite)')
+parser.add_argument('--no-cache', action='store_true',
+                    help="don't cache the GitHub responses")
+parser.add_argument('--repos-dir',
+                    help='directory with the local clones of the projects, '
+                         'used instead of the GitHub API')
+parser.add_argument('--since',
+                    help='count only the commits made since this date '
+                         '(with --repos-dir)')
+parser.add_argument('--until',
+                    help='count only the commits made until this date '
+                         '(with --repos-dir)')
+parser.add_argument('--mailmap', action='store_true',
+                    help='merge the emails of the same developer according '
+                         'to the .mailmap of the repository (with '
+                         '--repos-dir)')
+parser.add_argument('--jobs', type=int, default=default_jobs(),
+                    help='number of git processes run in parallel '
+                         '(default: number of cores)')
+args = parser.parse_args()
 
 # Store all the projects read from the CSV file in a list
 projects = []
-with open(input_file, newline='') as csvfile:
+with open(args.input_file, newline='') as csvfile:
     reader = csv.reader(csvfile, delimiter=',', quotechar='"')
 
     # Skip the first line with the header
@@ -34,59 +77,100 @@ with open(input_file, newline='') as csvfile:
         # Save the url of the repo and the name in the list
         projects.append((row[1], row[3]))
 
-result = []
-
-# Iterate over all the projects and calculate the Gini coefficient
-# for each of them, storing the results in the result list
-for project_tuple in projects:
-    project_url, project_name = project_tuple
-
-    base_url = project_url + '/contributors'
-
-    # Make request to the Github API
-    r = requests.get(
-        base_url,
-        auth=('joined','7fb42c90a8b83b773082e1a337fec4555f65c893'))
-
-    contributors = []
-
-    # If the project doesn't exist skip to the next one
-    if r.status_code != 200:
-        result.append({'project_name': project_name})
-        continue
 
-    cur_contributors = r.json()
+async def retrieve_contributions():
+    """
+    Returns the list of the contributions of each contributor of each
+    project (None if the project doesn't exist or has no contributors),
+    in the same order of the projects
+    """
+    cache = None if args.no_cache else GitHubCache(args.cache)
 
-    # If the response was empty for some reason skip to the next project
-    if not cur_contributors:
-        result.append({'project_name': project_name})
-        continue
+    try:
+        async with GitHubClient(args.token, args.base_url,
+                                concurrency=args.concurrency,
+                                cache=cache) as github:
+            return await asyncio.gather(
+                *(project_contributions(github, project_url, project_name)
+                  for project_url, project_name in projects))
+    finally:
+        if cache:
+            cache.close()
 
-    # Store the number of contributions of each contributor in a list
-    contributors = []
 
-    for contributor in r.json():
-        contributors.append(contributor['contributions'])
+async def project_contributions(github, project_url, project_name):
+    """
+    Returns the list of the contributions of each contributor of the
+    project, or None if it can't be retrieved
+    """
+    # The URL is the one of the repo in the API, e.g.
+    # https://api.github.com/repos/apache/lucene-solr
+    repo = project_url.split('/repos/', 1)[1]
 
-    # If there are more contributors to be downloaded, do it
-    if 'Link' in r.headers:
-        # Find first and last page of the results
-        matches = re.findall(r'<.+?page=(\d+)>', r.headers['Link'])
+    try:
+        return await github.contributions(repo)
+    except GitHubError as e:
+        print("Skipping project {}: {}".format(project_name, e))
+        return None
 
-        next_page, last_page = (int(p) for p in matches)
 
-        # For each results page add the contributions to the list
-        for page in range(next_page, last_page + 1):
-            url = base_url + '?page={}'.format(page)
-            r = requests.get(
-                url,
-                auth=('joined', '7fb42c90a8b83b773082e1a337fec4555f65c893'))
+def local_contributions(project_name):
+    """
+    Returns the list of the number of commits of each author of the local
+    clone of the project, from the one with the most commits like in the
+    GitHub API, or None if there's no clone or no commit
+    """
+    repo_path = os.path.join(args.repos_dir, project_name)
+
+    if not os.path.isdir(repo_path):
+        print("Skipping project {}: no clone in {}".format(project_name,
+                                                          repo_path))
+        return None
+
+    authors = AuthorTable(os.path.join(repo_path, '.mailmap')
+                          if args.mailmap else None)
+
+    log_args = []
+    if args.since:
+        log_args.append('--since={}'.format(args.since))
+    if args.until:
+        log_args.append('--until={}'.format(args.until))
+
+    try:
+        commits = count_author_commits(repo_path, authors, *log_args)
+    except subprocess.CalledProcessError as e:
+        # e.g. a repository without commits
+        print("Skipping project {}: {}".format(project_name, e))
+        return None
+
+    return sorted(commits.values(), reverse=True)
+
+
+if args.repos_dir:
+    # The log of each clone is read by its own worker process
+    with GitTaskExecutor(args.jobs) as executor:
+        all_contributions = [
+            contributions for _, contributions in executor.map(
+                local_contributions,
+                ((project_name,) for _, project_name in projects))]
+else:
+    all_contributions = asyncio.run(retrieve_contributions())
+
+# Compute the Gini indexes of all the projects at once, from the
+# contributions of all of them in a single array
+gini_coeffs = gini_indexes(*concatenate(
+    contributors or [] for contributors in all_contributions))
 
-            for contributor in r.json():
-                contributors.append(contributor['contributions'])
+result = []
 
-    # Compute the Gini index from the array with contributions
-    gini_coeff = gini_index(np.array(contributors, dtype='float64'))
+# Store the results of each of the projects in the result list
+for (_, project_name), contributors, gini_coeff in zip(
+        projects, all_contributions, gini_coeffs.tolist()):
+    # If the project doesn't exist, or the response was empty for some
+    # reason, skip to the next one
+    if not contributors:
+        result.append({'project_name': project_name})
+        continue
 
     # Store the result in the result list
     result.append({
@@ -96,10 +180,8 @@ for project_tuple in projects:
         'n_contributors': len(contributors)
     })
 
-output_file = sys.argv[2]
-
 # Save the results to the CSV output file
-with open(output_file, 'w', newline='') as csvfile:
+with open(args.output_file, 'w', newline='') as csvfile:
     fieldnames = [
         'project_name',
         'gini_index',
@@ -1,28 +1,21 @@
 #!/usr/bin/env python3
 
-import requests
-import re
-import numpy as np
-import random
+import os
+import asyncio
 import matplotlib as mpl
 mpl.use('pgf')
 
 import matplotlib.pyplot as plt
 import matplotlib.lines as mlines
+from inequality import gini_index
+from github_client import GitHubClient, GitHubError
+from github_cache import GitHubCache
 
+# SQLite database of the cached GitHub responses, shared with
+# Gini_Computation.py, so the contributors of the projects already
+# retrieved by it are only revalidated
+github_cache_file = 'github_cache.sqlite'
 
-def gini_index(array):
-    """
-    Calculate the Gini coefficient of a numpy array.
-    """
-    array = array.flatten()
-    if np.amin(array) < 0:
-        array -= np.amin(array)  # values cannot be negative
-    array += 0.0000001  # values cannot be 0
-    array = np.sort(array)  # values must be sorted
-    index = np.arange(1, array.shape[0]+1)  # index per array element
-    n = array.shape[0]  # number of array elements
-    return ((np.sum((2 * index - n - 1) * array)) / (n * np.sum(array)))
 
 # List of projects of which we want to draw the plot
 # The first element of the tuple is used to indicate wheter a project has
@@ -36,29 +29,50 @@ projects = [
     ('o', 'https://api.github.com/repos/apache/camel', '#E8A952', 'Camel'),
 ]
 
-for project_tuple in projects:
-    marker, url, color, name = project_tuple
 
-    base_url = url + '/contributors'
+async def retrieve_contributions():
+    """
+    Returns the list of the number of contributions of each contributor
+    of each of the projects (None if the project doesn't exist, has no
+    contributors or can't be retrieved), in the same order of the projects
+    """
+    with GitHubCache(github_cache_file) as cache:
+        async with GitHubClient(os.environ.get('GITHUB_TOKEN'),
+                                cache=cache) as github:
+            return await asyncio.gather(
+                *(project_contributions(github, url, name)
+                  for _, url, _, name in projects))
+
 
-    r = requests.get(
-        base_url, auth=('joined', '7fb42c90a8b83b773082e1a337fec4555f65c893'))
+async def project_contributions(github, url, name):
+    """
+    Returns the list of the contributions of each contributor of the
+    project, or None (telling why the project is skipped) if there is none
+    """
+    try:
+        contributors = await github.contributions(url.split('/repos/', 1)[1])
+    except GitHubError as e:
+        print("Skipping project {}: {}".format(name, e))
+        return None
 
-    # Store in a list the number of contributions of each contributor
-    contributors = [contributor['contributions'] for contributor in r.json()]
+    if contributors is None:
+        print("Skipping project {}: not found or no contributors".format(
+            name))
+    return contributors
 
-    # If there are more contributors to retrieve, do it
-    if 'Link' in r.headers:
-        matches = re.findall(r'<.+?page=(\d+)>', r.headers['Link'])
 
-        next_page, last_page = (int(p) for p in matches)
+# Projects drawn in the plot
+plotted_projects = []
+
+for project_tuple, contributors in zip(projects,
+                                       asyncio.run(retrieve_contributions())):
+    marker, url, color, name = project_tuple
 
-        for page in range(next_page, last_page + 1):
-            url = base_url + '?page={}'.format(page)
-            r = requests.get(
-                url, auth=('joined', '7fb42c90a8b83b773082e1a337fec4555f65c893'))
+    if contributors is None:
+        continue
 
-            contributors.extend([contributor['contributions'] for contributor in r.json()])
+    plotted_projects.append(project_tuple)
+    print('{}: Gini index {:.4f}'.format(name, gini_index(contributors)))
 
     # Normalize each number of contributions by the total number of contributions
     contributors = [contributions / sum(contributors) for contributions in contributors]
@@ -68,7 +82,7 @@ for project_tuple in projects:
 plt.ylabel('Number of contributions, normalized')
 plt.xlabel('Contributors, ordered by n. of contributions')
 plt.legend(handles=[mlines.Line2D([], [], marker=marker, color=color, linewidth=2.0, label=name)
-                    for marker, _, color, name in projects])
+                    for marker, _, color, name in plotted_projects])
 plt.xlim(0, 55)
 plt.ylim(0, 0.22)
 plt.savefig('figure.pgf')
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+"""
+Micro-benchmark of the ownership metrics: the computeMetrics function
+that was used by assignment2.py, called on a Counter for each file,
+against compute_ownership of ownership.py, called once on the
+contributions of all the files.
+
+The contributions are synthetic, with a skewed number of contributors
+per file and of lines per contributor, and many ties between the best
+contributors, so that both the results and the tie-breaks are checked.
+"""
+
+import time
+import random
+import argparse
+from collections import Counter
+from ownership import Contributions, compute_ownership
+
+
+def computeMetrics(counter, commit_author):
+    """
+    Per-file computation previously used by assignment2.py
+    """
+    total_contributors = len(counter)
+    total_value = sum(counter.values())
+
+    minor_contributors = sum(1 for contributor, value in counter.items()
+                             if value/total_value <= 0.05)
+    major_contributors = sum(1 for contributor, value in counter.items()
+                             if value/total_value > 0.05)
+
+    commit_author_ratio = \
+        counter[commit_author]/total_value if commit_author in counter else 0
+
+    max_value_contributor = max(counter.keys(), key=(lambda k: counter[k]))
+
+    ownership_best_contributor = counter[max_value_contributor] / total_value
+
+    commit_author_is_best_contributor = \
+        True if max_value_contributor == commit_author else False
+
+    return {
+        'total_contributors': total_contributors,
+        'minor_contributors': minor_contributors,
+        'major_contributors': major_contributors,
+        'ownership_best_contributor': ownership_best_contributor,
+        'commit_author_ratio': commit_author_ratio,
+        'commit_author_is_best_contributor': commit_author_is_best_contributor
+    }
+
+
+def synthetic_counters(n_files, n_authors, seed=0):
+    """
+    Returns a list of (Counter, commit_author) pairs, one for each file
+    """
+    rnd = random.Random(seed)
+    files = []
+
+    for _ in range(n_files):
+        n_contributors = min(n_authors, 1 + int(rnd.expovariate(1 / 4)))
+        contributors = rnd.sample(range(n_authors), n_contributors)
+        counter = Counter({author: 1 + int(rnd.expovariate(1 / 30)) // 5 * 5
+                           for author in contributors})
+
+        # The author of the commit is often, but not always, a contributor
+        commit_author = rnd.choice(contributors) if rnd.random() < 0.8 \
+            else rnd.randrange(n_authors)
+
+        files.append((counter, commit_author))
+
+    return files
+
+
+def per_file(files):
+    return [computeMetrics(counter, commit_author)
+            for counter, commit_author in files]
+
+
+def batch(files):
+    contributions = Contributions.from_counters(
+        counter for counter, _ in files)
+    return compute_ownership(contributions,
+                             [commit_author for _, commit_author in files])
+
+
+def best_time(function, repeat, *args):
+    """
+    Returns the best time in seconds of repeat calls of the function
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--files', type=int, default=100000,
+                    help='number of files (default: 100000)')
+parser.add_argument('--authors', type=int, default=300,
+                    help='number of distinct authors (default: 300)')
+parser.add_argument('--repeat', type=int, default=3)
+args = parser.parse_args()
+
+files = synthetic_counters(args.files, args.authors)
+
+print("{} files with {} contributors in total".format(
+    len(files), sum(len(counter) for counter, _ in files)))
+
+# Both must give exactly the same results before being compared
+expected = per_file(files)
+metrics = {name: values.tolist() for name, values in batch(files).items()}
+
+for index, file_metrics in enumerate(expected):
+    for name, value in file_metrics.items():
+        assert metrics[name][index] == value, (index, name)
+
+per_file_time = best_time(per_file, args.repeat, files)
+
+# The construction of the contributions from the Counters is timed too
+batch_time = best_time(batch, args.repeat, files)
+
+contributions = Contributions.from_counters(counter for counter, _ in files)
+commit_authors = [commit_author for _, commit_author in files]
+compute_time = best_time(compute_ownership, args.repeat, contributions,
+                         commit_authors)
+
+print("per file {:8.3f}s  batch {:8.3f}s  speedup {:.2f}x".format(
+    per_file_time, batch_time, per_file_time / batch_time))
+print("batch without building the contributions {:8.3f}s  "
+      "speedup {:.2f}x".format(compute_time, per_file_time / compute_time))
@@ -1,21 +1,64 @@
 #!/usr/bin/env python3
 
+import os
 import sh  # to interact with the shell
-import re  # for regular expressions
-import requests  # to download JIRA Bug list
-import csv  # to save the results
-import time # to sleep
-import sys # command line arguments
+import json  # to read the project configuration
+import asyncio # to run the JIRA client
+import argparse # command line arguments
 import logging # logging status to log file
 from collections import defaultdict, Counter
 from datetime import datetime, timezone
-
-if len(sys.argv) < 2:
-    print("Usage: ./script.py logfile")
-    sys.exit(1)
+from git_history import compute_ddev, compute_release_changes, \
+    resolve_commit
+from blame_cache import BlameCache
+from forward_blame import ForwardBlame
+from git_executor import GitTaskExecutor, default_jobs
+from git_backend import open_backend
+from release_index import ReleaseIndex
+from rename_index import RenameIndex
+from szz import read_removed_lines, bug_introducing_lines
+from release_metrics import ReleaseMetrics, output_fields
+from columnar_output import ColumnarWriter, columnar_formats, \
+    default_format, partition_path
+from identities import AuthorTable
+from ownership import Contributions, compute_ownership
+from jira_client import JiraClient, SharedTokenBucket
+from jira_cache import JiraCache, CachedJira
+from checkpoint import Checkpoints
+
+parser = argparse.ArgumentParser()
+parser.add_argument('logfile', help='file used to log the execution progress')
+parser.add_argument('--jobs', type=int, default=default_jobs(),
+                    help='number of git tasks run in parallel '
+                         '(default: number of cores)')
+parser.add_argument('--jira-refresh', default='incremental',
+                    choices=['incremental', 'full', 'none'],
+                    help='how the cached JIRA responses are refreshed: only '
+                         'the issues updated since the last run (default), '
+                         'all of them, or none')
+parser.add_argument('--resume', action='store_true',
+                    help='resume the previous run of the analysis from its '
+                         'checkpoints, if the configuration is unchanged')
+parser.add_argument('--project',
+                    help='JSON file with the configuration of the project '
+                         '(name, repo, release_tags and jira_keys), used '
+                         'instead of the one below')
+parser.add_argument('--jira-rate-file',
+                    help='file holding the JIRA rate limit shared with '
+                         'other running analyses')
+parser.add_argument('--output-format', default='csv',
+                    choices=['csv', 'auto'] + columnar_formats,
+                    help='format of the results: a CSV file for each '
+                         'release (default), or a dataset partitioned by '
+                         'project and release in the given format (auto '
+                         'for Parquet if available, else compressed CSV)')
+parser.add_argument('--dataset-dir', default='dataset',
+                    help='directory of the dataset, shared by all the '
+                         'projects (default: dataset)')
+args = parser.parse_args()
 
 # We use a logfile to store the execution progress
-logging.basicConfig(filename=sys.argv[1], level=logging.INFO)
+logging.basicConfig(filename=args.logfile, level=logging.INFO)
 info = logging.info
 
 ###############################################################################
@@ -49,18 +92,79 @@ jira_keys = [
 # END PER-PROJECT CONFIGURATION ###############################################
 ###############################################################################
 
+# The per-project configuration can also be read from a JSON file, e.g.
+# written by Batch_Analysis.py for each project of its manifest. The name of
+# the project is used for the output files and defaults to the repository
+if args.project:
+    with open(args.project) as project_file:
+        project = json.load(project_file)
+
+    repo_name = project['repo']
+    release_tags = project['release_tags']
+    jira_keys = project['jira_keys']
+    project_name = project.get('name',
+                               os.path.basename(os.path.normpath(repo_name)))
+else:
+    project_name = repo_name
+
 ###############################################################################
 # START GLOBAL CONFIGURATION ##################################################
 ###############################################################################
-jira_pause_seconds = 2
-time_format_git = "%Y-%m-%d %H:%M:%S %z"
+# Limits of the requests made to JIRA: the average number of requests
+# per second and the number of requests in flight at the same time
+jira_requests_per_second = 5
+jira_concurrency = 8
+# SQLite database where the JIRA responses are cached between runs
+jira_cache_file = 'jira_cache.sqlite'
 time_format_jira = "%Y-%m-%dT%H:%M:%S.%f%z"
 compute_bug_info = True
+# Backend used to read tags, trees and diffs without starting a new git
+# process for each of them: 'cat-file' (persistent git processes) or
+# 'pygit2' (in-process, requires the pygit2 library)
+git_backend = 'cat-file'
+# Directory and maximum size of the on-disk cache of git blame results,
+# shared between runs of the script
+blame_cache_dir = 'blame_cache'
+blame_cache_max_bytes = 2 * 1024 ** 3
+# Directory where the checkpoints of the stages of the analysis are stored,
+# and version of their content, to be increased when a stage changes
+checkpoint_dir = 'checkpoints'
+checkpoint_version = 4
+# Groups of emails of the same developers (e.g. [['jdoe@apache.org',
+# 'john@example.com']]), merged together with the ones mapped by the
+# .mailmap of the repository when counting the distinct developers
+author_aliases = []
 ###############################################################################
 # END GLOBAL CONFIGURATION ####################################################
 ###############################################################################
 
 git = sh.git.bake(_cwd=repo_name)
+backend = open_backend(repo_name, git_backend)
+
+# Every git blame goes through the cache, so that files already blamed
+# in a previous run are not blamed again
+blame_cache = BlameCache(repo_name, blame_cache_dir, blame_cache_max_bytes)
+
+# The per-file git tasks are run in parallel by this executor. Since
+# the results are merged following the order of the tasks, the output
+# doesn't depend on the number of jobs
+executor = GitTaskExecutor(args.jobs)
+
+# The authors are counted by their integer id, where the emails of the
+# same developer have the same id
+authors = AuthorTable(os.path.join(repo_name, '.mailmap'), author_aliases)
+
+# Each stage of the analysis is stored in a checkpoint once completed, so
+# that an interrupted run can be resumed with --resume. The checkpoints are
+# discarded if the configuration of the project changes
+checkpoints = Checkpoints(os.path.join(checkpoint_dir, project_name),
+                          {'version': checkpoint_version,
+                           'repo_name': repo_name,
+                           'release_tags': release_tags,
+                           'jira_keys': jira_keys,
+                           'compute_bug_info': compute_bug_info,
+                           'author_aliases': author_aliases},
+                          resume=args.resume)
 
 ###############################################################################
 # 1ST STEP: ###################################################################
@@ -74,63 +178,61 @@ def get_tag_date_time(tag):
     Used to get the timestamp corresponding
     to a tag
     """
-    raw_datetime = str(git('--no-pager', 'log', '-1', '--format=%ai',
-                           'tags/{}'.format(tag)))[:-1]
+    return backend.tag_date(tag)
+
 
-    return datetime.strptime(raw_datetime, time_format_git)
+if checkpoints.has('releases'):
+    print("Loading releases from the checkpoint")
+    d = checkpoints.load('releases')
+else:
+    # Main data structure of the script
+    d = {}
 
+    print("Populating initial data structure")
 
-# Main data structure of the script
-d = {}
+    # Populate initial data structure with the start, end date and next
+    # release date of each release and the list of files present at the
+    # time of release.
+    for index, release_tag in enumerate(release_tags):
+        # Skip first release because we don't know when it started
+        if index == 0:
+            continue
 
-print("Populating initial data structure")
+        start_date = get_tag_date_time(release_tags[index-1])
+        end_date = get_tag_date_time(release_tag)
 
-# Populate initial data structure with the start, end date and next release date
-# of each release and the list of files present at the time of release.
-for index, release_tag in enumerate(release_tags):
-    # Skip first release because we don't know when it started
-    if index == 0:
-        continue
+        # For the latest release we set the time of next release to the current
+        # date time
+        if index == len(release_tags) - 1:
+            next_release_date = datetime.now(tz=timezone.utc)
+        else:
+            next_release_date = get_tag_date_time(release_tags[index+1])
+
+        print("Adding release {} with start date {}, end date {} and "
+              "next release date {}".format(
+                  release_tag, start_date, end_date, next_release_date))
 
-    start_date = get_tag_date_time(release_tags[index-1])
-    end_date = get_tag_date_time(release_tag)
-
-    # For the latest release we set the time of next release to the current
-    # date time
-    if index == len(release_tags) - 1:
-        next_release_date = datetime.now(tz=timezone.utc)
-    else:
-        next_release_date = get_tag_date_time(release_tags[index+1])
-
-    print("Adding release {} with start date {}, end date {} and "
-          "next release date {}".format(
-              release_tag, start_date, end_date, next_release_date))
-
-    files_in_current_release = str(git('ls-tree', '--name-only', '-r',
-                                       release_tag)).split('\n')[:-1]
-    java_files_in_current_release = [file for file in files_in_current_release
-                                     if file.endswith('.java')]
-    d[release_tag] = {
-        'start_date': start_date,
-        'end_date': end_date,
-        'next_release_date': next_release_date,
-        'file_info': {file: {
-            'buggy': False,
-            'bug_discovered_after_next_release': False,
-            'metrics': {'comm': 0, 'adev': 0, 'ddev': 0, 'add': 0, 'del': 0,
-                        'own': 0, 'minor': 0}
-        } for file in java_files_in_current_release}
-    }
+        files_in_current_release = backend.list_files(release_tag)
+        java_files_in_current_release = [
+            file for file in files_in_current_release
+            if file.endswith('.java')]
+
+        # The metrics of the files are stored in a column for each metric,
+        # where each file is identified by its index in the release
+        d[release_tag] = {
+            'start_date': start_date,
+            'end_date': end_date,
+            'next_release_date': next_release_date,
+            'metrics': ReleaseMetrics(java_files_in_current_release)
+        }
+
+    checkpoints.save('releases', d)
 
 ###############################################################################
 # 2ND STEP: ###################################################################
 # Retrieve the bug information from JIRA and mark buggy files as such #########
 ###############################################################################
 
-# Base URL for the API used to retrieve commits fixing bugs
-base_commit_url = "https://issues.apache.org/jira/rest/dev-status/1.0/issue/"\
-                  "detail?applicationType=fecru&dataType=repository"
-
 # In this dictionary we store all the commits that fixed a bug.
 # The keys of the dictionary are the bugfix commits hashes and the values
 # are dictionaries containing the timestamp of the bugfix commit and the
@@ -140,22 +242,12 @@ base_commit_url = "https://issues.apache.org/jira/rest/dev-status/1.0/issue/"\
 bug_fixing_commits = {}
 
 
-def add_bug(issue_id):
+def add_bug(results):
     """
-    Given a bug issue ID, this function retrieves
-    the commit info attached to the issue in order
-    to identify the commits that fixed the issue
+    Given the commit info attached to a bug issue
+    (its development information in JIRA), this function
+    adds the commits that fixed the issue
     """
-    req_url = base_commit_url + "&issueId={}".format(issue_id)
-
-    # Repeat to overcome JIRA rate limiting
-    while True:
-        try:
-            results = requests.get(req_url).json()
-            break
-        except:
-            time.sleep(jira_pause_seconds)
-
     # Get the list of repositories with commits attached to the issue
     repositories = results['detail'][0]['repositories']
 
@@ -189,12 +281,6 @@ def add_bug(issue_id):
 
 print("Retrieving defect information from JIRA")
 
-# We have to get from the Jira REST API the lists of issue IDs that
-# correspond to a bug. the API allows the retrieval of only ~50
-# results at time, meaning we have to repeat the request multiple
-# times in order to get all the issue IDs
-jira_api_url = 'https://issues.apache.org/jira/rest/api/2/search'
-
 # We only ask for bugs that are marked as fixed, and have a creation
 # date next to the start date of the first release
 jql = "({}) AND issuetype = Bug AND resolution = Fixed AND "\
@@ -204,308 +290,345 @@ jql = "({}) AND issuetype = Bug AND resolution = Fixed AND "\
 
 print("JIRA query: {}".format(jql))
 
-first_results = requests.post(jira_api_url,
-                              json={'jql': jql,
-                                    'fields': ['key']}).json()
-maxResults = first_results['maxResults']
-total = first_results['total'] if compute_bug_info else 0
-
-print("Total number of issues to analyze: {}".format(total))
-
-for startAt in range(0, total, maxResults):
-    payload = {
-        'jql': jql,
-        'fields': ['key'],
-        'startAt': startAt
-    }
-
-    # The JIRA API has rate limiting, so if the request is not
-    # sucessful we try again
-    while True:
-        try:
-            results = requests.post(jira_api_url, json=payload).json()
-            break
-        except:
-            time.sleep(jira_pause_seconds)
-
-    for issue in results['issues']:
-        info("Retrieving commit info for bug {}".format(issue['key']))
-        add_bug(issue['id'])
-
-    print("Analyzed {} out of {} issues".format(startAt + maxResults, total))
 
-bugfixing_commits_len = len(bug_fixing_commits)
-
-# At this point we have, in bug_fixing_commits, the commits that
-# fixed some defects together with the list of files that had
-# some lines removed by those commits.
-# The next step is then to blame each of those files to understand
-# in which release they were introduced.
+async def retrieve_bugs():
+    """
+    Retrieves from the JIRA REST API the issues that correspond to a
+    bug, and the commit info attached to each of them. The API returns
+    only ~50 issues at time, so the pages of results are requested in
+    parallel, as well as the commit info of the issues.
 
-# Pattern used to identify removed linenumbers
-# We compile it just one time to improve speed
-removed_linenumbers_pattern = re.compile(
-    r'^@@ -(\d+)(?:,(\d+))? \+\d+(?:,\d+)? @@',
-    flags=re.M)
+    The responses are cached on disk, so after the first run only the
+    issues updated in the meantime are requested again
+    """
+    # When other analyses are running at the same time the rate limit
+    # is shared with them
+    rate_limiter = None
+    if args.jira_rate_file:
+        rate_limiter = SharedTokenBucket(args.jira_rate_file,
+                                         jira_requests_per_second)
 
-# Pattern used to identify line number, timestamp and filename in git blame
-# output
-line_tstamp_file_pattern = re.compile(
-    '^([0-9a-f]{40}) \d+ (\d+)(?: \d+)?(?:\n.*?)+'
-    'author-time (\d+)(?:\n.*?)+'
-    'filename (.+?)$',
-    flags=re.M)
+    async with JiraClient(requests_per_second=jira_requests_per_second,
+                          concurrency=jira_concurrency,
+                          rate_limiter=rate_limiter) as jira_client:
+        jira = CachedJira(jira_client, jira_cache, args.jira_refresh)
 
+        issues = await jira.search(jql, fields=['key'])
 
-def get_bug_introduction_info(bugfix_commit_hash, bugfixed_file):
-    """
-    Given a bugfix commit hash and a file with lines
-    removed by that commit, returns the list of commits
-    that introduced the lines removed by the bugfix commit,
-    together with their timestamp and the original file name
-    """
+        print("Total number of issues to analyze: {}".format(len(issues)))
 
-    # First we need to know which are the lines that were removed
-    # to fix the bug. For this purpose we use git show as follows.
-    # Apparently some commits can be removed from the history of the
-    # repository, in that case we ignore them
-    try:
-        cmd = ('--no-pager', 'show', '--no-color', '--format=',
-               '--unified=0', commit_hash, '--', bugfixed_file)
+        dev_statuses = await jira.dev_status_all(
+            [issue['id'] for issue in issues])
 
-        raw_show_output = str(git(*cmd))
-    except:
-        return None
+    return issues, dev_statuses
 
-    # The output of git show contains the removed line groups,
-    # each one in the following format:
-    # @@ -X,Y +Z,W @@
-    # ..content of removed lines..
-    # where X is the start line of the removed group
-    # and Y is the number of lines removed.
-    # If Y = 0 no lines were removed, while
-    # if Y is not present it means 1 line was removed.
+if checkpoints.has('bug_fixing_commits'):
+    print("Loading bug fixing commits from the checkpoint")
+    bug_fixing_commits = checkpoints.load('bug_fixing_commits')
+elif compute_bug_info:
+    with JiraCache(jira_cache_file) as jira_cache:
+        issues, dev_statuses = asyncio.run(retrieve_bugs())
 
-    # Find all patterns corresponding to removed line numbers
-    removed_lines_matches = \
-        removed_linenumbers_pattern.finditer(raw_show_output)
+    for issue, dev_status in zip(issues, dev_statuses):
+        info("Retrieving commit info for bug {}".format(issue['key']))
+        add_bug(dev_status)
 
-    # In removed_lines_ranges we store all the ranges of lines removed
-    # by the current commit
-    removed_lines_ranges = []
-    for match in removed_lines_matches:
-        _start_line, _n_lines = match.groups()
-        start_line = int(_start_line)
-        n_lines = int(_n_lines) if _n_lines is not None else 1
+    print("Analyzed {} issues".format(len(issues)))
 
-        if n_lines != 0:
-            end_line_included = start_line + n_lines - 1
+    checkpoints.save('bug_fixing_commits', bug_fixing_commits)
 
-            removed_lines_ranges.append((start_line, end_line_included))
+# At this point we have, in bug_fixing_commits, the commits that
+# fixed some defects together with the list of files that had
+# some lines removed by those commits.
+# The next step is then to blame each of those files to understand
+# in which release they were introduced.
 
-    # Now that we know the ranges of removed lines, we blame the file
-    # to understand from where each line comes from
-    blame_out = str(git('--no-pager', 'blame', '--line-porcelain',
-                        bugfix_commit_hash + '^1', '--', bugfixed_file))
 
-    line_tstamp_file_matches = \
-        line_tstamp_file_pattern.finditer(blame_out)
+def get_bug_introduction_info(bugfix_commit_hash, bugfixed_file,
+                              removed_lines_ranges):
+    """
+    Given a bugfix commit hash, a file with lines removed by that
+    commit and the ranges of the removed lines, returns the list of
+    commits that introduced the lines removed by the bugfix commit,
+    together with their timestamp (as an epoch) and the original file name
+    """
 
+    # Now that we know the ranges of removed lines, we blame only those
+    # lines of the file to understand from where each line comes from.
     # We use a set to store all the (commit, timestamp, original_filename)
     # tuples that introduced a bug
-    commit_tstamp_filename_tuples = set()
-
-    for match in line_tstamp_file_matches:
-        commit, line_n, _timestamp, filename = match.groups()
-        timestamp = datetime.fromtimestamp(int(_timestamp), timezone.utc)
-
-        # Check if the current line was removed in the bugfix commit
-        if any(start_line <= int(line_n) <= end_line
-               for start_line, end_line in removed_lines_ranges):
-            commit_tstamp_filename_tuples.add((commit, timestamp, filename))
+    commit_tstamp_filename_tuples = set(
+        (line.commit, line.author_time, line.filename)
+        for line in bug_introducing_lines(blame_cache, bugfix_commit_hash,
+                                          bugfixed_file,
+                                          removed_lines_ranges))
 
     return commit_tstamp_filename_tuples
 
-print("Linking bugfix commits to releases")
-
-# Iterate over all the bug fixing commits
-for index, (commit_hash, commit_info) in enumerate(bug_fixing_commits.items()):
-    info('Processing bugfixing commit {} out of {}'.format(
-        index, bugfixing_commits_len))
-
-    date_time_fixing = commit_info['commit_timestamp']
-    defective_files = commit_info['files_with_lines_removed']
-
-    for defective_file in defective_files:
-        # Get the information about when and where the bug was introduced
-        # In particular the get_bug_introduction_info function will return
-        # a set of (commit, timestamp, filename) tuples where a bug was
-        # introduced with commit "commit" at "timestamp" in file "filename"
-        bug_introduction_info = get_bug_introduction_info(
-            commit_hash, defective_file)
-
-        if bug_introduction_info is None:
+if checkpoints.has('bug_linking'):
+    print("Loading bug introductions from the checkpoint")
+    d = checkpoints.load('bug_linking')
+else:
+    print("Linking bugfix commits to releases")
+
+    # The lines removed by the bug fixing commits from each of their files
+    # are read from the diffs of all the commits at once, with a single git
+    # process. Apparently some commits can be removed from the history of
+    # the repository, in that case they are ignored, like the files
+    # without removed lines
+    removed_lines = read_removed_lines(
+        repo_name,
+        ((commit_hash, defective_file)
+         for commit_hash, commit_info in bug_fixing_commits.items()
+         for defective_file in commit_info['files_with_lines_removed']))
+
+    # One task for each file with lines removed by each bug fixing commit
+    bug_introduction_tasks = [
+        (commit_hash, defective_file, removed_lines_ranges)
+        for (commit_hash, defective_file), removed_lines_ranges
+        in removed_lines.items()]
+
+    # Get the information about when and where the bug was introduced
+    # In particular the get_bug_introduction_info function will return
+    # a set of (commit, timestamp, filename) tuples where a bug was
+    # introduced with commit "commit" at "timestamp" in file "filename"
+    bug_introduction_results = executor.map(get_bug_introduction_info,
+                                            bug_introduction_tasks)
+
+    # The same line can be removed by more than one bugfix commit, so we first
+    # collect the distinct bug introductions, each one with the date of the
+    # latest commit that fixed it: the introduction makes the file buggy in
+    # any case, and the bug was discovered after the next release if at least
+    # one of the fixes came after it
+    bug_introductions = {}
+
+    for index, ((commit_hash, defective_file, _), bug_introduction_info) \
+            in enumerate(bug_introduction_results):
+        info('Processing bugfixing file {} out of {} (commit {})'.format(
+            index, len(bug_introduction_tasks), commit_hash))
+
+        date_time_fixing = bug_fixing_commits[commit_hash]['commit_timestamp']
+
+        for bug_introduction in bug_introduction_info:
+            if bug_introduction not in bug_introductions or \
+                    bug_introductions[bug_introduction] < date_time_fixing:
+                bug_introductions[bug_introduction] = date_time_fixing
+
+    # Index of the development time of the releases, used to find the releases
+    # in which each bug was introduced with a binary search. The timestamps of
+    # the bug introductions come from git blame as epochs, so the index uses
+    # epochs as well
+    release_index = ReleaseIndex(
+        (release, release_info['start_date'].timestamp(),
+         release_info['end_date'].timestamp())
+        for release, release_info in d.items())
+
+    # Link all the bug introductions to the releases at once
+    introduction_releases = release_index.find_all(
+        [date_time_introduction
+         for _, date_time_introduction, _ in bug_introductions])
+
+    # Files to mark as buggy in each release, and files whose bug was
+    # discovered after the next release, which are marked all at once
+    buggy_files = defaultdict(list)
+    late_buggy_files = defaultdict(list)
+
+    for ((commit, date_time_introduction, filename), date_time_fixing), \
+            releases in zip(bug_introductions.items(), introduction_releases):
+        info("A bug was introduced in file {} at timestamp {} and was "
+             "fixed at time {}".format(
+                 filename,
+                 datetime.fromtimestamp(date_time_introduction, timezone.utc),
+                 date_time_fixing))
+
+        # Iterate over the releases in whose development time
+        # the bug was introduced
+        for release in releases:
+            # If the file was present at the time of release
+            # mark it as buggy
+            buggy_files[release].append(filename)
+
+            # If the bug was fixed after the next release,
+            # it means we cannot use it in the training set
+            # so we signal this with a flag
+            if date_time_fixing > d[release]['next_release_date']:
+                late_buggy_files[release].append(filename)
+
+    # The file where a bug was introduced can have been renamed before the
+    # release, so the paths of the bug introductions are translated to the
+    # paths of the files at the time of the release. The renames are
+    # followed in an index of the history built with a single "git log"
+    if bug_introductions:
+        rename_index = RenameIndex.from_repo(repo_name, *d.keys())
+
+    for release, release_info in d.items():
+        metrics = release_info['metrics']
+
+        if not buggy_files[release]:
             continue
 
-        # Iterate over all the bug introductions
-        for commit, date_time_introduction, filename in bug_introduction_info:
-            info("A bug was introduced in file {} at timestamp {} and was "
-                 "fixed at time {}".format(
-                     filename,
-                     date_time_introduction,
-                     date_time_fixing))
-
-            # Iterate over all the releases
-            for release, release_info in d.items():
-                # Get the datetime of start, end and of the next release
-                start_date = release_info['start_date']
-                end_date = release_info['end_date']
-                next_release_date = release_info['next_release_date']
-
-                # If the bug that we're analyzing was introduced in the
-                # time of development of the current release
-                if (start_date < date_time_introduction < end_date):
-                    # If the file was present at the time of release
-                    # mark it as buggy
-                    if filename in release_info['file_info']:
-                        release_info['file_info'][filename]['buggy'] = True
-
-                        # If the bug was fixed after the next release,
-                        # it means we cannot use it in the training set
-                        # so we signal this with a flag
-                        if date_time_fixing > next_release_date:
-                            release_info['file_info'][filename]['bug_discovered_after_next_release'] = True
+        # Old paths of the files of the release, with their path
+        # at the time of the release
+        release_commit = resolve_commit(git, release)
+        release_paths = {}
+        for file in metrics.files:
+            for old_path in rename_index.paths(file, release_commit)[1:]:
+                if old_path not in metrics:
+                    release_paths.setdefault(old_path, file)
+
+        # (the files that were not present at the time of release
+        # are ignored)
+        metrics.set('buggy', [release_paths.get(file, file)
+                              for file in buggy_files[release]], True)
+        metrics.set('bug_discovered_after_next_release',
+                    [release_paths.get(file, file)
+                     for file in late_buggy_files[release]], True)
+
+    checkpoints.save('bug_linking', d)
 
 ###############################################################################
 # 3RD STEP: ###################################################################
 # Compute the metrics for each file in each release ###########################
 ###############################################################################
 
-author_email_pattern = re.compile(r'author-mail <(.+?)>\nauthor-time (\d+)',
-                                  flags=re.M)
-
-for release, release_info in d.items():
-    print("Computing metrics for release {}".format(release))
-
-    start_date = release_info['start_date']
-    end_date = release_info['end_date']
-
-    # To compute COMM and ADEV we look at all the commits made in this release
-
-    # Get the list of all commits made in this release together with the commit
-    # author email and the files changed by each commit
-    #
-    # [author_email_1]
-    # path/to/A.java
-    # path/to/B.java
-    #
-    # [author_email_2]
-    # path/to/C.java
-    # path/to/D.java
-    cmd = ('--no-pager', 'log', '--name-only',
-           '--after="{}"'.format(start_date),
-           '--before="{}"'.format(end_date),
-           '--pretty=format:[%ae]')
-
-    raw_log_output = str(git(*cmd))
-
-    # We create a dictionary in which each file modified in one of the commits
-    # that we're analyzing is a key and the corresponding value is a list
-    # of the authors that made a change to this file
-    temp_d = defaultdict(list)
-
-    for raw_group in raw_log_output.split('\n\n'):
-        if not raw_group.strip():
-            continue
+# Releases whose metrics are not in a checkpoint yet, for which the
+# history is walked
+pending_releases = [release for release in d
+                    if not checkpoints.has('metrics-{}'.format(release))]
+
+# DDEV of every file in every release, computed with a single walk over the
+# history instead of running "git shortlog" on every file of each release,
+# with the same author ids used by ADEV, OWN and MINOR
+print("Computing DDEV for all releases")
+ddev_by_release = compute_ddev(git, pending_releases, authors)
+
+# COMM, ADEV, ADD and DEL of every file in every release, computed with a
+# single walk over the history, assigning each commit to the releases in
+# whose development time it was made
+print("Computing COMM, ADEV, ADD and DEL for all releases")
+release_changes = compute_release_changes(
+    repo_name,
+    ((release, d[release]['start_date'], d[release]['end_date'])
+     for release in pending_releases),
+    authors)
+
+# To compute OWN and MINOR each file is blamed just before every release.
+# Instead of blaming each file from scratch at every release, we walk the
+# history of each file forward once and store the blame at every release
+# in the blame cache, which is then used by the OWN and MINOR computation
+print("Computing blame of all files at all releases")
+
+
+def blame_file_at_revisions(file, revisions):
+    """
+    Computes the blame of the file at all the given revisions
+    with a single forward walk and stores it in the blame cache
+    """
+    if all(blame_cache.cached(revision, file) for revision in revisions):
+        return
 
-        commit_group = raw_group.split('\n')
+    forward_blame = ForwardBlame(git, file, revisions)
 
-        # If it's an empty commit, skip it
-        if len(commit_group) < 2:
-            continue
+    for revision in revisions:
+        blame = forward_blame.blame(revision)
+        if blame is not None:
+            blame_cache.put(revision, file, blame)
 
-        author_email = commit_group[0][1:-1]
-        changed_files = commit_group[1:]
+# (releases whose metrics are in a checkpoint don't need the blame)
+releases_of_file = defaultdict(list)
+for release in pending_releases:
+    for file in d[release]['metrics'].files:
+        releases_of_file[file].append('{}^1'.format(release))
 
-        # Filter our non-Java files
-        filter(lambda f: f.endswith('.java'), changed_files)
+for index, _ in enumerate(executor.map(blame_file_at_revisions,
+                                       releases_of_file.items())):
+    info('Computed forward blame for file {} out of {}'.format(
+        index, len(releases_of_file)))
 
-        for file in changed_files:
-            temp_d[file] += author_email
 
-    for file, authors in temp_d.items():
-        if file in release_info['file_info']:
-            # COMM = number of commits made to this file in this release
-            # Since we add to the author list of the file the author
-            # of each commit, the number of authors equals to the number
-            # of commits
-            release_info['file_info'][file]['metrics']['comm'] = len(authors)
+def count_release_lines(release, file, start_date):
+    """
+    Counts the lines of the file written during the release by each of
+    its contributors, returning the list of the counts, or None if no
+    line of the file was changed during the release
+    """
+    # We blame each file at state just before the final release
+    # commit
+    blame = blame_cache.blame('{}^1'.format(release), file)
 
-            # ADEV = number of distinct developers who contributed to the
-            # file in this release
-            release_info['file_info'][file]['metrics']['adev'] = \
-                len(set(authors))
+    if not len(blame):
+        return None
 
-    info("COMM and ADEV computed for release {}".format(release))
+    # The author times in the blame are epochs, so we compare them
+    # with the epoch of the start of the release
+    start_timestamp = start_date.timestamp()
+
+    # We count the lines of each author of the file, considering
+    # only the contributions made after the date of start of the
+    # current release (the authors are interned in the blame, so
+    # each of them is translated to its author id only once)
+    author_ids = [authors.id(email) for email in blame.authors]
+    line_contributors_counter = Counter(
+        author_ids[blame_author_id] for blame_author_id, author_time
+        in zip(blame.author_ids, blame.author_times)
+        if author_time > start_timestamp)
+
+    # If there is no valid contributor (meaning all the lines in the file
+    # were not modified in the current release) we leave OWN and MINOR to
+    # 0 and we skip to the next file
+    if not line_contributors_counter:
+        return None
 
-    files_in_release_len = len(release_info['file_info'])
+    # Once we have the "valid" contributors for the current file, their
+    # counts are enough to compute the metrics, which is done for all the
+    # files of the release at once
+    return list(line_contributors_counter.values())
 
-    # To compute DDEV we use the "git shortlog" command on every file of
-    # each release
-    for index, (file, file_info)\
-            in enumerate(release_info['file_info'].items()):
-        info('Computing DDEV for file {} out of {}'.format(
-            index, files_in_release_len))
-        cmd = ('--no-pager', 'shortlog', '-s', '--email',
-               'origin..{}'.format(release), '--', file)
-        raw_shortlog_output = str(git(*cmd))
+for release, release_info in d.items():
+    if checkpoints.has('metrics-{}'.format(release)):
+        print("Loading metrics for release {} from the checkpoint".format(
+            release))
+        release_info['metrics'] = checkpoints.load(
+            'metrics-{}'.format(release))
+        continue
 
-        if not raw_shortlog_output.strip():
-            continue
+    print("Computing metrics for release {}".format(release))
 
-        # DDEV = number of distinct developers who contributed to the file
-        # since the beginning of time.
-        # The output of shortlog contains one line for each distinct developer
-        # that has contributed to the file.
-        file_info['metrics']['ddev'] = len(raw_shortlog_output.split('\n')) - 1
+    start_date = release_info['start_date']
+    end_date = release_info['end_date']
+    metrics = release_info['metrics']
 
-    # Computation of ADD and DEL
-    # We use the numstat option to get, for each commit in the current release,
-    # the list of files modified each with its corresponding number of added
-    # and deleted lines
-    info('Computing ADD and DEL')
+    changes = release_changes[release]
 
-    cmd = ('--no-pager', 'log', '--pretty=', '--numstat',
-           '--after="{}"'.format(start_date),
-           '--before="{}"'.format(end_date))
+    # COMM = number of commits made to this file in this release
+    metrics.set('comm', changes.commits.keys(),
+                list(changes.commits.values()))
 
-    raw_log_output = str(git(*cmd))
+    # ADEV = number of distinct developers who contributed to the
+    # file in this release
+    metrics.set('adev', changes.authors.keys(),
+                [len(file_authors) for file_authors
+                 in changes.authors.values()])
 
-    total_added_lines, total_removed_lines = 0, 0
+    info("COMM and ADEV computed for release {}".format(release))
 
-    for line in raw_log_output.split('\n'):
-        if not line.strip():
-            continue
+    files_in_release_len = len(metrics)
 
-        added_lines, removed_lines, filename = line.split('\t')
+    # DDEV = number of distinct developers who contributed to the file
+    # since the beginning of time.
+    release_ddev = ddev_by_release[release]
 
-        # For some reason the number of added lines or removed lines
-        # can be '-', maybe because an empty file was created?
-        # In that case we skip to the next change
-        if '-' in (added_lines, removed_lines):
-            continue
+    metrics.set('ddev', release_ddev.keys(), list(release_ddev.values()))
 
-        total_added_lines += int(added_lines)
-        total_removed_lines += int(removed_lines)
+    info("DDEV computed for release {}".format(release))
 
-        # If the modified file that we're analyzing was there at the time
-        # of the release, increase its count of added/deleteed lines
-        # by the number of added/deleted lines in the current change
-        if filename in release_info['file_info']:
-            release_info['file_info'][filename]['metrics']['add'] += \
-                int(added_lines)
-            release_info['file_info'][filename]['metrics']['del'] += \
-                int(removed_lines)
+    # If the modified file that we're analyzing was there at the time
+    # of the release, its added/deleted lines are the ones added/deleted
+    # by all the commits of the release
+    metrics.set('add', changes.added_lines.keys(),
+                list(changes.added_lines.values()))
+    metrics.set('del', changes.removed_lines.keys(),
+                list(changes.removed_lines.values()))
 
     # Normalize the added and deleted lines of each file by the total number
     # of added and deleted lines in the project
@@ -513,65 +636,55 @@ for release, release_info in d.items():
     # in the file
     # DEL = normalized (by the total number of deleted lines) deleted lines
     # in the file
-    for file, file_info in release_info['file_info'].items():
-        file_info['metrics']['add'] /= total_added_lines
-        file_info['metrics']['del'] /= total_removed_lines
+    if changes.total_added_lines:
+        metrics['add'] /= changes.total_added_lines
+    if changes.total_removed_lines:
+        metrics['del'] /= changes.total_removed_lines
 
     # Computation of OWN and MINOR
-    for index, (file, file_info)\
-            in enumerate(release_info['file_info'].items()):
-        info('Computing OWN and MINOR for file {} out of {}'.format(
-            index, files_in_release_len))
-
-        # We blame each file at state just before the final release
-        # commit
-        cmd = ('--no-pager', 'blame', '--line-porcelain',
-               '{}^1'.format(release), '--', file)
-
-        raw_blame_output = str(git(*cmd))
-
-        if not raw_blame_output.strip():
-            continue
-
-        lines = author_email_pattern.finditer(raw_blame_output)
-
-        line_contributors = []
-        # We iterate over all the lines of the file and add the author
-        # of the line to the list of contributors of the current file
-        # only if the contribution was made after the date of start
-        # of the current release
-        for line in lines:
-            author_email, timestamp = line.groups()
-
-            if datetime.fromtimestamp(int(timestamp),
-                                      timezone.utc) > start_date:
-                line_contributors.append(author_email)
-
-        # If there is no valid contributor (meaning all the lines in the file
-        # were not modified in the current release) we leave OWN and MINOR to
-        # 0 and we skip to the next file
-        if not line_contributors:
-            continue
-
-        # Once we have the list of "valid" contributors for the current file,
-        # we are able to compute the metrics
-        line_contributors_counter = Counter(line_contributors)
-
-        total_contributors = len(line_contributors_counter)
-        total_lines = sum(line_contributors_counter.values())
-
-        minor_contributors = sum(1 for contributor, value
-                                 in line_contributors_counter.items()
-                                 if value/total_lines <= 0.05)
-        n_lines_best_contributor = max(line_contributors_counter.values())
-        ownership_best_contributor = n_lines_best_contributor / total_lines
-
-        # OWN = percentage of lines authored by the contributor that authored
-        # the most lines
-        # MINOR = number of contributors that authored less than 5% of
-        # the lines
-        file_info['metrics']['own'] = ownership_best_contributor
-        file_info['metrics']['minor'] = minor_contributors
+    # The lines of the contributors of each file are stored as soon as
+    # they're counted, so when resuming we only count the files that were
+    # not completed
+    line_counts, line_counts_log = checkpoints.open_units(
+        'line-counts-{}'.format(release))
+
+    line_count_tasks = ((release, file, start_date)
+                        for file in metrics.files
+                        if file not in line_counts)
+
+    with line_counts_log:
+        for index, ((_, file, _), file_line_counts) in \
+                enumerate(executor.map(count_release_lines, line_count_tasks),
+                          len(line_counts)):
+            info('Counted the lines for OWN and MINOR of file {} out of {}'
+                 .format(index, files_in_release_len))
+
+            line_counts_log.add(file, file_line_counts)
+            line_counts[file] = file_line_counts
+
+    owned_files = [file for file, file_line_counts in line_counts.items()
+                   if file_line_counts is not None]
+
+    # The metrics of all the files are computed at once (the ids of the
+    # contributors are not needed, since OWN and MINOR only depend on
+    # their counts)
+    contributions = Contributions()
+    for file in owned_files:
+        contributions.add(range(len(line_counts[file])), line_counts[file])
+    ownership = compute_ownership(contributions)
+
+    # OWN = percentage of lines authored by the contributor that authored
+    # the most lines
+    # MINOR = number of contributors that authored less than 5% of
+    # the lines
+    metrics.set('own', owned_files, ownership['ownership_best_contributor'])
+    metrics.set('minor', owned_files, ownership['minor_contributors'])
+
+    info("Blame cache statistics: {}".format(blame_cache.stats()))
+
+    checkpoints.save('metrics-{}'.format(release), metrics)
+
+executor.close()
 
 ###############################################################################
 # 4TH STEP: ###################################################################
@@ -580,28 +693,25 @@ for release, release_info in d.items():
 
 print("Saving results")
 
+output_format = args.output_format
+if output_format == 'auto':
+    output_format = default_format()
+
 for release, release_info in d.items():
+    if output_format != 'csv':
+        # The partition of the release in the dataset, where the columns
+        # keep their types
+        partition = [('project', project_name), ('release', release)]
+        output_file = partition_path(args.dataset_dir, partition,
+                                     output_format)
+
+        with ColumnarWriter(output_file, output_fields,
+                            output_format) as writer:
+            release_info['metrics'].write(writer)
+        continue
+
     end_date = release_info['end_date'].strftime("%Y-%m-%d")
-    output_file = '{}-{}-{}.csv'.format(repo_name, end_date, release)
-
-    with open(output_file, 'w', newline='') as csvf:
-        fieldnames = ['file_name', 'comm', 'adev', 'ddev', 'add', 'del',
-                      'own', 'minor', 'buggy', 'bug_discovered_after_next_release']
-
-        writer = csv.DictWriter(csvf, fieldnames=fieldnames, delimiter=',')
-        writer.writeheader()
-
-        for file, file_info in release_info['file_info'].items():
-            writer.writerow({
-                'file_name': file,
-                'comm': file_info['metrics']['comm'],
-                'adev': file_info['metrics']['adev'],
-                'ddev': file_info['metrics']['ddev'],
-                'add': '%.6f' % file_info['metrics']['add'],
-                'del': '%.6f' % file_info['metrics']['del'],
-                'own': '%.6f' % file_info['metrics']['own'],
-                'minor': file_info['metrics']['minor'],
-                'buggy': file_info['buggy'],
-                'bug_discovered_after_next_release':
-                    file_info['bug_discovered_after_next_release']
-            })
\ No newline at end of file
+    output_file = '{}-{}-{}.csv'.format(project_name, end_date, release)
+
+    # The rows are written streaming from the columns of the metrics
+    release_info['metrics'].write_csv(output_file)
@@ -0,0 +1,501 @@
+"""
+Persistent on-disk cache for the output of "git blame --line-porcelain"
+
+Blaming a file is by far the most expensive git operation that we run,
+and the same (commit, file) pairs are blamed again at every run of the
+scripts. Here we store, for each blamed (commit, path) pair, only the
+information that we actually use, in a compact array-backed format:
+for each line of the file the commit that introduced it, its author,
+the author time and the original file name.
+
+The output of git blame is parsed while it is read from the pipe,
+so the (huge) output of large files is never held in memory.
+"""
+
+import os
+import pickle
+import zlib
+import re
+import hashlib
+import subprocess
+import multiprocessing
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
+
+# Counters of the cache, shared by the processes that use it
+counter_names = ('hits', 'misses', 'evictions', 'entries', 'bytes')
+
+# Fraction of max_bytes to which the cache is brought when it's full, so
+# that the next stores don't need to evict entries again right away
+evict_ratio = 0.9
+
+# Information about a single line of a blamed file
+BlameLine = namedtuple('BlameLine', ['commit', 'line_number', 'author_email',
+                                     'author_time', 'filename'])
+
+
+class LineRanges(object):
+    """
+    Set of line numbers made of (start_line, end_line) ranges, both
+    included. The ranges are merged and sorted, so that checking if
+    a line is in the set is a binary search
+    """
+
+    def __init__(self, ranges):
+        self.starts, self.ends = [], []
+
+        for start_line, end_line in sorted(ranges):
+            if self.ends and start_line <= self.ends[-1] + 1:
+                self.ends[-1] = max(self.ends[-1], end_line)
+            else:
+                self.starts.append(start_line)
+                self.ends.append(end_line)
+
+    def __contains__(self, line_number):
+        index = bisect_right(self.starts, line_number) - 1
+        return index >= 0 and line_number <= self.ends[index]
+
+    def __iter__(self):
+        return zip(self.starts, self.ends)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def key(self):
+        return ' '.join('{},{}'.format(start_line, end_line)
+                        for start_line, end_line in self)
+
+
+class BlameResult(object):
+    """
+    Blame of a file (or of some of its lines) at a certain commit.
+
+    Commits, authors and file names are interned in per-file tables,
+    and each line only stores the index in those tables together
+    with the line number and the author time
+    """
+
+    def __init__(self, commits, authors, filenames, commit_ids, line_numbers,
+                 author_ids, author_times, filename_ids):
+        self.commits = commits
+        self.authors = authors
+        self.filenames = filenames
+        self.commit_ids = commit_ids
+        self.line_numbers = line_numbers
+        self.author_ids = author_ids
+        self.author_times = author_times
+        self.filename_ids = filename_ids
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Builds the blame from an iterable of
+        (commit, line_number, author_email, author_time, filename) tuples,
+        one for each blamed line of the file in order
+        """
+        tables = ({}, {}, {})
+        ids = (array('I'), array('I'), array('I'))
+        line_numbers = array('I')
+        author_times = array('q')
+
+        for commit, line_number, author_email, author_time, filename \
+                in records:
+            for table, column, value in zip(tables, ids,
+                                            (commit, author_email, filename)):
+                column.append(table.setdefault(value, len(table)))
+            line_numbers.append(line_number)
+            author_times.append(author_time)
+
+        commits, authors, filenames = (list(table) for table in tables)
+        commit_ids, author_ids, filename_ids = ids
+
+        return cls(commits, authors, filenames, commit_ids, line_numbers,
+                   author_ids, author_times, filename_ids)
+
+    def __len__(self):
+        return len(self.author_times)
+
+    def lines(self):
+        """
+        Yields a BlameLine for each blamed line of the file
+        """
+        for index in range(len(self)):
+            yield BlameLine(self.commits[self.commit_ids[index]],
+                            self.line_numbers[index],
+                            self.authors[self.author_ids[index]],
+                            self.author_times[index],
+                            self.filenames[self.filename_ids[index]])
+
+    def select(self, line_ranges):
+        """
+        Returns the blame of only the lines in the given LineRanges
+        """
+        return BlameResult.from_records(line for line in self.lines()
+                                        if line.line_number in line_ranges)
+
+    def to_bytes(self):
+        return zlib.compress(pickle.dumps(
+            (self.commits, self.authors, self.filenames,
+             self.commit_ids, self.line_numbers, self.author_ids,
+             self.author_times, self.filename_ids),
+            protocol=pickle.HIGHEST_PROTOCOL))
+
+    @classmethod
+    def from_bytes(cls, data):
+        return cls(*pickle.loads(zlib.decompress(data)))
+
+
+# Block of lines describing a line of the file in the --line-porcelain output:
+# the header with the commit and the final line number, the "key value" lines
+# (among which the author email, the author time and the file name) and the
+# content of the line, prefixed by a tab. The lines skipped between the fields
+# can only be "key value" lines (they don't start with a tab), so each match
+# stays inside its block and the pattern never backtracks into other blocks
+porcelain_block_pattern = re.compile(
+    rb'([0-9a-f]{40,64}) \d+ (\d+)[^\n]*\n'
+    rb'(?:[^\t\n][^\n]*\n)*?'
+    rb'author-mail <([^\n]*)>\n'
+    rb'author-time (\d+)\n'
+    rb'(?:[^\t\n][^\n]*\n)*?'
+    rb'filename ([^\n]*)\n'
+    rb'\t[^\n]*\n')
+
+# Size of the chunks read from the output of git blame
+chunk_size = 1024 * 1024
+
+
+def parse_line_porcelain(chunks):
+    """
+    Parses the output of "git blame --line-porcelain", given as an
+    iterable of chunks of bytes (e.g. read from the stdout of the
+    process), and yields a (commit, line_number, author_email,
+    author_time, filename) tuple for each line of the file,
+    with the author time as an epoch.
+
+    Each chunk is parsed up to its last complete block, and the rest
+    is kept for the next chunk. Equal values are decoded (and stored)
+    only once
+    """
+    decoded = {}
+    remainder = b''
+
+    def decode(raw, encoding, errors):
+        value = decoded.get(raw)
+        if value is None:
+            value = decoded[raw] = raw.decode(encoding, errors)
+        return value
+
+    for chunk in chunks:
+        chunk = remainder + chunk
+
+        # The last complete block ends with the last complete content line
+        last_newline = chunk.rfind(b'\n')
+        last_content_line = chunk.rfind(b'\n\t', 0, last_newline)
+        if last_content_line == -1:
+            remainder = chunk
+            continue
+        blocks_end = chunk.index(b'\n', last_content_line + 1) + 1
+        chunk, remainder = chunk[:blocks_end], chunk[blocks_end:]
+
+        for raw_commit, line_number, raw_email, author_time, raw_filename \
+                in porcelain_block_pattern.findall(chunk):
+            yield (decode(raw_commit, 'ascii', 'strict'),
+                   int(line_number),
+                   decode(raw_email, 'utf-8', 'replace'),
+                   int(author_time),
+                   decode(raw_filename, 'utf-8', 'surrogateescape'))
+
+
+def stream_line_porcelain(repo_path, *args):
+    """
+    Runs "git blame --line-porcelain <args>" in the repository and
+    parses its output while reading it, yielding the same tuples of
+    parse_line_porcelain.
+
+    If git fails (e.g. the file doesn't exist at the revision)
+    a subprocess.CalledProcessError is raised
+    """
+    command = ('git', '--no-pager', 'blame', '--line-porcelain') + args
+    process = subprocess.Popen(command, cwd=repo_path,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    try:
+        yield from parse_line_porcelain(
+            iter(lambda: process.stdout.read(chunk_size), b''))
+        stderr = process.stderr.read()
+    finally:
+        # Also stop git if the caller stops reading early
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        process.stderr.close()
+
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command,
+                                            stderr=stderr)
+
+
+class BlameCache(object):
+    """
+    Cache of blame results keyed by (resolved commit hash, path).
+
+    Each entry is stored in its own file inside cache_dir. When the total
+    size of the entries exceeds max_bytes, the least recently used ones
+    are removed until it's back under evict_ratio * max_bytes.
+
+    The counters (hits, misses, evictions, and the number and total size
+    of the entries) are kept in shared memory, so the worker processes
+    forked by the executor update the same counters of the main process:
+    the size limit holds for all of them together, and stats returns the
+    numbers of all the processes.
+    """
+
+    def __init__(self, repo_path, cache_dir, max_bytes=2 * 1024 ** 3):
+        self.repo_path = repo_path
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+        # Revisions already resolved to a commit hash during this run
+        self._resolved = {}
+
+        self._lock = multiprocessing.Lock()
+        self._counters = multiprocessing.RawArray('q', len(counter_names))
+        # Set while a process is evicting entries
+        self._evicting = multiprocessing.RawValue('b', 0)
+
+        os.makedirs(cache_dir, exist_ok=True)
+        for root, _, files in os.walk(cache_dir):
+            for name in files:
+                if name.endswith('.tmp'):
+                    os.remove(os.path.join(root, name))
+
+        entries = self._entries()
+        self._set('entries', len(entries))
+        self._set('bytes', sum(size for _, size, _ in entries))
+
+    def _count(self, name):
+        with self._lock:
+            self._add(name, 1)
+
+    def _add(self, name, value):
+        # (must be called holding the lock)
+        self._counters[counter_names.index(name)] += value
+
+    def _set(self, name, value):
+        self._counters[counter_names.index(name)] = value
+
+    def _get(self, name):
+        return self._counters[counter_names.index(name)]
+
+    def _entries(self):
+        """
+        Returns a (last_used, size, entry_path) tuple for each entry on
+        disk, including the ones stored by the other processes
+        """
+        entries = []
+
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                # (the entries still being written by other processes)
+                if name.endswith('.tmp'):
+                    continue
+
+                entry_path = os.path.join(root, name)
+                try:
+                    stat = os.stat(entry_path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry_path))
+
+        return entries
+
+    def resolve(self, revision):
+        """
+        Returns the commit hash corresponding to the given revision
+        """
+        if revision not in self._resolved:
+            self._resolved[revision] = subprocess.check_output(
+                ('git', 'rev-parse', '--verify',
+                 '{}^{{commit}}'.format(revision)),
+                cwd=self.repo_path, stderr=subprocess.PIPE).decode(
+                    'ascii').strip()
+
+        return self._resolved[revision]
+
+    def _entry_path(self, commit_hash, path, line_ranges=None):
+        key = path if line_ranges is None else \
+            '{}\0{}'.format(path, line_ranges.key())
+        key_hash = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, commit_hash[:2],
+                            '{}-{}'.format(commit_hash[2:], key_hash))
+
+    def _load(self, entry_path):
+        """
+        Returns the BlameResult stored in the entry, or None
+        if the entry doesn't exist (or is not readable)
+        """
+        try:
+            with open(entry_path, 'rb') as entry:
+                result = BlameResult.from_bytes(entry.read())
+        except (OSError, EOFError, ValueError, TypeError, zlib.error,
+                pickle.UnpicklingError):
+            return None
+
+        # Mark the entry as recently used
+        os.utime(entry_path)
+
+        return result
+
+    def blame(self, revision, path):
+        """
+        Returns the BlameResult of the file at the given revision,
+        running "git blame" only if it's not already in the cache.
+
+        If the file (or the revision) doesn't exist a
+        subprocess.CalledProcessError is raised, and nothing
+        is stored in the cache
+        """
+        commit_hash = self.resolve(revision)
+        entry_path = self._entry_path(commit_hash, path)
+
+        result = self._load(entry_path)
+
+        if result is not None:
+            self._count('hits')
+            return result
+
+        self._count('misses')
+
+        result = BlameResult.from_records(stream_line_porcelain(
+            self.repo_path, commit_hash, '--', path))
+
+        self._store(entry_path, result.to_bytes())
+
+        return result
+
+    def blame_lines(self, revision, path, line_ranges):
+        """
+        Returns the BlameResult of only the given lines of the file at the
+        given revision, where line_ranges is a list of
+        (start_line, end_line) tuples, both included.
+
+        If the whole file is in the cache the lines are taken from there,
+        otherwise only the requested lines are blamed, with a single
+        "git blame" with one -L option for each range
+        """
+        line_ranges = LineRanges(line_ranges)
+
+        if not line_ranges:
+            return BlameResult.from_records([])
+
+        commit_hash = self.resolve(revision)
+
+        result = self._load(self._entry_path(commit_hash, path))
+        if result is not None:
+            self._count('hits')
+            return result.select(line_ranges)
+
+        entry_path = self._entry_path(commit_hash, path, line_ranges)
+
+        result = self._load(entry_path)
+        if result is not None:
+            self._count('hits')
+            return result
+
+        self._count('misses')
+
+        range_options = []
+        for start_line, end_line in line_ranges:
+            range_options += ['-L', '{},{}'.format(start_line, end_line)]
+
+        result = BlameResult.from_records(stream_line_porcelain(
+            self.repo_path, *(range_options + [commit_hash, '--', path])))
+
+        self._store(entry_path, result.to_bytes())
+
+        return result
+
+    def cached(self, revision, path):
+        """
+        Returns True if the blame of the file at the given revision
+        is already in the cache
+        """
+        return os.path.exists(self._entry_path(self.resolve(revision), path))
+
+    def put(self, revision, path, result):
+        """
+        Stores in the cache a BlameResult computed elsewhere, for example
+        by the forward blame engine
+        """
+        self._store(self._entry_path(self.resolve(revision), path),
+                    result.to_bytes())
+
+    def _store(self, entry_path, data):
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+
+        # Write to a temporary file first, so that an interrupted run
+        # never leaves a truncated entry behind
+        tmp_path = '{}.{}.tmp'.format(entry_path, os.getpid())
+        with open(tmp_path, 'wb') as entry:
+            entry.write(data)
+
+        with self._lock:
+            try:
+                old_size = os.path.getsize(entry_path)
+            except OSError:
+                old_size = None
+            os.replace(tmp_path, entry_path)
+
+            if old_size is None:
+                self._add('entries', 1)
+                old_size = 0
+            self._add('bytes', len(data) - old_size)
+
+            # Only one process at a time evicts entries
+            evict = self._get('bytes') > self.max_bytes and \
+                not self._evicting.value
+            if evict:
+                self._evicting.value = 1
+
+        if evict:
+            try:
+                self._evict()
+            finally:
+                with self._lock:
+                    self._evicting.value = 0
+
+    def _evict(self):
+        """
+        Removes the least recently used entries until the cache fits in
+        evict_ratio * max_bytes. The entries are read from the cache
+        directory, since they are stored by all the processes, without
+        holding the lock, which is only taken to remove each entry (the
+        entries used since they were read are kept)
+        """
+        max_bytes = int(self.max_bytes * evict_ratio)
+
+        for last_used, _, entry_path in sorted(self._entries()):
+            with self._lock:
+                if self._get('bytes') <= max_bytes:
+                    break
+
+                try:
+                    stat = os.stat(entry_path)
+                    if stat.st_mtime > last_used:
+                        continue
+                    os.remove(entry_path)
+                except OSError:
+                    continue
+
+                self._add('entries', -1)
+                self._add('bytes', -stat.st_size)
+                self._add('evictions', 1)
+
+    def stats(self):
+        """
+        Returns the counters of the cache, summed over all the processes
+        """
+        with self._lock:
+            return {name: self._get(name) for name in counter_names}
@@ -0,0 +1,134 @@
+"""
+Durable checkpoints of the stages of a long analysis, used to resume it
+after a crash instead of starting again from scratch.
+
+Each stage stores its whole result once it's completed, while the stages
+made of many independent units (e.g. the files of a release) can also
+store the result of each unit as soon as it's computed, in an append-only
+log. The checkpoints are valid only for the configuration they were
+computed with: when the configuration (or the format of the checkpoints)
+changes, they are removed.
+"""
+
+import os
+import json
+import pickle
+import shutil
+import hashlib
+
+# Version of the format of the checkpoints, to be increased
+# when it changes to invalidate the existing checkpoints
+checkpoint_format_version = 1
+
+
+class UnitLog(object):
+    """
+    Append-only log of the (unit, result) pairs of a stage
+    """
+
+    def __init__(self, path, valid_size):
+        self.file = open(path, 'ab')
+        # Remove the last record if it was written only partially
+        self.file.truncate(valid_size)
+
+    def add(self, unit, result):
+        pickle.dump((unit, result), self.file,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+        self.file.flush()
+
+    def close(self):
+        os.fsync(self.file.fileno())
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Checkpoints(object):
+    """
+    Checkpoints of the stages of an analysis stored in directory, for the
+    given configuration (a JSON-serializable dictionary).
+
+    Unless resume is True the existing checkpoints are removed, so that
+    the analysis starts from scratch
+    """
+
+    def __init__(self, directory, config, resume=False):
+        self.directory = directory
+        self.config_hash = hashlib.sha1(json.dumps(
+            [checkpoint_format_version, config],
+            sort_keys=True).encode('utf-8')).hexdigest()
+
+        manifest_path = os.path.join(directory, 'manifest.json')
+
+        try:
+            with open(manifest_path) as manifest:
+                valid = json.load(manifest)['config_hash'] == self.config_hash
+        except (OSError, ValueError, KeyError):
+            valid = False
+
+        self.resumed = resume and valid
+
+        if not self.resumed:
+            shutil.rmtree(directory, ignore_errors=True)
+            os.makedirs(directory)
+            self._write(manifest_path, json.dumps(
+                {'config_hash': self.config_hash,
+                 'config': config}).encode('utf-8'))
+
+    def _path(self, stage, extension):
+        return os.path.join(self.directory,
+                            '{}.{}'.format(stage, extension))
+
+    @staticmethod
+    def _write(path, data):
+        # Write to a temporary file first, so that an interrupted run
+        # never leaves a truncated checkpoint behind
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def has(self, stage):
+        return os.path.exists(self._path(stage, 'pickle'))
+
+    def load(self, stage):
+        """
+        Returns the result of a completed stage
+        """
+        with open(self._path(stage, 'pickle'), 'rb') as f:
+            return pickle.load(f)
+
+    def save(self, stage, result):
+        """
+        Stores the result of a completed stage
+        """
+        self._write(self._path(stage, 'pickle'),
+                    pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def open_units(self, stage):
+        """
+        Returns the dictionary of the results of the units of the stage
+        that were already computed, and the UnitLog used to store the
+        results of the next units
+        """
+        path = self._path(stage, 'units')
+        results = {}
+        valid_size = 0
+
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                while True:
+                    try:
+                        unit, result = pickle.load(f)
+                    except (EOFError, pickle.UnpicklingError, ValueError):
+                        break
+                    results[unit] = result
+                    valid_size = f.tell()
+
+        return results, UnitLog(path, valid_size)
@@ -0,0 +1,202 @@
+"""
+Typed columnar output of the results.
+
+The rows are written streaming, a batch of columns at a time, to Parquet
+files when the pyarrow library is installed, and otherwise to compressed
+CSV files (with zstd when the zstandard library is installed, with gzip
+if not). In the Parquet files every column keeps its type (integers,
+floats, booleans or strings, where None is a missing value), so they are
+loaded without parsing any text.
+
+The files of many projects and releases can be kept in a single dataset,
+partitioned like
+
+    dataset/project=hadoop/release=release-2.4.1/part-0.parquet
+
+which pyarrow, Spark and the arrow package of R read as a single table,
+with the partition keys as columns.
+"""
+
+import os
+import csv
+import gzip
+from urllib.parse import quote
+import numpy as np
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Extension of the files of each format
+extensions = {
+    'parquet': '.parquet',
+    'csv.zst': '.csv.zst',
+    'csv.gz': '.csv.gz',
+    'csv': '.csv'
+}
+
+# Compressed formats, from the preferred one
+columnar_formats = ['parquet', 'csv.zst', 'csv.gz']
+
+# Rows written at a time
+batch_size = 65536
+
+
+def default_format():
+    """
+    Returns the preferred compressed format among the available ones
+    """
+    if pyarrow is not None:
+        return 'parquet'
+    if zstandard is not None:
+        return 'csv.zst'
+    return 'csv.gz'
+
+
+def arrow_type(dtype):
+    """
+    Returns the Arrow type of the values of a field, given as a NumPy
+    type (e.g. np.int32) or str
+    """
+    if dtype is str:
+        return pyarrow.string()
+    return pyarrow.from_numpy_dtype(np.dtype(dtype))
+
+
+def partition_path(root, partition, file_format, part=0):
+    """
+    Returns the path of a file of the dataset in the root directory,
+    given the partition as a list of (key, value) pairs. The values are
+    URL-encoded, like pyarrow does, so any value is a valid directory name
+    """
+    directories = ['{}={}'.format(key, quote(str(value), safe=''))
+                   for key, value in partition]
+
+    return os.path.join(root, *directories, 'part-{}{}'.format(
+        part, extensions[file_format]))
+
+
+class ColumnarWriter(object):
+    """
+    Writes rows to a file of the given format ('auto' for the preferred
+    one), given the (name, type) of the fields, where the type is a NumPy
+    type (e.g. np.int32) or str.
+
+    The rows are given either as whole columns with write_columns, or one
+    at a time with write_row, in which case they are buffered and written
+    in batches. The file is written in a temporary file, which is moved to
+    the final path only when the writer is closed without errors, so
+    readers of a dataset never see incomplete files
+    """
+
+    def __init__(self, path, fields, file_format='auto'):
+        if file_format == 'auto':
+            file_format = default_format()
+
+        if file_format == 'parquet' and pyarrow is None:
+            raise ImportError("The parquet format requires the pyarrow "
+                              "library to be installed")
+        if file_format == 'csv.zst' and zstandard is None:
+            raise ImportError("The csv.zst format requires the zstandard "
+                              "library to be installed")
+
+        self.path = path
+        self.fields = fields
+        self.format = file_format
+        self._rows = []
+
+        # The name starts with a dot, so that pyarrow skips the file if
+        # it reads the dataset in the meantime
+        directory, name = os.path.split(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._tmp_path = os.path.join(directory, '.{}.tmp'.format(name))
+
+        if file_format == 'parquet':
+            self._schema = pyarrow.schema(
+                [(name, arrow_type(dtype)) for name, dtype in fields])
+            self._writer = pyarrow.parquet.ParquetWriter(
+                self._tmp_path, self._schema, compression='zstd')
+        else:
+            if file_format == 'csv.zst':
+                self._file = zstandard.open(self._tmp_path, 'wt',
+                                            newline='')
+            elif file_format == 'csv.gz':
+                self._file = gzip.open(self._tmp_path, 'wt', newline='')
+            else:
+                self._file = open(self._tmp_path, 'w', newline='')
+
+            self._writer = csv.writer(self._file, delimiter=',')
+            self._writer.writerow([name for name, _ in fields])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(discard=exc_type is not None)
+
+    def write_columns(self, columns):
+        """
+        Writes the rows given as a dictionary with a sequence (a list or
+        a NumPy array) of values for each field
+        """
+        self.flush()
+
+        if self.format == 'parquet':
+            self._writer.write_table(pyarrow.table(
+                [pyarrow.array(columns[name], type=arrow_type(dtype))
+                 for name, dtype in self.fields], schema=self._schema))
+        else:
+            self._writer.writerows(zip(*(
+                columns[name].tolist() if isinstance(columns[name],
+                                                     np.ndarray)
+                else columns[name] for name, _ in self.fields)))
+
+    def write_row(self, row):
+        """
+        Writes a row given as a dictionary with the value of each field
+        """
+        self._rows.append(row)
+
+        if len(self._rows) >= batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the rows buffered by write_row
+        """
+        if not self._rows:
+            return
+
+        rows, self._rows = self._rows, []
+        self.write_columns({name: [row[name] for row in rows]
+                            for name, _ in self.fields})
+
+    def close(self, discard=False):
+        """
+        Writes the buffered rows and moves the file to its final path,
+        or deletes it if discard is True
+        """
+        if self._writer is None:
+            return
+
+        if not discard:
+            self.flush()
+
+        if self.format == 'parquet':
+            self._writer.close()
+        else:
+            self._file.close()
+        self._writer = None
+
+        if discard:
+            os.remove(self._tmp_path)
+        else:
+            os.replace(self._tmp_path, self.path)
@@ -0,0 +1,282 @@
+"""
+Forward blame engine
+
+Instead of running "git blame" from scratch at every revision we are
+interested in, we walk the history of a file forward only once, keeping
+for each line of the file the commit that introduced it. The array of
+line origins is updated at each commit using the hunks of its -U0 diff,
+so that the blame of the file at any revision of its history becomes a
+simple lookup.
+"""
+
+from blame_cache import BlameResult
+from git_history import iter_git_lines, parse_hunk_header
+
+# Every commit header in the log output starts with this marker
+commit_marker = '\x00'
+
+
+def unchanged_lines(hunks, old_length):
+    """
+    Given the hunks of a -U0 diff and the number of lines of the old
+    version of the file, yields a (new_index, old_index) pair, 0-based,
+    for each line that was not changed by the diff
+    """
+    old_index, new_index = 0, 0
+
+    for old_start, old_count, _, new_count in hunks:
+        # When no line is removed, old_start is the line after which
+        # the new lines are added, otherwise it is the first removed line
+        hunk_old_index = old_start - 1 if old_count else old_start
+
+        while old_index < hunk_old_index:
+            yield new_index, old_index
+            old_index += 1
+            new_index += 1
+
+        old_index += old_count
+        new_index += new_count
+
+    while old_index < old_length:
+        yield new_index, old_index
+        old_index += 1
+        new_index += 1
+
+
+def new_length(hunks, old_length):
+    """
+    Returns the number of lines of the file after applying the hunks
+    """
+    return old_length + sum(new_count - old_count
+                            for _, old_count, _, new_count in hunks)
+
+
+class ForwardBlame(object):
+    """
+    Blame of a file at several revisions, computed with a single
+    forward walk over the history of the file.
+
+    The history is the one that "git blame" follows: the commits that
+    changed the file, with merges that kept the file as in one of
+    their parents simplified away, and following the file through
+    renames to its previous path.
+    """
+
+    def __init__(self, git, path, revisions):
+        self.git = git
+        self.path = path
+        self.revisions = list(revisions)
+
+        # Commit in the simplified history of the file corresponding
+        # to each revision, None if the file doesn't exist there
+        self._representatives = {}
+
+        # Author email and time of each commit of the history
+        self._authors = {}
+
+        # Line origins of the file at each commit that we still need,
+        # None if the file doesn't exist at that commit.
+        # Each origin is a (commit, filename) tuple shared by all the
+        # lines that have the same origin
+        self._states = {}
+
+        self._walk()
+
+    def _representative(self, revision):
+        """
+        Returns the most recent commit reachable from the revision
+        that changed the file, or None if the file never existed
+        """
+        output = str(self.git('rev-list', '-1', revision, '--',
+                              self.path)).strip()
+
+        return output or None
+
+    def _walk(self):
+        for revision in self.revisions:
+            self._representatives[revision] = self._representative(revision)
+
+        wanted = tuple(set(c for c in self._representatives.values() if c))
+
+        if not wanted:
+            return
+
+        # Simplified history of the file, where the parents of each commit
+        # are rewritten to the most recent ancestors that changed the file
+        rewritten_parents = {}
+        cmd = ('rev-list', '--topo-order', '--reverse', '--parents') + \
+            wanted + ('--', self.path)
+        for line in iter_git_lines(self.git, *cmd):
+            commit_hash, *parents = line.split()
+            rewritten_parents[commit_hash] = parents
+
+        # Read the same history from the oldest commit to the newest,
+        # with the actual parents of each commit and the hunks of each
+        # (non-merge) commit with respect to its parent
+        cmd = ('--no-pager', 'log', '--topo-order', '--reverse',
+               '--no-renames', '-p', '--unified=0', '--no-color',
+               '--format=%x00%H%x00%P%x00%aE%x00%at') + wanted + \
+              ('--', self.path)
+
+        history = []
+        for line in iter_git_lines(self.git, *cmd):
+            if line.startswith(commit_marker):
+                _, commit_hash, parents, author_email, author_time = \
+                    line.split(commit_marker)
+                self._authors[commit_hash] = (author_email, int(author_time))
+                history.append({'commit': commit_hash,
+                                'parents': parents.split(),
+                                'rewritten_parents':
+                                    rewritten_parents[commit_hash],
+                                'hunks': [],
+                                'new_file': False,
+                                'deleted_file': False})
+            elif line.startswith('new file mode'):
+                history[-1]['new_file'] = True
+            elif line.startswith('deleted file mode'):
+                history[-1]['deleted_file'] = True
+            else:
+                hunk = parse_hunk_header(line)
+                if hunk is not None:
+                    history[-1]['hunks'].append(hunk)
+
+        # Number of children still to be processed for each commit, used
+        # to drop the line origins that are no longer needed
+        pending_children = {}
+        for parents in rewritten_parents.values():
+            for parent in parents:
+                pending_children[parent] = pending_children.get(parent, 0) + 1
+
+        for commit in history:
+            self._states[commit['commit']] = self._apply(commit)
+
+            for parent in commit['rewritten_parents']:
+                pending_children[parent] -= 1
+                if pending_children[parent] == 0 and parent not in wanted:
+                    self._states.pop(parent, None)
+
+    def _apply(self, commit):
+        """
+        Computes the line origins of the file at the given commit from
+        the line origins at its parents, in the same way "git blame"
+        passes the lines of a commit to its parents
+        """
+        commit_hash = commit['commit']
+        parents = commit['parents']
+
+        if commit['deleted_file']:
+            return None
+
+        # For each parent we need the line origins at the parent and the
+        # hunks of the diff between the parent and the commit
+        sources = []
+
+        if len(parents) > 1:
+            # Merges have no diff in the log output, so we diff the file
+            # against each parent separately
+            for parent in parents:
+                parent_origins = self._states.get(
+                    self._representative(parent))
+
+                if parent_origins is not None:
+                    sources.append((parent_origins,
+                                    self._diff_hunks(parent, self.path,
+                                                     commit_hash)))
+                else:
+                    renamed_source = self._renamed_source(parent, commit_hash)
+                    if renamed_source is not None:
+                        sources.append(renamed_source)
+        elif commit['rewritten_parents'] and not commit['new_file']:
+            sources.append((self._states[commit['rewritten_parents'][0]],
+                            commit['hunks']))
+        elif parents:
+            # The file was created by this commit, maybe by renaming
+            # another file
+            renamed_source = self._renamed_source(parents[0], commit_hash)
+            if renamed_source is not None:
+                sources.append(renamed_source)
+
+        if not sources:
+            # All the lines of the file come from this commit
+            sources.append(([], [(0, 0, 1, self._line_count(commit_hash))]))
+
+        origins = None
+        own_origin = (commit_hash, self.path)
+
+        for parent_origins, hunks in sources:
+            if origins is None:
+                origins = [None] * new_length(hunks, len(parent_origins))
+
+            for new_index, old_index in unchanged_lines(hunks,
+                                                        len(parent_origins)):
+                if origins[new_index] is None:
+                    origins[new_index] = parent_origins[old_index]
+
+        return [origin if origin is not None else own_origin
+                for origin in origins]
+
+    def _line_count(self, commit_hash):
+        """
+        Returns the number of lines of the file at the given commit
+        """
+        content = str(self.git('--no-pager', 'show',
+                               '{}:{}'.format(commit_hash, self.path)))
+
+        return content.count('\n') + (1 if content[-1:] not in ('', '\n')
+                                       else 0)
+
+    def _diff_hunks(self, parent, parent_path, commit_hash):
+        """
+        Returns the hunks of the diff between the file at parent_path in
+        the parent commit and the file in the given commit
+        """
+        cmd = ('--no-pager', 'diff', '--unified=0', '--no-color',
+               '{}:{}'.format(parent, parent_path),
+               '{}:{}'.format(commit_hash, self.path))
+
+        return [hunk for hunk in (parse_hunk_header(line) for line
+                                  in iter_git_lines(self.git, *cmd))
+                if hunk is not None]
+
+    def _renamed_source(self, parent, commit_hash):
+        """
+        If the file was created by renaming another file of the parent
+        in the given commit, returns the line origins of the renamed file
+        at the parent commit together with the hunks of the diff between
+        the two files. Otherwise returns None
+        """
+        cmd = ('--no-pager', 'diff', '--name-status', '-M',
+               '--diff-filter=R', parent, commit_hash)
+
+        for line in str(self.git(*cmd)).split('\n')[:-1]:
+            _, old_path, new_path = line.split('\t')
+
+            if new_path == self.path:
+                old_blame = ForwardBlame(self.git, old_path, [parent])
+                old_origins = old_blame._states.get(
+                    old_blame._representatives[parent])
+
+                if old_origins is None:
+                    return None
+
+                self._authors.update(old_blame._authors)
+
+                return old_origins, self._diff_hunks(parent, old_path,
+                                                     commit_hash)
+
+        return None
+
+    def blame(self, revision):
+        """
+        Returns the BlameResult of the file at one of the revisions given
+        when creating the engine, or None if the file doesn't exist there
+        """
+        origins = self._states.get(self._representatives[revision])
+
+        if origins is None:
+            return None
+
+        return BlameResult.from_records(
+            (commit_hash, index + 1) + self._authors[commit_hash] +
+            (filename,)
+            for index, (commit_hash, filename) in enumerate(origins))
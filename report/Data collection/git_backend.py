@@ -0,0 +1,303 @@
+"""
+Repository backends used to read commits, trees and the files changed by
+commits without spawning a new git process for every request.
+
+Two implementations are available:
+- CatFileBackend keeps a few long-lived git processes open
+  ("git cat-file --batch", "git cat-file --batch-check" and
+  "git diff-tree --stdin") and talks to them through pipes
+- Pygit2Backend reads the repository in-process with the pygit2
+  library, which is an optional dependency
+
+Use open_backend to get the backend by name.
+"""
+
+import os
+import subprocess
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
+
+# Line written to the diff-tree processes after each request. It is echoed
+# back as is, since it's not a commit, and it cannot be confused with a diff
+# line, so we use it to know where the output of the request ends
+end_of_request = b'#end-of-request\n'
+
+
+def parse_tz_offset(offset):
+    """
+    Converts a git timezone offset, e.g. "+0200", to a timezone
+    """
+    sign = -1 if offset.startswith('-') else 1
+    minutes = int(offset[1:3]) * 60 + int(offset[3:5])
+
+    return timezone(sign * timedelta(minutes=minutes))
+
+
+class GitBackend(ABC):
+    """
+    Interface of the repository backends
+    """
+
+    @abstractmethod
+    def commit_info(self, revision):
+        """
+        Returns a dictionary with the hash, the parents, the author email
+        and the author date (as a timezone aware datetime) of a commit
+        """
+
+    def tag_date(self, tag):
+        """
+        Returns the author date of the commit pointed by a tag,
+        like "git log -1 --format=%ai tags/<tag>"
+        """
+        return self.commit_info('tags/{}'.format(tag))['author_date']
+
+    @abstractmethod
+    def list_files(self, revision):
+        """
+        Returns the paths of all the files at the given revision,
+        like "git ls-tree --name-only -r <revision>"
+        """
+
+    @abstractmethod
+    def changed_files(self, commit):
+        """
+        Returns the paths of the files changed by a commit with respect to
+        its first parent, like "git show --name-only --pretty= <commit>"
+        """
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CatFileBackend(GitBackend):
+    """
+    Backend that keeps long-lived git processes open.
+
+    The processes are started lazily, and started again in processes
+    forked after their creation (e.g. the workers of GitTaskExecutor),
+    since the pipes cannot be shared between different processes.
+    """
+
+    def __init__(self, repo_path):
+        self.repo_path = repo_path
+        self._processes = {}
+        self._pid = None
+
+    def _process(self, name, *args):
+        if self._pid != os.getpid():
+            # Forget the processes of the parent process
+            self._processes = {}
+            self._pid = os.getpid()
+
+        if name not in self._processes:
+            self._processes[name] = subprocess.Popen(
+                ('git',) + args, cwd=self.repo_path,
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+        return self._processes[name]
+
+    def close(self):
+        if self._pid == os.getpid():
+            for process in self._processes.values():
+                process.stdin.close()
+                process.wait()
+        self._processes = {}
+
+    def _cat_file(self, revision):
+        """
+        Returns the (type, content) of the object, or None if it's missing
+        """
+        process = self._process('batch', 'cat-file', '--batch')
+        process.stdin.write(revision.encode('utf-8') + b'\n')
+        process.stdin.flush()
+
+        header = process.stdout.readline().split()
+
+        if len(header) != 3:
+            # "<revision> missing" or "<revision> ambiguous"
+            return None
+
+        _, object_type, size = header
+        content = process.stdout.read(int(size))
+        # Skip the newline after the content
+        process.stdout.read(1)
+
+        return object_type.decode('ascii'), content
+
+    def commit_info(self, revision):
+        obj = self._cat_file('{}^{{commit}}'.format(revision))
+        if obj is None:
+            raise KeyError(revision)
+
+        headers, _, _ = obj[1].partition(b'\n\n')
+        parents = []
+
+        for header in headers.decode('utf-8', 'replace').split('\n'):
+            key, _, value = header.partition(' ')
+
+            if key == 'parent':
+                parents.append(value)
+            elif key == 'author':
+                # author Name <email> timestamp offset
+                identity, _, date = value.rpartition('> ')
+                author_email = identity.partition('<')[2]
+                timestamp, offset = date.split()
+                author_date = datetime.fromtimestamp(int(timestamp),
+                                                     parse_tz_offset(offset))
+
+        return {'hash': self._resolve(revision),
+                'parents': parents,
+                'author_email': author_email,
+                'author_date': author_date}
+
+    def _resolve(self, revision):
+        process = self._process('batch-check', 'cat-file', '--batch-check')
+        process.stdin.write(
+            '{}^{{commit}}\n'.format(revision).encode('utf-8'))
+        process.stdin.flush()
+
+        return process.stdout.readline().split()[0].decode('ascii')
+
+    def list_files(self, revision):
+        files = []
+        to_visit = [('{}^{{tree}}'.format(revision), '')]
+
+        while to_visit:
+            tree, prefix = to_visit.pop()
+            _, content = self._cat_file(tree)
+
+            for mode, name, object_id in self._tree_entries(content):
+                if mode == b'40000':
+                    to_visit.append((object_id, prefix + name + '/'))
+                else:
+                    files.append(prefix + name)
+
+        return sorted(files)
+
+    @staticmethod
+    def _tree_entries(content):
+        """
+        Yields the (mode, name, object_id) entries of a raw tree object
+        """
+        position = 0
+        while position < len(content):
+            space = content.index(b' ', position)
+            nul = content.index(b'\0', space)
+            mode = content[position:space]
+            name = content[space + 1:nul].decode('utf-8', 'surrogateescape')
+            object_id = content[nul + 1:nul + 21].hex()
+            position = nul + 21
+
+            yield mode, name, object_id
+
+    def _request_diff_tree(self, name, args, commit):
+        """
+        Sends the commit to the given diff-tree process and
+        returns its output lines
+        """
+        process = self._process(name, 'diff-tree', '--stdin', '--root',
+                                '--no-commit-id', '-r', *args)
+        # diff-tree only reads full hashes from its input, and would echo
+        # anything else (e.g. an abbreviated hash) as it is
+        commit_hash = self._resolve(commit)
+        process.stdin.write(commit_hash.encode('utf-8') + b'\n' +
+                            end_of_request)
+        process.stdin.flush()
+
+        lines = []
+        for line in iter(process.stdout.readline, end_of_request):
+            lines.append(line.decode('utf-8', 'surrogateescape').rstrip('\n'))
+
+        return lines
+
+    def changed_files(self, commit):
+        return [line for line in self._request_diff_tree(
+            'diff-tree-names', ('-M', '--cc', '--name-only'), commit)
+            if line]
+
+class Pygit2Backend(GitBackend):
+    """
+    Backend that reads the repository in-process with pygit2
+    """
+
+    def __init__(self, repo_path):
+        if pygit2 is None:
+            raise ImportError("The pygit2 backend requires the pygit2 "
+                              "library to be installed")
+
+        self.repo = pygit2.Repository(repo_path)
+
+    def _commit(self, revision):
+        return self.repo.revparse_single(revision).peel(pygit2.Commit)
+
+    def commit_info(self, revision):
+        commit = self._commit(revision)
+        author = commit.author
+        tz = timezone(timedelta(minutes=author.offset))
+
+        return {'hash': str(commit.id),
+                'parents': [str(parent) for parent in commit.parent_ids],
+                'author_email': author.email,
+                'author_date': datetime.fromtimestamp(author.time, tz)}
+
+    def list_files(self, revision):
+        files = []
+        to_visit = [(self._commit(revision).tree, '')]
+
+        while to_visit:
+            tree, prefix = to_visit.pop()
+
+            for entry in tree:
+                if entry.type_str == 'tree':
+                    to_visit.append((self.repo[entry.id],
+                                     prefix + entry.name + '/'))
+                else:
+                    files.append(prefix + entry.name)
+
+        return sorted(files)
+
+    def _diff(self, commit, parent):
+        if parent is not None:
+            return self.repo.diff(parent, commit)
+
+        return commit.tree.diff_to_tree(swap=True)
+
+    def changed_files(self, commit):
+        commit = self._commit(commit)
+        changed = None
+
+        # Like "git show", for merges we list only the files that differ
+        # from all the parents
+        for parent in commit.parents or [None]:
+            diff = self._diff(commit, parent)
+            diff.find_similar()
+            paths = [delta.new_file.path for delta in diff.deltas]
+
+            changed = paths if changed is None else \
+                [path for path in changed if path in paths]
+
+        return changed
+
+backends = {
+    'cat-file': CatFileBackend,
+    'pygit2': Pygit2Backend
+}
+
+
+def open_backend(repo_path, kind='cat-file'):
+    """
+    Returns the backend with the given name for the repository
+    """
+    return backends[kind](repo_path)
@@ -0,0 +1,87 @@
+"""
+Bounded process pool used to run the per-file git tasks of the scripts
+on all the cores of the machine.
+
+The worker processes are forked from the main process at the start of
+each map, so they inherit its state at that point (e.g. the baked git
+command and the blame cache) and the task functions can be defined
+directly in the scripts, even after a previous map. Each task should parse
+the output of git inside the worker and return only the (small) result,
+which is then merged into the main data structures by the main process.
+"""
+
+import os
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+def default_jobs():
+    """
+    Returns the default number of parallel jobs, one for each core
+    """
+    return os.cpu_count() or 1
+
+
+class GitTaskExecutor(object):
+    """
+    Runs tasks on a pool of jobs worker processes.
+
+    At most max_pending tasks are submitted to the pool at the same
+    time, so that huge lists of tasks don't pile up in memory.
+    With a single job the tasks are run in the main process.
+    """
+
+    def __init__(self, jobs=None, max_pending=None):
+        self.jobs = jobs or default_jobs()
+        self.max_pending = max_pending or self.jobs * 4
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _new_pool(self):
+        # Workers forked by a previous map would not know the functions
+        # defined afterwards, so each map forks its own workers
+        self.close()
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.jobs,
+            mp_context=multiprocessing.get_context('fork'))
+
+        return self._pool
+
+    def map(self, function, tasks):
+        """
+        Calls function(*task) for each task (a tuple of arguments) and
+        yields a (task, result) pair for each of them, in the same order
+        of the tasks regardless of the order in which they complete
+        """
+        if self.jobs == 1:
+            for task in tasks:
+                yield task, function(*task)
+            return
+
+        pool = self._new_pool()
+        pending = deque()
+
+        try:
+            for task in tasks:
+                pending.append((task, pool.submit(function, *task)))
+
+                if len(pending) >= self.max_pending:
+                    task, future = pending.popleft()
+                    yield task, future.result()
+
+            while pending:
+                task, future = pending.popleft()
+                yield task, future.result()
+        finally:
+            self.close()
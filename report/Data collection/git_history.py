@@ -0,0 +1,431 @@
+"""
+Helpers to compute history-based metrics from a single walk over
+the git log, instead of running one git command per file
+"""
+
+import re
+import subprocess
+from collections import defaultdict, Counter
+from release_index import ReleaseIndex
+
+# Every commit header in the log output starts with this marker, so it
+# cannot be confused with a file name
+commit_marker = '\x00'
+
+# Marker of the commit headers in the output of "git log -z", which
+# cannot be the first character of the other fields
+log_commit_marker = b'\x01'
+
+# Format of the commit headers of "git log -z": the hash, the parents,
+# the author email and the committer time of the commit
+log_commit_format = '--format=%x01%H%x00%P%x00%ae%x00%ct'
+
+# Size of the chunks in which the output of "git log -z" is read
+log_chunk_size = 1024 * 1024
+
+# Pattern used to identify the hunk headers in the -U0 diffs
+hunk_header_pattern = re.compile(
+    r'^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@')
+
+
+def iter_git_lines(git, *args):
+    """
+    Runs the given git command and yields its output one line
+    at a time, without the trailing newline, so that the whole
+    output never needs to be kept in memory
+    """
+    for line in git(*args, _iter=True):
+        yield line.rstrip('\n')
+
+
+def iter_commits_with_files(git, *revisions):
+    """
+    Walks the history reachable from the given revisions once,
+    in topological order from the oldest commit to the newest,
+    and yields for each commit a tuple
+    (commit_hash, parent_hashes, author_email, changed_files)
+
+    The changed files of a merge are the ones that differ from all its
+    parents (like in "git log -c"), e.g. the files whose conflicts were
+    resolved or that were changed by the merge itself. These are the
+    merges that "git log -- <file>" shows
+    """
+    cmd = ('--no-pager', 'log', '--topo-order', '--reverse', '--no-renames',
+           '-c', '--name-only',
+           '--format=%x00%H%x00%P%x00%ae') + revisions
+
+    commit = None
+
+    for line in iter_git_lines(git, *cmd):
+        if line.startswith(commit_marker):
+            if commit is not None:
+                yield commit
+
+            _, commit_hash, parents, author_email = line.split(
+                commit_marker)
+            commit = (commit_hash, parents.split(), author_email, [])
+        elif line and commit is not None:
+            commit[3].append(line)
+
+    if commit is not None:
+        yield commit
+
+
+def parse_hunk_header(line):
+    """
+    Returns the (old_start, old_count, new_start, new_count) tuple of
+    a hunk header line, or None if the line is not a hunk header
+    """
+    match = hunk_header_pattern.match(line)
+
+    if match is None:
+        return None
+
+    old_start, old_count, new_start, new_count = match.groups()
+
+    return (int(old_start),
+            int(old_count) if old_count is not None else 1,
+            int(new_start),
+            int(new_count) if new_count is not None else 1)
+
+
+def resolve_commit(git, revision):
+    """
+    Returns the hash of the commit pointed by the given revision
+    """
+    return str(git('rev-parse', '{}^{{commit}}'.format(revision))).strip()
+
+
+def compute_ddev(git, release_tags, authors, base='origin'):
+    """
+    Computes DDEV (number of distinct developers that contributed to
+    a file since the beginning of time) for every file at every release,
+    which replaces running
+
+        git shortlog -s --email <base>..<release> -- <file>
+
+    for each file of each release and counting the lines of the output.
+    The developers are identified by their ids in the given AuthorTable,
+    like in ADEV, OWN and MINOR, so the emails are compared ignoring their
+    case and the aliases count as one developer, while shortlog tells
+    apart the different names and emails that the .mailmap doesn't merge.
+
+    The authors of the merges that changed the file with respect to all
+    their parents are counted, like shortlog does. The only other
+    difference is that, when a merge kept the file of one of its parents
+    as it was (e.g. a conflict resolved by taking one side), git
+    simplifies the history of the file following only that parent, so
+    shortlog skips the commits that changed the file on the other side,
+    while here they are counted.
+
+    The history is walked only once. We keep for each file the set of
+    distinct authors and let it grow while walking forward: when a release
+    contains the previous one (which is the common case) only the commits
+    made in between are added to the sets, otherwise the sets are rebuilt
+    from the commits reachable from the release.
+
+    Returns a dictionary with the release tags as keys and, as values,
+    a dictionary with the DDEV of every file changed before the release
+    """
+    if not release_tags:
+        return {}
+
+    tag_commits = {tag: resolve_commit(git, tag) for tag in release_tags}
+
+    # Store the author, files and parents of all the commits made
+    # after the base and before the last release
+    revisions = tuple(release_tags)
+    if base is not None:
+        revisions = ('^{}'.format(base),) + revisions
+
+    commit_info = {}
+    for commit_hash, parents, author_email, files in \
+            iter_commits_with_files(git, *revisions):
+        commit_info[commit_hash] = (parents, authors.id(author_email), files)
+
+    def reachable_commits(commit_hash):
+        """
+        Returns the set of walked commits reachable from the given commit
+        """
+        reachable = set()
+        to_visit = [commit_hash]
+
+        while to_visit:
+            current = to_visit.pop()
+            if current in reachable or current not in commit_info:
+                continue
+
+            reachable.add(current)
+            to_visit.extend(commit_info[current][0])
+
+        return reachable
+
+    file_authors = defaultdict(set)
+    included_commits = set()
+    ddev = {}
+
+    for tag in release_tags:
+        reachable = reachable_commits(tag_commits[tag])
+
+        # If the commits seen so far are not all contained in the current
+        # release (e.g. it was cut from a different branch), start over
+        if not included_commits <= reachable:
+            file_authors = defaultdict(set)
+            included_commits = set()
+
+        new_commits = reachable - included_commits
+
+        for commit_hash in new_commits:
+            _, author_id, files = commit_info[commit_hash]
+
+            for file in files:
+                file_authors[file].add(author_id)
+
+        included_commits = reachable
+
+        # Take a snapshot of the distinct authors of each file
+        ddev[tag] = {file: len(author_ids)
+                     for file, author_ids in file_authors.items()}
+
+    return ddev
+
+
+def iter_nul_fields(chunks):
+    """
+    Yields the NUL-terminated fields of the output read in chunks
+    """
+    tail = b''
+
+    for chunk in chunks:
+        fields = (tail + chunk).split(b'\0')
+        tail = fields.pop()
+        yield from fields
+
+    if tail:
+        yield tail
+
+
+def iter_git_fields(repo_path, *args):
+    """
+    Runs "git <args>" in the repository and yields the NUL-terminated
+    fields of its output while reading it.
+
+    If git fails a subprocess.CalledProcessError is raised
+    """
+    command = ('git', '--no-pager') + args
+    process = subprocess.Popen(command, cwd=repo_path,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    try:
+        yield from iter_nul_fields(
+            iter(lambda: process.stdout.read(log_chunk_size), b''))
+        stderr = process.stderr.read()
+    finally:
+        # Also stop git if the caller stops reading early
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        process.stderr.close()
+
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command,
+                                            stderr=stderr)
+
+
+def read_commit_header(field, fields):
+    """
+    Returns the (commit_hash, parent_hashes, author_email, commit_time)
+    of the commit whose header starts with the field, reading the rest
+    of it from the fields
+    """
+    return (field[1:].decode('ascii'),
+            next(fields).decode('ascii').split(),
+            next(fields).decode('utf-8', 'replace'),
+            int(next(fields)))
+
+
+def iter_numstat_commits(repo_path, *args):
+    """
+    Runs "git log --numstat -z <args>" in the repository and yields,
+    while reading its output, a tuple
+    (commit_hash, parent_hashes, author_email, commit_time, changes) for
+    each commit, where commit_time is the committer time as an epoch and
+    changes is the list of (added_lines, removed_lines, path) of the
+    changed files.
+
+    The numbers of lines are None for binary files, and renamed files
+    have their new path. Since the output is NUL-separated, paths with
+    tabs or other special characters are read as they are.
+
+    If git fails a subprocess.CalledProcessError is raised
+    """
+    fields = iter_git_fields(repo_path, 'log', '--numstat', '-z', '-M',
+                             log_commit_format, *args)
+    commit = None
+
+    for field in fields:
+        if field.startswith(log_commit_marker):
+            if commit is not None:
+                yield commit
+
+            commit = read_commit_header(field, fields) + ([],)
+            continue
+
+        # The first file of each commit is preceded by a newline
+        added_lines, removed_lines, path = \
+            field.lstrip(b'\n').split(b'\t', 2)
+
+        # A renamed file has an empty path, followed by
+        # its old path and its new path
+        if not path:
+            next(fields)
+            path = next(fields)
+
+        commit[4].append((
+            None if added_lines == b'-' else int(added_lines),
+            None if removed_lines == b'-' else int(removed_lines),
+            path.decode('utf-8', 'surrogateescape')))
+
+    if commit is not None:
+        yield commit
+
+
+def iter_name_status_commits(repo_path, *args):
+    """
+    Runs "git log --name-status -z <args>" in the repository and yields,
+    while reading its output, a tuple
+    (commit_hash, parent_hashes, author_email, commit_time, changes) for
+    each commit, like iter_numstat_commits, where changes is the list of
+    (status, old_path, path) of the changed files.
+
+    The status is the letter of the change (e.g. A, M, D or R), and
+    old_path is the path of the file before a rename or a copy, or
+    None for the other changes.
+
+    If git fails a subprocess.CalledProcessError is raised
+    """
+    fields = iter_git_fields(repo_path, 'log', '--name-status', '-z',
+                             log_commit_format, *args)
+    commit = None
+
+    for field in fields:
+        if field.startswith(log_commit_marker):
+            if commit is not None:
+                yield commit
+
+            commit = read_commit_header(field, fields) + ([],)
+            continue
+
+        # The first file of each commit is preceded by a newline, and
+        # the status of renames and copies is followed by their score
+        status = field.lstrip(b'\n')[:1].decode('ascii')
+
+        old_path = None
+        if status in ('R', 'C'):
+            old_path = next(fields).decode('utf-8', 'surrogateescape')
+        path = next(fields).decode('utf-8', 'surrogateescape')
+
+        commit[4].append((status, old_path, path))
+
+    if commit is not None:
+        yield commit
+
+
+class ReleaseChanges(object):
+    """
+    Changes made to the files during a release: the number of commits
+    and the set of the ids of the authors of each file, its added and
+    removed lines, and the added and removed lines of all the files
+    """
+
+    def __init__(self):
+        self.commits = Counter()
+        self.authors = defaultdict(set)
+        self.added_lines = Counter()
+        self.removed_lines = Counter()
+        self.total_added_lines = 0
+        self.total_removed_lines = 0
+
+
+def compute_release_changes(repo_path, releases, authors, revision='HEAD'):
+    """
+    Computes the changes made to the files during each release, given the
+    (release, start_date, end_date) of each of them, with a single walk
+    over the history of the revision. The authors are identified by their
+    ids in the given AuthorTable.
+
+    Each commit is assigned to the releases whose development time
+    (start and end date included) contains its committer date, which is
+    equivalent to running
+
+        git log --name-only --after=<start_date> --before=<end_date>
+        git log --numstat --after=<start_date> --before=<end_date>
+
+    for each release. Returns a dictionary with the releases as keys
+    and their ReleaseChanges as values
+    """
+    releases = list(releases)
+    changes = {release: ReleaseChanges() for release, _, _ in releases}
+
+    if not releases:
+        return changes
+
+    # The dates have a precision of seconds, so widening each interval
+    # by half a second makes the index include the start and end dates
+    release_index = ReleaseIndex(
+        (release, start_date.timestamp() - 0.5, end_date.timestamp() + 0.5)
+        for release, start_date, end_date in releases)
+
+    since = min(start_date for _, start_date, _ in releases)
+    until = max(end_date for _, _, end_date in releases)
+
+    commits = iter_numstat_commits(
+        repo_path,
+        '--since=@{}'.format(int(since.timestamp())),
+        '--until=@{}'.format(int(until.timestamp()) + 1),
+        revision)
+
+    for _, _, author_email, commit_time, changed_files in commits:
+        commit_releases = release_index.find(commit_time)
+
+        if not commit_releases or not changed_files:
+            continue
+
+        author_id = authors.id(author_email)
+
+        for release in commit_releases:
+            release_changes = changes[release]
+
+            for added_lines, removed_lines, path in changed_files:
+                release_changes.commits[path] += 1
+                release_changes.authors[path].add(author_id)
+
+                # Binary files have no added and removed lines
+                if added_lines is None or removed_lines is None:
+                    continue
+
+                release_changes.added_lines[path] += added_lines
+                release_changes.removed_lines[path] += removed_lines
+                release_changes.total_added_lines += added_lines
+                release_changes.total_removed_lines += removed_lines
+
+    return changes
+
+
+def count_author_commits(repo_path, authors, *args):
+    """
+    Returns a Counter with the number of commits of each author, given
+    by the author id in the AuthorTable, with a single walk over the
+    history given by the arguments of "git log" (by default HEAD), e.g.
+    --since and --until to count only the commits of a period.
+
+    Like "git shortlog -s", all the commits are counted, merges included
+    """
+    commits = Counter()
+
+    for author_email in iter_git_fields(repo_path, 'log', '-z',
+                                        '--format=%ae', *args):
+        commits[authors.id(author_email.decode('utf-8', 'replace'))] += 1
+
+    return commits
@@ -0,0 +1,99 @@
+"""
+Persistent on-disk cache of the GitHub API responses, stored in a SQLite
+database: the decoded body of each response, with its ETag and
+Last-Modified headers and its links, by URL.
+
+A cached response is revalidated with a conditional request
+(If-None-Match and If-Modified-Since): if it didn't change, GitHub
+answers with 304 Not Modified, without a body, and doesn't count the
+request against the rate limit. The scripts run from the same directory
+share the same database, so the contributors already downloaded by one
+of them cost almost nothing to the others.
+"""
+
+import json
+import sqlite3
+from datetime import datetime, timezone
+
+schema = '''
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    data TEXT NOT NULL,
+    links TEXT NOT NULL,
+    stored TEXT NOT NULL
+);
+'''
+
+
+class CachedResponse(object):
+    """
+    Response stored in the cache, where links maps the relations of the
+    Link header to their URLs (as strings)
+    """
+
+    def __init__(self, etag, last_modified, data, links):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.data = data
+        self.links = links
+
+    def conditional_headers(self):
+        """
+        Returns the headers of the request that revalidates the response
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class GitHubCache(object):
+    """
+    SQLite database with the cached GitHub responses
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(schema)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def get(self, url):
+        """
+        Returns the CachedResponse of the URL (with its query string),
+        or None if the URL is not in the cache
+        """
+        row = self.db.execute(
+            'SELECT etag, last_modified, data, links FROM responses '
+            'WHERE url = ?', (url,)).fetchone()
+        if row is None:
+            return None
+
+        etag, last_modified, data, links = row
+        return CachedResponse(etag, last_modified, json.loads(data),
+                              json.loads(links))
+
+    def put(self, url, etag, last_modified, data, links):
+        """
+        Stores a response that can be revalidated, i.e. that has at least
+        an ETag or a Last-Modified header
+        """
+        with self.db:
+            self.db.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+                (url, etag, last_modified, json.dumps(data),
+                 json.dumps(links),
+                 datetime.now(timezone.utc).isoformat()))
@@ -0,0 +1,263 @@
+"""
+Asynchronous client of the GitHub REST API, used to retrieve the
+contributors of many repositories at the same time.
+
+At most a given number of requests are in flight at the same time, over a
+pool of keep-alive connections. GitHub tells in the headers of every
+response how many requests are left in the current window of its rate
+limit (X-RateLimit-Remaining) and when the window ends
+(X-RateLimit-Reset), so when no request is left the client waits for the
+reset instead of failing. Failed requests (connection errors, rate limiting
+and server errors) are retried after an exponential backoff with jitter,
+capped to a maximum delay, like in jira_client.
+
+The base URL of the API can be changed, for example to point the client
+to a local stub server.
+
+With a GitHubCache the responses are stored on disk, and each request of
+a URL already in the cache is a conditional request, answered with 304
+Not Modified (not counted against the rate limit) if nothing changed.
+"""
+
+import time
+import random
+import asyncio
+import aiohttp
+from yarl import URL
+
+# Statuses of the responses that are worth retrying
+retry_statuses = {429, 500, 502, 503, 504}
+
+
+class GitHubError(Exception):
+    """
+    Raised when a request to GitHub fails, and cannot (or can no more)
+    be retried
+    """
+
+
+class RateLimit(object):
+    """
+    State of the rate limit of GitHub, updated from the headers of the
+    responses. The responses of the requests made in parallel arrive in
+    any order, so within the same window the lowest number of remaining
+    requests is kept
+    """
+
+    def __init__(self):
+        self.remaining = None
+        self.reset = None
+        self._lock = asyncio.Lock()
+
+    def update(self, headers):
+        remaining = headers.get('X-RateLimit-Remaining', '')
+        reset = headers.get('X-RateLimit-Reset', '')
+
+        if not (remaining.isdigit() and reset.isdigit()):
+            return
+
+        remaining, reset = int(remaining), int(reset)
+
+        if self.reset is None or reset > self.reset:
+            self.remaining, self.reset = remaining, reset
+        elif reset == self.reset:
+            self.remaining = min(self.remaining, remaining)
+
+    async def acquire(self):
+        """
+        Waits until a request can be made, counting it as made
+        """
+        async with self._lock:
+            while self.remaining is not None:
+                # A new window started, and we don't know its state yet
+                # (the responses of the old one can still arrive)
+                if time.time() >= self.reset:
+                    self.remaining = self.reset = None
+                    break
+
+                if self.remaining > 0:
+                    self.remaining -= 1
+                    break
+
+                # (one more second, since the reset is rounded down)
+                await asyncio.sleep(self.reset - time.time() + 1)
+
+    def refund(self):
+        """
+        Gives back a request counted by acquire that GitHub didn't count,
+        like the ones answered with 304 Not Modified
+        """
+        if self.remaining is not None:
+            self.remaining += 1
+
+
+class GitHubClient(object):
+    """
+    Client of the GitHub API, to be used as an async context manager:
+
+        async with GitHubClient(token) as github:
+            contributions = await github.contributions('apache/lucene-solr')
+
+    If a GitHubCache is given, the successful responses are stored in it
+    and revalidated by the following requests of the same URL
+    """
+
+    def __init__(self, token=None, base_url='https://api.github.com',
+                 concurrency=8, max_retries=10, backoff_base=1,
+                 backoff_cap=60, timeout=60, cache=None):
+        self.token = token
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = timeout
+        self.cache = cache
+        self.rate_limit = RateLimit()
+
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        headers = {'Accept': 'application/vnd.github+json'}
+        if self.token:
+            headers['Authorization'] = 'token {}'.format(self.token)
+
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._session = aiohttp.ClientSession(
+            headers=headers,
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+        self._session = None
+
+    def _backoff(self, attempt):
+        """
+        Returns the delay before the given retry, chosen at random up to
+        an exponentially growing (but capped) value
+        """
+        return random.uniform(
+            0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    async def get(self, path, params=None):
+        """
+        Makes a GET request to the API, retrying it if it fails, and
+        returns the (status, data, links) of the response, where data is
+        the decoded JSON (None if the status is not 200) and links maps
+        the relations of the Link header (e.g. 'last') to their URLs
+        (as yarl.URL objects, like in aiohttp).
+
+        The responses with a client error (e.g. 404 for a repository that
+        doesn't exist) are returned as they are, while a response that
+        didn't change since it was cached is returned as a 200 response
+        """
+        url = URL(self.base_url + path)
+        if params:
+            url = url.with_query(params)
+
+        cached = self.cache.get(str(url)) if self.cache else None
+        headers = cached.conditional_headers() if cached else {}
+
+        for attempt in range(self.max_retries + 1):
+            delay = None
+
+            # The request is counted only when it's about to be made, so
+            # the requests waiting for the semaphore don't use the limit
+            async with self._semaphore:
+                await self.rate_limit.acquire()
+
+                try:
+                    async with self._session.get(url,
+                                                 headers=headers) as response:
+                        self.rate_limit.update(response.headers)
+                        retry_after = response.headers.get('Retry-After', '')
+
+                        # GitHub refuses the requests over the rate limit
+                        # with 403 (or 429), telling that no request is
+                        # left, or when to retry for its secondary limits
+                        exhausted = response.headers.get(
+                            'X-RateLimit-Remaining') == '0'
+
+                        if response.status in retry_statuses or (
+                                response.status == 403 and
+                                (exhausted or retry_after)):
+                            error = 'HTTP {}'.format(response.status)
+                            if retry_after.isdigit():
+                                delay = min(self.backoff_cap,
+                                            int(retry_after))
+                            elif exhausted:
+                                # acquire waits for the reset
+                                delay = 0
+                        elif response.status == 304 and cached:
+                            self.rate_limit.refund()
+                            return 200, cached.data, {
+                                rel: URL(link)
+                                for rel, link in cached.links.items()}
+                        else:
+                            data = None
+                            if response.status == 200:
+                                data = await response.json(content_type=None)
+
+                            links = {rel: link['url'] for rel, link
+                                     in response.links.items()}
+
+                            etag = response.headers.get('ETag')
+                            last_modified = response.headers.get(
+                                'Last-Modified')
+
+                            if self.cache and response.status == 200 and (
+                                    etag or last_modified):
+                                self.cache.put(
+                                    str(url), etag, last_modified, data,
+                                    {rel: str(link)
+                                     for rel, link in links.items()})
+
+                            return response.status, data, links
+                except (aiohttp.ClientError, asyncio.TimeoutError,
+                        ValueError) as e:
+                    error = repr(e)
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(delay if delay is not None
+                                    else self._backoff(attempt))
+
+        raise GitHubError('GET {} failed after {} attempts: {}'.format(
+            url, self.max_retries + 1, error))
+
+    async def contributions(self, repo, per_page=100):
+        """
+        Returns the list of the number of contributions of each contributor
+        of the repository (given as "owner/name"), or None if the repository
+        doesn't exist or has no contributors.
+
+        After the first page of results, whose Link header tells how many
+        pages there are, all the other pages are requested in parallel
+        """
+        path = '/repos/{}/contributors'.format(repo)
+
+        async def get_page(page):
+            return await self.get(path, params={'per_page': per_page,
+                                                'page': page})
+
+        status, first_page, links = await get_page(1)
+
+        if status != 200 or not first_page:
+            return None
+
+        pages = [first_page]
+
+        if 'last' in links:
+            last_page = int(links['last'].query['page'])
+
+            for status, page, _ in await asyncio.gather(
+                    *(get_page(page) for page in range(2, last_page + 1))):
+                if status != 200:
+                    raise GitHubError('GET {} failed with HTTP {}'.format(
+                        path, status))
+                pages.append(page)
+
+        return [contributor['contributions']
+                for page in pages for contributor in page]
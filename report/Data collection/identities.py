@@ -0,0 +1,143 @@
+"""
+Tables mapping the paths of the files and the authors of the commits to
+dense integer ids, so that the counters and the sets of the metrics hold
+small ints instead of hashing the same strings over and over.
+
+The same developer often commits with more than one email, so the author
+table can merge emails: the ones mapped together by the .mailmap file of
+the repository, and any group of aliases given explicitly.
+"""
+
+import os
+import re
+import sys
+
+# An entry of a .mailmap file is a "Name <email>" pair, where the name is
+# optional, followed by another optional pair used in the commits
+mailmap_pattern = re.compile(
+    r'^\s*(?:[^<#]*?)\s*<([^>]*)>(?:\s*(?:[^<#]*?)\s*<([^>]*)>)?')
+
+
+def read_mailmap(path):
+    """
+    Returns a dictionary mapping each email used in the commits to the
+    proper email of the developer, according to the .mailmap file (or an
+    empty dictionary if the file doesn't exist).
+
+    Only the emails are considered, while the entries that only change
+    the name of a developer are ignored. Like git does, the emails are
+    compared ignoring their case
+    """
+    if not os.path.exists(path):
+        return {}
+
+    email_map = {}
+
+    with open(path, encoding='utf-8', errors='replace') as mailmap:
+        for line in mailmap:
+            match = mailmap_pattern.match(line)
+
+            if match is None or match.group(2) is None:
+                continue
+
+            proper_email, commit_email = match.groups()
+            email_map[commit_email.lower()] = proper_email.lower()
+
+    return email_map
+
+
+class IdTable(object):
+    """
+    Assigns to each distinct value an integer id, starting from 0 in
+    order of first appearance
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, value_id):
+        return self.values[value_id]
+
+    def __contains__(self, value):
+        return value in self.ids
+
+    def id(self, value):
+        """
+        Returns the id of the value, assigning a new one
+        if the value was never seen
+        """
+        value_id = self.ids.get(value)
+
+        if value_id is None:
+            value_id = self.ids[value] = len(self.values)
+            self.values.append(value)
+
+        return value_id
+
+    def get(self, value, default=None):
+        """
+        Returns the id of the value, or default if the value
+        was never seen
+        """
+        return self.ids.get(value, default)
+
+
+class PathTable(IdTable):
+    """
+    Ids of the paths of the files. The paths are interned, so that each
+    of them is stored only once
+    """
+
+    def id(self, path):
+        return super().id(sys.intern(path))
+
+
+class AuthorTable(IdTable):
+    """
+    Ids of the authors, identified by their email. The emails are compared
+    ignoring their case, and the emails of the same developer share the
+    same id: the ones merged by the given .mailmap file, and the ones of
+    each group of aliases (an iterable of lists of emails).
+
+    The table keeps the canonical email of each id, which is the first
+    email of a group of aliases or the proper email of the .mailmap
+    """
+
+    def __init__(self, mailmap_path=None, aliases=()):
+        super().__init__()
+
+        self.email_map = read_mailmap(mailmap_path) if mailmap_path else {}
+
+        for group in aliases:
+            group = [email.lower() for email in group]
+
+            for email in group[1:]:
+                self.email_map[email] = group[0]
+
+        # Follow the chains of emails (e.g. an alias of an email that is
+        # mapped by the .mailmap), so that each email is mapped directly
+        # to its canonical email
+        for email in list(self.email_map):
+            seen = {email}
+            canonical_email = self.email_map[email]
+
+            while canonical_email in self.email_map and \
+                    canonical_email not in seen:
+                seen.add(canonical_email)
+                canonical_email = self.email_map[canonical_email]
+
+            self.email_map[email] = canonical_email
+
+    def canonical_email(self, email):
+        email = email.lower()
+        return self.email_map.get(email, email)
+
+    def id(self, email):
+        return super().id(self.canonical_email(email))
+
+    def get(self, email, default=None):
+        return super().get(self.canonical_email(email), default)
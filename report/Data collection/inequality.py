@@ -0,0 +1,160 @@
+"""
+Gini index of the contributions of the contributors of many projects.
+
+The contributions of all the projects are kept in a single flat array,
+like the rows of a CSR matrix: the contributions of the i-th project are
+values[offsets[i]:offsets[i + 1]]. The indexes of all the projects are
+then computed with a single sort and a few reductions, instead of one
+NumPy call for each project.
+
+For the projects with too many contributors to be kept in memory,
+StreamingGini computes the same index from the values given a chunk at a
+time, keeping only how many times each distinct value was seen.
+
+The index is the one of the sorted values x_1 <= ... <= x_n
+
+    G = sum((2 * i - n - 1) * x_i) / (n * sum(x_i))
+
+which is 0 when all the values are equal (also when they are all 0) and
+tends to 1 when a single contributor made all the contributions. The
+values must not be negative.
+"""
+
+from collections import Counter
+import numpy as np
+
+
+def gini_indexes(values, offsets):
+    """
+    Returns an array with the Gini index of the values of each segment,
+    where the values of the i-th segment are between offsets[i]
+    (included) and offsets[i + 1] (excluded). The index of the empty
+    segments is NaN
+    """
+    values = np.asarray(values, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+    n_segments = len(lengths)
+
+    if len(values) and values.min() < 0:
+        raise ValueError("The values of the Gini index cannot be negative")
+
+    # Index of the segment of each value
+    segment_ids = np.repeat(np.arange(n_segments), lengths)
+
+    # Sort the values within each segment (the segments keep their order)
+    values = values[np.lexsort((values, segment_ids))]
+
+    # Rank of each value in its segment, from 1
+    ranks = np.arange(1, len(values) + 1) - offsets[:-1][segment_ids]
+    weights = 2 * ranks - lengths[segment_ids] - 1
+
+    numerators = np.bincount(segment_ids, weights=weights * values,
+                             minlength=n_segments)
+    denominators = lengths * np.bincount(segment_ids, weights=values,
+                                         minlength=n_segments)
+
+    indexes = np.full(n_segments, np.nan)
+    nonempty = lengths > 0
+    indexes[nonempty] = 0.0
+
+    # If all the values of a segment are 0, they are all equal
+    np.divide(numerators, denominators, out=indexes,
+              where=denominators > 0)
+
+    return indexes
+
+
+def gini_index(values):
+    """
+    Returns the Gini index of a sequence of values (NaN if it's empty)
+    """
+    return gini_indexes(values, [0, len(values)])[0]
+
+
+def concatenate(segments):
+    """
+    Returns the (values, offsets) arrays of the given segments, each of
+    them a sequence of values
+    """
+    lengths = []
+    values = []
+    for segment in segments:
+        lengths.append(len(segment))
+        values.extend(segment)
+
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+
+    return np.array(values, dtype=np.float64), offsets
+
+
+class StreamingGini(object):
+    """
+    Gini index of values given one at a time or in chunks, in any order.
+
+    Only the number of occurrences of each distinct value is kept, so the
+    memory used depends on the number of distinct values (which is small
+    for the number of contributions of the contributors of a project)
+    and not on the number of values. With integer values the index is
+    computed exactly, with a single division at the end
+    """
+
+    def __init__(self, values=()):
+        self.frequencies = Counter()
+        self.update(values)
+
+    def add(self, value):
+        """
+        Adds a single value
+        """
+        if value < 0:
+            raise ValueError("The values of the Gini index cannot be "
+                             "negative")
+        self.frequencies[value] += 1
+
+    def update(self, values):
+        """
+        Adds a chunk of values (any iterable or NumPy array)
+        """
+        values = np.asarray(values).ravel()
+        if not len(values):
+            return
+
+        if values.min() < 0:
+            raise ValueError("The values of the Gini index cannot be "
+                             "negative")
+
+        distinct_values, counts = np.unique(values, return_counts=True)
+        for value, count in zip(distinct_values.tolist(), counts.tolist()):
+            self.frequencies[value] += count
+
+    def __len__(self):
+        return sum(self.frequencies.values())
+
+    def gini(self):
+        """
+        Returns the Gini index of all the values added so far (NaN if no
+        value was added)
+        """
+        n = len(self)
+        if n == 0:
+            return float('nan')
+
+        # The f occurrences of a value v after the c smaller values have
+        # the ranks c + 1, ..., c + f, so they add to the numerator
+        # v * (2 * (f * c + f * (f + 1) / 2) - f * (n + 1))
+        numerator = 0
+        total = 0
+        preceding = 0
+        for value in sorted(self.frequencies):
+            frequency = self.frequencies[value]
+            numerator += value * frequency * (
+                2 * preceding + frequency - n)
+            total += value * frequency
+            preceding += frequency
+
+        if total == 0:
+            return 0.0
+
+        return numerator / (n * total)
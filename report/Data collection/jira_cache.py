@@ -0,0 +1,209 @@
+"""
+Persistent on-disk cache of the JIRA responses, stored in a SQLite
+database: the issues returned by each search (with their key, id and
+type) and the development information (the fixing commits) of each issue.
+
+Resolved issues almost never change, so after the first run a search only
+asks JIRA for the issues updated since the last synchronization of that
+search, and the development information is downloaded again only for
+those issues.
+"""
+
+import json
+import asyncio
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+# Fields that are always requested to JIRA, since they are stored
+# in the cache together with the issues
+cached_fields = ('issuetype', 'updated')
+
+# JQL dates have a precision of minutes and are in the timezone of the
+# JIRA server, so the issues updated in the day before the last
+# synchronization are requested again
+sync_margin = timedelta(days=1)
+
+schema = '''
+CREATE TABLE IF NOT EXISTS issues (
+    key TEXT PRIMARY KEY,
+    id TEXT NOT NULL,
+    issue_type TEXT,
+    updated TEXT,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS queries (
+    query TEXT PRIMARY KEY,
+    last_sync TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS query_issues (
+    query TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (query, key)
+);
+CREATE TABLE IF NOT EXISTS dev_statuses (
+    issue_id TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+'''
+
+
+class JiraCache(object):
+    """
+    SQLite database with the cached JIRA responses
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(schema)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def query_id(jql, fields):
+        return json.dumps([jql, sorted(fields)])
+
+    def last_sync(self, query):
+        """
+        Returns the time of the last synchronization of the query,
+        or None if the query was never run
+        """
+        row = self.db.execute('SELECT last_sync FROM queries WHERE query = ?',
+                              (query,)).fetchone()
+        return None if row is None else datetime.fromisoformat(row[0])
+
+    def store_search(self, query, issues, sync_time, full):
+        """
+        Stores the issues returned by a query. With full=True the issues
+        are all the results of the query, otherwise they are added to the
+        ones already stored
+        """
+        with self.db:
+            if full:
+                self.db.execute('DELETE FROM query_issues WHERE query = ?',
+                                (query,))
+
+            self.db.executemany(
+                'INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?, ?)',
+                ((issue['key'], issue['id'],
+                  issue['fields']['issuetype']['name'],
+                  issue['fields']['updated'],
+                  json.dumps(issue))
+                 for issue in issues))
+            self.db.executemany(
+                'INSERT OR IGNORE INTO query_issues VALUES (?, ?)',
+                ((query, issue['key']) for issue in issues))
+            self.db.execute('INSERT OR REPLACE INTO queries VALUES (?, ?)',
+                            (query, sync_time.isoformat()))
+
+    def search_results(self, query):
+        """
+        Returns the issues stored for the query, ordered by id
+        """
+        return [json.loads(data) for data, in self.db.execute(
+            'SELECT data FROM issues JOIN query_issues USING (key) '
+            'WHERE query = ? ORDER BY CAST(id AS INTEGER)', (query,))]
+
+    def issue_type(self, key):
+        """
+        Returns the type of the issue (e.g. "Bug"),
+        or None if the issue is not in the cache
+        """
+        row = self.db.execute('SELECT issue_type FROM issues WHERE key = ?',
+                              (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def dev_status(self, issue_id):
+        row = self.db.execute(
+            'SELECT data FROM dev_statuses WHERE issue_id = ?',
+            (issue_id,)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def put_dev_status(self, issue_id, dev_status):
+        with self.db:
+            self.db.execute('INSERT OR REPLACE INTO dev_statuses '
+                            'VALUES (?, ?)',
+                            (issue_id, json.dumps(dev_status)))
+
+
+class CachedJira(object):
+    """
+    Wrapper of a JiraClient answering the requests from a JiraCache.
+
+    With refresh='incremental' each search only asks JIRA for the issues
+    updated since its last synchronization, with refresh='full' all the
+    issues are requested again, and with refresh='none' JIRA is not
+    contacted for the searches already in the cache.
+
+    Issues that stop matching a search after being cached (e.g. their
+    type is changed) are removed only by a full refresh. Since linking a
+    commit doesn't always update an issue, a full refresh also downloads
+    again the development information of all the issues
+    """
+
+    def __init__(self, jira, cache, refresh='incremental'):
+        self.jira = jira
+        self.cache = cache
+        self.refresh = refresh
+
+        # Issues whose development information has to be downloaded
+        # again, since they were updated after they were cached
+        self._updated_ids = set()
+
+    async def search(self, jql, fields=('key',)):
+        """
+        Returns all the issues matching the JQL query, like
+        JiraClient.search
+        """
+        fields = sorted(set(fields) | set(cached_fields))
+        query = self.cache.query_id(jql, fields)
+        last_sync = self.cache.last_sync(query)
+        sync_time = datetime.now(timezone.utc)
+
+        if last_sync is None or self.refresh == 'full':
+            issues = await self.jira.search(jql, fields)
+            self.cache.store_search(query, issues, sync_time, full=True)
+        elif self.refresh == 'incremental':
+            since = (last_sync - sync_margin).strftime('%Y-%m-%d')
+            issues = await self.jira.search(
+                '({}) AND updated >= "{}"'.format(jql, since), fields)
+            self.cache.store_search(query, issues, sync_time, full=False)
+        else:
+            issues = []
+
+        if last_sync is not None:
+            self._updated_ids.update(issue['id'] for issue in issues)
+
+        return self.cache.search_results(query)
+
+    async def dev_status(self, issue_id):
+        """
+        Returns the development information of an issue,
+        like JiraClient.dev_status
+        """
+        dev_status = None
+        if self.refresh != 'full' and issue_id not in self._updated_ids:
+            dev_status = self.cache.dev_status(issue_id)
+
+        if dev_status is None:
+            dev_status = await self.jira.dev_status(issue_id)
+            self.cache.put_dev_status(issue_id, dev_status)
+            self._updated_ids.discard(issue_id)
+
+        return dev_status
+
+    async def dev_status_all(self, issue_ids):
+        """
+        Returns the development information of all the issues,
+        in the same order
+        """
+        return await asyncio.gather(*(self.dev_status(issue_id)
+                                      for issue_id in issue_ids))
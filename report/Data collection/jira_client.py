@@ -0,0 +1,238 @@
+"""
+Asynchronous client of the JIRA REST API, used to retrieve the bugs of a
+project and the commits attached to them.
+
+Since JIRA rate limits its users, all the requests go through a token
+bucket, and at most a given number of requests are in flight at the same
+time, over a pool of keep-alive connections. Failed requests (connection
+errors, rate limiting and server errors) are retried after an exponential
+backoff with jitter, capped to a maximum delay.
+
+The base URL of the JIRA instance can be changed, for example to point
+the client to a local stub server.
+"""
+
+import time
+import fcntl
+import random
+import asyncio
+import aiohttp
+
+# Statuses of the responses that are worth retrying
+retry_statuses = {429, 500, 502, 503, 504}
+
+
+class JiraError(Exception):
+    """
+    Raised when a request to JIRA fails, and cannot (or can no more)
+    be retried
+    """
+
+
+class TokenBucket(object):
+    """
+    Rate limiter allowing rate requests per second on average,
+    with bursts of at most capacity requests
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """
+        Waits until a request can be made
+        """
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens +
+                                   (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class SharedTokenBucket(object):
+    """
+    Token bucket shared by several processes (e.g. the analyses of
+    different projects run at the same time), whose state is stored
+    in a file locked at each request
+    """
+
+    def __init__(self, path, rate, capacity=None):
+        self.path = path
+        self.rate = rate
+        self.capacity = capacity or max(1, rate)
+        # The requests of this process wait for the tokens one at a time
+        self._lock = asyncio.Lock()
+
+    def _take(self):
+        """
+        Takes a token if available, otherwise returns the
+        seconds to wait before trying again
+        """
+        with open(self.path, 'a+') as state:
+            fcntl.flock(state, fcntl.LOCK_EX)
+
+            now = time.time()
+            state.seek(0)
+            try:
+                tokens, updated = map(float, state.read().split())
+            except ValueError:
+                tokens, updated = self.capacity, now
+
+            tokens = min(self.capacity,
+                         tokens + max(0, now - updated) * self.rate)
+
+            wait = 0 if tokens >= 1 else (1 - tokens) / self.rate
+            if wait == 0:
+                tokens -= 1
+
+            state.seek(0)
+            state.truncate()
+            state.write('{} {}'.format(tokens, now))
+
+        return wait
+
+    async def acquire(self):
+        """
+        Waits until a request can be made
+        """
+        async with self._lock:
+            while True:
+                wait = self._take()
+                if wait == 0:
+                    return
+
+                await asyncio.sleep(wait)
+
+
+class JiraClient(object):
+    """
+    Client of a JIRA instance, to be used as an async context manager:
+
+        async with JiraClient() as jira:
+            issues = await jira.search('project = LUCENE')
+    """
+
+    def __init__(self, base_url='https://issues.apache.org/jira',
+                 requests_per_second=5, concurrency=8, max_retries=10,
+                 backoff_base=1, backoff_cap=60, timeout=60,
+                 rate_limiter=None):
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or TokenBucket(requests_per_second)
+
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._session.close()
+        self._session = None
+
+    def _backoff(self, attempt):
+        """
+        Returns the delay before the given retry, chosen at random up to
+        an exponentially growing (but capped) value
+        """
+        return random.uniform(
+            0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    async def request(self, method, path, **kwargs):
+        """
+        Makes a request to the API and returns the decoded JSON response,
+        retrying it if it fails. The keyword arguments are passed to
+        aiohttp (e.g. params and json)
+        """
+        url = self.base_url + path
+
+        for attempt in range(self.max_retries + 1):
+            delay = None
+            await self.rate_limiter.acquire()
+
+            async with self._semaphore:
+                try:
+                    async with self._session.request(method, url,
+                                                     **kwargs) as response:
+                        if response.status in retry_statuses:
+                            error = 'HTTP {}'.format(response.status)
+                            retry_after = response.headers.get('Retry-After')
+                            if retry_after and retry_after.isdigit():
+                                delay = min(self.backoff_cap,
+                                            int(retry_after))
+                        elif response.status >= 400:
+                            raise JiraError('{} {} failed with HTTP {}'.format(
+                                method, url, response.status))
+                        else:
+                            return await response.json(content_type=None)
+                except (aiohttp.ClientError, asyncio.TimeoutError,
+                        ValueError) as e:
+                    error = repr(e)
+
+            if attempt < self.max_retries:
+                await asyncio.sleep(delay if delay is not None
+                                    else self._backoff(attempt))
+
+        raise JiraError('{} {} failed after {} attempts: {}'.format(
+            method, url, self.max_retries + 1, error))
+
+    async def search(self, jql, fields=('key',)):
+        """
+        Returns all the issues matching the JQL query. After the first page
+        of results, which tells how many issues there are, all the other
+        pages are requested in parallel
+        """
+        async def get_page(start_at):
+            return await self.request('POST', '/rest/api/2/search',
+                                      json={'jql': jql,
+                                            'fields': list(fields),
+                                            'startAt': start_at})
+
+        first_page = await get_page(0)
+        max_results, total = first_page['maxResults'], first_page['total']
+
+        pages = [first_page]
+        if max_results > 0:
+            pages += await asyncio.gather(
+                *(get_page(start_at)
+                  for start_at in range(max_results, total, max_results)))
+
+        return [issue for page in pages for issue in page['issues']]
+
+    async def dev_status(self, issue_id):
+        """
+        Returns the development information (the repositories and
+        the commits) attached to an issue
+        """
+        return await self.request(
+            'GET', '/rest/dev-status/1.0/issue/detail',
+            params={'issueId': issue_id,
+                    'applicationType': 'fecru',
+                    'dataType': 'repository'})
+
+    async def dev_status_all(self, issue_ids):
+        """
+        Returns the development information of all the issues,
+        in the same order
+        """
+        return await asyncio.gather(*(self.dev_status(issue_id)
+                                      for issue_id in issue_ids))
@@ -0,0 +1,161 @@
+"""
+Ownership metrics of many files at once.
+
+The contributions to all the files are kept in a single sparse segmented
+structure, like the rows of a CSR matrix: the contributors of the i-th
+file are author_ids[offsets[i]:offsets[i + 1]], and the lines (or the
+commits) of each of them are in counts at the same positions. The metrics
+of all the files are then computed with a few NumPy operations, instead
+of going through a Counter for each file.
+"""
+
+from array import array
+import numpy as np
+
+# A contributor is minor if their share of the lines (or of the commits)
+# of the file is at most this one, and major otherwise
+minor_threshold = 0.05
+
+
+class Contributions(object):
+    """
+    Contributors of many files, each of them with its count. The files
+    are added one after another, and the order of the contributors of a
+    file matters: among the ones with the most lines, the first one is
+    the best contributor (like max on the keys of a Counter)
+    """
+
+    def __init__(self):
+        self.lengths = array('q')
+        self.author_ids = array('q')
+        self.counts = array('q')
+
+    @classmethod
+    def from_counters(cls, counters):
+        """
+        Builds the contributions from a Counter of the contributors of
+        each file
+        """
+        contributions = cls()
+        for counter in counters:
+            contributions.add_counter(counter)
+
+        return contributions
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def add(self, author_ids, counts):
+        """
+        Adds a file with the given contributors (distinct integer ids)
+        and their counts
+        """
+        n_counts = len(self.counts)
+        self.author_ids.extend(author_ids)
+        self.counts.extend(counts)
+        self.lengths.append(len(self.counts) - n_counts)
+
+    def add_counter(self, counter):
+        """
+        Adds a file with the contributors of the given Counter
+        """
+        self.add(counter.keys(), counter.values())
+
+    def arrays(self):
+        """
+        Returns the (offsets, author_ids, counts) NumPy arrays, where the
+        contributors of the i-th file are between offsets[i] (included)
+        and offsets[i + 1] (excluded)
+        """
+        offsets = np.zeros(len(self.lengths) + 1, dtype=np.int64)
+        np.cumsum(np.frombuffer(self.lengths, dtype=np.int64),
+                  out=offsets[1:])
+
+        return (offsets,
+                np.frombuffer(self.author_ids, dtype=np.int64),
+                np.frombuffer(self.counts, dtype=np.int64))
+
+
+def compute_ownership(contributions, commit_authors=None):
+    """
+    Computes the ownership metrics of all the files of the Contributions,
+    returning a dictionary with an array of one value for each file:
+    - total_contributors: number of contributors of the file
+    - minor_contributors: contributors with at most 5% of the count
+    - major_contributors: contributors with more than 5% of the count
+    - ownership_best_contributor: share of the best contributor
+    - best_contributor: id of the best contributor (the first one
+      with the highest count)
+
+    If the id of the author of the commit of each file is given, also:
+    - commit_author_ratio: share of the author of the commit
+      (0 if the author is not a contributor)
+    - commit_author_is_best_contributor: True if the author of the
+      commit is the best contributor
+
+    The shares are computed like count / total in Python, so they are
+    exactly the same. The files without contributors have all the
+    metrics set to 0 (best_contributor to -1 and the flag to False)
+    """
+    offsets, author_ids, counts = contributions.arrays()
+    n_files = len(contributions)
+    lengths = np.diff(offsets)
+    nonempty = lengths > 0
+
+    # Index of the file of each contributor
+    file_ids = np.repeat(np.arange(n_files), lengths)
+
+    # The counts are integers, so their sum is exact as a float as long
+    # as it's below 2^53, and the divisions are rounded like in Python
+    totals = np.bincount(file_ids, weights=counts, minlength=n_files)
+    shares = counts / totals[file_ids]
+
+    minor_contributors = np.bincount(file_ids[shares <= minor_threshold],
+                                     minlength=n_files)
+
+    # The contributors of the empty files take no room, so each file
+    # ends where the next non-empty one starts
+    max_counts = np.zeros(n_files, dtype=np.int64)
+    if len(counts):
+        max_counts[nonempty] = np.maximum.reduceat(counts,
+                                                   offsets[:-1][nonempty])
+
+    # The best contributor is the first one of the file with the
+    # highest count
+    max_positions = np.flatnonzero(counts == max_counts[file_ids])
+    first_max = np.ones(len(max_positions), dtype=np.bool_)
+    first_max[1:] = file_ids[max_positions[1:]] != \
+        file_ids[max_positions[:-1]]
+    max_positions = max_positions[first_max]
+
+    best_contributor = np.full(n_files, -1, dtype=np.int64)
+    best_contributor[file_ids[max_positions]] = author_ids[max_positions]
+
+    ownership = np.zeros(n_files)
+    np.divide(max_counts, totals, out=ownership, where=nonempty)
+
+    metrics = {
+        'total_contributors': lengths,
+        'minor_contributors': minor_contributors,
+        'major_contributors': lengths - minor_contributors,
+        'ownership_best_contributor': ownership,
+        'best_contributor': best_contributor
+    }
+
+    if commit_authors is not None:
+        commit_authors = np.asarray(commit_authors, dtype=np.int64)
+
+        # Each author appears at most once among the contributors of a file
+        is_author = author_ids == commit_authors[file_ids]
+        author_counts = np.bincount(file_ids[is_author],
+                                    weights=counts[is_author],
+                                    minlength=n_files)
+
+        author_ratio = np.zeros(n_files)
+        np.divide(author_counts, totals, out=author_ratio, where=nonempty)
+
+        metrics['commit_author_ratio'] = author_ratio
+        metrics['commit_author_is_best_contributor'] = \
+            best_contributor == commit_authors
+
+    return metrics
@@ -0,0 +1,79 @@
+"""
+Index used to find the releases in whose development time
+a timestamp falls, with a binary search over the release boundaries
+"""
+
+from bisect import bisect_left
+
+
+class ReleaseIndex(object):
+    """
+    Given the (release, start_date, end_date) of each release, finds
+    the releases for which start_date < timestamp < end_date.
+
+    Release intervals can overlap (e.g. when the tags are not ordered by
+    date), so the timeline is split at every start and end date: each
+    boundary and each segment between two consecutive boundaries has the
+    list of releases that contain it
+    """
+
+    def __init__(self, intervals):
+        intervals = list(intervals)
+
+        self.boundaries = sorted(set(date for _, start_date, end_date
+                                     in intervals
+                                     for date in (start_date, end_date)))
+
+        # Releases containing each boundary (excluded, since the intervals
+        # are open) and each segment between boundary i and boundary i+1
+        self.boundary_releases = [
+            tuple(release for release, start_date, end_date in intervals
+                  if start_date < boundary < end_date)
+            for boundary in self.boundaries]
+        self.segment_releases = [
+            tuple(release for release, start_date, end_date in intervals
+                  if start_date <= lower and upper <= end_date)
+            for lower, upper in zip(self.boundaries, self.boundaries[1:])]
+
+    def find(self, timestamp):
+        """
+        Returns the tuple of releases whose development
+        time contains the timestamp
+        """
+        index = bisect_left(self.boundaries, timestamp)
+
+        if index < len(self.boundaries) and \
+                self.boundaries[index] == timestamp:
+            return self.boundary_releases[index]
+
+        if 0 < index < len(self.boundaries):
+            return self.segment_releases[index - 1]
+
+        return ()
+
+    def find_all(self, timestamps):
+        """
+        Returns, for each timestamp of the given sequence,
+        the tuple of releases whose development time contains it.
+
+        The timestamps are sorted and matched with the boundaries in a
+        single sweep, instead of searching each of them separately
+        """
+        results = [()] * len(timestamps)
+        order = sorted(range(len(timestamps)), key=timestamps.__getitem__)
+        index = 0
+
+        for position in order:
+            timestamp = timestamps[position]
+
+            while index < len(self.boundaries) and \
+                    self.boundaries[index] < timestamp:
+                index += 1
+
+            if index < len(self.boundaries) and \
+                    self.boundaries[index] == timestamp:
+                results[position] = self.boundary_releases[index]
+            elif 0 < index < len(self.boundaries):
+                results[position] = self.segment_releases[index - 1]
+
+        return results
@@ -0,0 +1,135 @@
+"""
+Columnar store of the metrics of the files of a release.
+
+Instead of a dictionary for each file, each metric is a NumPy array with
+one element per file of the release, and each file is identified by its
+index in the list of files. The metrics are written in bulk, giving the
+paths of the files and the values, and the CSV file of the release is
+written streaming from the arrays (or in a typed columnar format, see
+columnar_output).
+"""
+
+import sys
+import csv
+import numpy as np
+
+# Columns of the store with their types, in the order of the CSV files
+column_types = [
+    ('comm', np.int32),
+    ('adev', np.int32),
+    ('ddev', np.int32),
+    ('add', np.float64),
+    ('del', np.float64),
+    ('own', np.float64),
+    ('minor', np.int32),
+    ('buggy', np.bool_),
+    ('bug_discovered_after_next_release', np.bool_)
+]
+
+# Fields of the output files, in order
+output_fields = [('file_name', str)] + column_types
+
+# Rows of the output formatted at a time
+block_size = 65536
+
+
+class ReleaseMetrics(object):
+    """
+    Metrics of the given files of a release, all initialized to 0 (False
+    for buggy and bug_discovered_after_next_release). The columns are
+    accessed by name:
+
+        metrics['comm'][metrics.file_ids[path]]
+    """
+
+    def __init__(self, files):
+        # The same paths appear in many releases, so they are interned
+        # to store each of them only once
+        self.files = [sys.intern(file) for file in files]
+        self.file_ids = {file: file_id
+                         for file_id, file in enumerate(self.files)}
+        self.columns = {name: np.zeros(len(self.files), dtype=dtype)
+                        for name, dtype in column_types}
+
+    def __len__(self):
+        return len(self.files)
+
+    def __contains__(self, file):
+        return file in self.file_ids
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def __setitem__(self, column, values):
+        self.columns[column][:] = values
+
+    def ids(self, files):
+        """
+        Returns the array of the ids of the files, where the
+        files that are not in the release have id -1
+        """
+        file_ids = self.file_ids
+        return np.fromiter((file_ids.get(file, -1) for file in files),
+                           dtype=np.intp)
+
+    def _known(self, files, values):
+        """
+        Returns the ids of the files that are in the release
+        and the corresponding values
+        """
+        ids = self.ids(files)
+        known = ids >= 0
+        values = np.asarray(values)
+
+        return ids[known], values[known] if values.ndim else values
+
+    def set(self, column, files, values):
+        """
+        Sets the metric of the files to the values (a sequence parallel to
+        files, or a single value for all of them), ignoring the files that
+        are not in the release
+        """
+        ids, values = self._known(files, values)
+        self.columns[column][ids] = values
+
+    def add(self, column, files, values):
+        """
+        Adds the values to the metric of the files, like set. A file can
+        appear more than once, in which case all its values are added
+        """
+        ids, values = self._known(files, values)
+        np.add.at(self.columns[column], ids, values)
+
+    def write_csv(self, path):
+        """
+        Writes the metrics of all the files to a CSV file, with
+        the file_name column first
+        """
+        with open(path, 'w', newline='') as csvf:
+            writer = csv.writer(csvf, delimiter=',')
+            writer.writerow(['file_name'] + [name for name, _ in column_types])
+
+            for start in range(0, len(self.files), block_size):
+                end = start + block_size
+
+                block = [self.files[start:end]]
+                for name, dtype in column_types:
+                    values = self.columns[name][start:end].tolist()
+                    if dtype == np.float64:
+                        values = ['%.6f' % value for value in values]
+                    block.append(values)
+
+                writer.writerows(zip(*block))
+
+    def write(self, writer):
+        """
+        Writes the metrics of all the files with a ColumnarWriter
+        whose fields are output_fields, keeping their types
+        """
+        for start in range(0, len(self.files), block_size):
+            end = start + block_size
+
+            columns = {name: self.columns[name][start:end]
+                       for name, _ in column_types}
+            columns['file_name'] = self.files[start:end]
+            writer.write_columns(columns)
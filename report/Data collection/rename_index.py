@@ -0,0 +1,165 @@
+"""
+Index of the renames of the files, built from a single walk over the
+history, used to find all the paths that a file had in the past without
+running "git log --follow" on each file.
+
+Like "git log --follow", the renames are followed along the order of the
+log (newest commits first). When the paths of a file are requested as of
+a given commit, only the commits reachable from it are considered.
+"""
+
+import sys
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from git_history import iter_name_status_commits
+
+
+class RenameIndex(object):
+    """
+    Index of the commits of the history and of the files changed and
+    renamed by each of them, given by iter_name_status_commits.
+
+    The commits are identified by their position in the log, starting
+    from 0 for the newest one, so that the commits older than a given
+    one have higher positions
+    """
+
+    def __init__(self, commits):
+        # (commit_hash, author_email, commit_time) of each commit
+        self.log = []
+        self.positions = {}
+        self.parents = []
+
+        # Positions of the commits that changed each path, and positions
+        # and old paths of the commits that renamed a file to each path
+        self.changes = defaultdict(list)
+        self.rename_positions = defaultdict(list)
+        self.rename_sources = defaultdict(list)
+
+        self._ancestors = {}
+
+        for commit_hash, parent_hashes, author_email, commit_time, \
+                changes in commits:
+            position = len(self.log)
+            self.log.append((commit_hash, sys.intern(author_email),
+                             commit_time))
+            self.positions[commit_hash] = position
+            self.parents.append(parent_hashes)
+
+            for status, old_path, path in changes:
+                self.changes[sys.intern(path)].append(position)
+
+                # A rename also removes the file with the old path
+                if status == 'R':
+                    self.changes[sys.intern(old_path)].append(position)
+                    self.rename_positions[path].append(position)
+                    self.rename_sources[path].append(old_path)
+
+    @classmethod
+    def from_repo(cls, repo_path, *revisions):
+        """
+        Builds the index of the history reachable from the revisions
+        of the repository (by default HEAD) with a single "git log"
+        """
+        return cls(iter_name_status_commits(repo_path, '-M',
+                                            *(revisions or ('HEAD',))))
+
+    def ancestors(self, commit):
+        """
+        Returns the set of the positions of the commits reachable
+        from the given one (included)
+        """
+        if commit in self._ancestors:
+            return self._ancestors[commit]
+
+        ancestors = set()
+        to_visit = [self.positions[commit]]
+
+        while to_visit:
+            position = to_visit.pop()
+            if position in ancestors:
+                continue
+
+            ancestors.add(position)
+            to_visit.extend(self.positions[parent_hash]
+                            for parent_hash in self.parents[position]
+                            if parent_hash in self.positions)
+
+        # Only the ancestors of the last commit are kept, since the
+        # paths of many files are usually requested for the same commit
+        self._ancestors = {commit: ancestors}
+
+        return ancestors
+
+    def history(self, path, commit=None):
+        """
+        Returns the paths of the file as of the given commit, from the
+        newest to the oldest, as a list of (path, first_position,
+        last_position) tuples with the positions of the commits in which
+        the file had that path, and the set of the positions of the
+        commits reachable from the given one.
+
+        The commit must be in the index. Without a commit the paths
+        are followed from the newest commit along the whole log, and
+        the set of the reachable commits is None
+        """
+        if commit is None:
+            position, ancestors = 0, None
+        else:
+            position, ancestors = self.positions[commit], \
+                self.ancestors(commit)
+
+        last_position = len(self.log) - 1
+        segments = []
+
+        # The positions always increase, so renames that form a cycle
+        # (e.g. A to B and then back to A) are followed correctly
+        while True:
+            rename_positions = self.rename_positions.get(path, ())
+            index = bisect_left(rename_positions, position)
+
+            # (skipping the renames made in other branches)
+            if ancestors is not None:
+                while index < len(rename_positions) and \
+                        rename_positions[index] not in ancestors:
+                    index += 1
+
+            if index == len(rename_positions):
+                segments.append((path, position, last_position))
+                break
+
+            # The file got this path with a rename, so before that
+            # commit it had the old path
+            segments.append((path, position, rename_positions[index]))
+            path = self.rename_sources[path][index]
+            position = rename_positions[index] + 1
+
+        return segments, ancestors
+
+    def paths(self, path, commit=None):
+        """
+        Returns all the distinct paths that the file had as of the given
+        commit, starting from the given one
+        """
+        segments, _ = self.history(path, commit)
+        return list(dict.fromkeys(old_path for old_path, _, _ in segments))
+
+    def file_commits(self, path, commit=None):
+        """
+        Returns the (commit_hash, author_email, commit_time) of the
+        commits that changed the file as of the given commit (included),
+        following its renames, from the newest to the oldest
+        """
+        segments, ancestors = self.history(path, commit)
+        commits = []
+
+        for segment_path, first_position, last_position in segments:
+            positions = self.changes.get(segment_path, ())
+
+            commits.extend(
+                self.log[position] for position in positions[
+                    bisect_left(positions, first_position):
+                    bisect_right(positions, last_position)]
+                if ancestors is None or position in ancestors)
+
+        return commits
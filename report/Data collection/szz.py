@@ -0,0 +1,195 @@
+"""
+SZZ labeling of the commits: the commits that fixed a bug are recognized
+from their messages, and the lines that they removed are blamed to find
+the commits that introduced the bug.
+
+A commit fixed a post release bug if its message mentions a JIRA issue
+that is a bug, and a bug found during development if it mentions one of
+the usual keywords (error, bug, fix, ...). The patterns are compiled once
+for all the commits, and the issues of the bugs are kept in a set.
+"""
+
+import re
+import threading
+import subprocess
+from collections import defaultdict
+from git_history import parse_hunk_header
+
+# Words that mark the message of a commit that fixed a bug
+default_bug_keywords = ('error', 'bug', 'fix', 'issue', 'mistake',
+                        'incorrect', 'fault', 'defect', 'flaw', 'typo')
+
+
+class BugFixClassifier(object):
+    """
+    Classifies the commits by their message, given the prefixes of the
+    JIRA projects (e.g. ['LUCENE', 'SOLR']), the keys of the issues that
+    are bugs and the keywords of the fixes.
+
+    Like "re.search", only the first issue key of a message is considered,
+    and the keywords are matched anywhere in the message, case sensitive
+    """
+
+    def __init__(self, jira_keys, bug_issue_keys,
+                 keywords=default_bug_keywords):
+        self.bug_issue_keys = frozenset(bug_issue_keys)
+        self.issue_pattern = re.compile(r'(?:{})-\d+'.format(
+            '|'.join(re.escape(jira_key) for jira_key in jira_keys)))
+        self.keyword_pattern = re.compile(
+            '|'.join(re.escape(keyword) for keyword in keywords))
+
+    def classify(self, message):
+        """
+        Returns a (post_release_bugs, dev_time_bugs) pair for the commit
+        with the given message, where at most one of them is 1
+        """
+        issue_match = self.issue_pattern.search(message)
+
+        if issue_match and issue_match.group() in self.bug_issue_keys:
+            return 1, 0
+
+        # if there's no issue of a bug in the message, we look for a keyword
+        if self.keyword_pattern.search(message):
+            return 0, 1
+
+        return 0, 0
+
+    def fixes(self, commits, key=lambda commit: commit):
+        """
+        Yields a (commit, post_release_bugs, dev_time_bugs) tuple for each
+        of the commits that fixed a bug, where key gives the message of
+        a commit
+        """
+        for commit in commits:
+            post_release_bugs, dev_time_bugs = self.classify(key(commit))
+
+            if post_release_bugs or dev_time_bugs:
+                yield commit, post_release_bugs, dev_time_bugs
+
+
+def resolve_commits(repo_path, revisions):
+    """
+    Returns a dictionary mapping each of the revisions to the hash of its
+    commit, using a single "git cat-file --batch-check". The revisions
+    that don't exist in the repository are left out
+    """
+    revisions = list(revisions)
+    request = ''.join('{}^{{commit}}\n'.format(revision)
+                      for revision in revisions)
+
+    output = subprocess.run(
+        ('git', 'cat-file', '--batch-check=%(objectname)'), cwd=repo_path,
+        input=request.encode('utf-8'), stdout=subprocess.PIPE,
+        check=True).stdout.decode('utf-8', 'surrogateescape')
+
+    # Each line is the hash of the commit or "<revision> missing"
+    return {revision: line
+            for revision, line in zip(revisions, output.splitlines())
+            if len(line) == 40 and ' ' not in line}
+
+
+def read_removed_lines(repo_path, commit_files, *pathspecs):
+    """
+    Returns a dictionary mapping each of the given (commit, path) pairs to
+    the (start_line, end_line) ranges, both included, of the lines that the
+    commit removed from the file with respect to its first parent. The
+    pairs with no removed lines are left out, and so are the merges, like
+    in the diff of "git show --unified=0 <commit> -- <path>".
+
+    The diffs of all the commits are read with a single
+    "git diff-tree --stdin", optionally limited to the given pathspecs,
+    and only the hunks of the requested files are kept
+    """
+    paths_of_commit = defaultdict(set)
+    for commit, path in commit_files:
+        paths_of_commit[commit].add(path)
+
+    # diff-tree reads only full hashes, so the revisions are resolved
+    # first, and the same commit can be requested with different names
+    revisions_of_hash = defaultdict(list)
+    for revision, commit_hash in resolve_commits(repo_path,
+                                                 paths_of_commit).items():
+        revisions_of_hash[commit_hash].append(revision)
+
+    process = subprocess.Popen(
+        ('git', '-c', 'core.quotePath=false', 'diff-tree', '--stdin',
+         '--root', '-r', '-p', '--unified=0', '--no-color', '--') + pathspecs,
+        cwd=repo_path, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+    # The hashes are written by another thread, since git writes the
+    # diffs while it reads them and would block on a full pipe
+    def write_hashes():
+        with process.stdin:
+            for commit_hash in revisions_of_hash:
+                process.stdin.write(commit_hash.encode('ascii') + b'\n')
+
+    writer = threading.Thread(target=write_hashes)
+    writer.start()
+
+    removed_lines = {}
+    requested_paths, revisions, line_ranges = set(), (), None
+    old_path = None
+
+    try:
+        for line in process.stdout:
+            line = line.decode('utf-8', 'surrogateescape').rstrip('\n')
+
+            if line.startswith('@@ '):
+                if line_ranges is not None:
+                    start_line, n_lines, _, _ = parse_hunk_header(line)
+                    if n_lines != 0:
+                        line_ranges.append((start_line,
+                                            start_line + n_lines - 1))
+            elif line.startswith(('-', '+', ' ', '\\')):
+                # The hunks of a file start after its "+++" line, so
+                # the lines of the diff can't be mistaken for headers
+                # (which end with a tab when the path has a space in it)
+                if line.startswith('--- ') and line_ranges is None:
+                    old_path = line[len('--- a/'):].rstrip('\t')
+                elif line.startswith('+++ ') and line_ranges is None:
+                    # New files have /dev/null as old path and deleted
+                    # files have /dev/null as new path
+                    path = old_path if line == '+++ /dev/null' \
+                        else line[len('+++ b/'):].rstrip('\t')
+
+                    # (the hunks of the files not requested are
+                    # collected in a list that is thrown away)
+                    line_ranges = []
+                    if path in requested_paths:
+                        for revision in revisions:
+                            removed_lines[(revision, path)] = line_ranges
+            elif line.startswith('diff --git '):
+                old_path, line_ranges = None, None
+            elif line in revisions_of_hash:
+                # Each diff starts with the hash of its commit
+                revisions = revisions_of_hash[line]
+                requested_paths = set().union(
+                    *(paths_of_commit[revision] for revision in revisions))
+                old_path, line_ranges = None, None
+    except BaseException:
+        # Also stop git (and the writer) if the parsing fails
+        process.kill()
+        raise
+    finally:
+        process.stdout.close()
+        writer.join()
+        process.wait()
+
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode,
+                                            process.args)
+
+    return {commit_file: line_ranges
+            for commit_file, line_ranges in removed_lines.items()
+            if line_ranges}
+
+
+def bug_introducing_lines(blame_cache, fix_commit, path, line_ranges):
+    """
+    Returns the BlameLine of each line of the file removed by the commit
+    that fixed a bug, given the (start_line, end_line) ranges of the
+    removed lines, as of the parent of the commit: the line was
+    introduced by line.commit, in the file that was called line.filename
+    """
+    return list(blame_cache.blame_lines(fix_commit + '^1', path,
+                                        line_ranges).lines())
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The modules of the scripts are imported from the parent directory, like
+# the scripts do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
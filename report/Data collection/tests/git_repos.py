@@ -0,0 +1,235 @@
+"""
+Temporary git repositories with a random history, used to check the
+results of the single-walk engines against the plain git commands that
+they replace.
+
+The histories have a few Java files edited by a few authors, side branches
+merged back (with conflicts resolved by combining both sides, and merges
+that change files on their own), renames and a file with a space in its
+name. The dates are fixed, so the same seed always gives the same
+repository.
+"""
+
+import os
+import random
+import subprocess
+
+# Authors of the commits, and the one of the merges
+authors = ('alice', 'bob', 'carol', 'dave')
+merge_author = 'erin'
+
+
+class GitRepo(object):
+    """
+    Git repository in a directory, built one commit at a time
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.time = 1400000000
+
+        os.makedirs(path, exist_ok=True)
+        self.git('init', '-q')
+        self.git('symbolic-ref', 'HEAD', 'refs/heads/main')
+
+    def git(self, *args, author='alice', check=True):
+        """
+        Runs git in the repository and returns its output, where author
+        is the author of the commits that it makes
+        """
+        email = '{}@example.com'.format(author)
+        date = '{} +0000'.format(self.time)
+
+        env = dict(os.environ,
+                   GIT_CONFIG_NOSYSTEM='1', GIT_CONFIG_GLOBAL=os.devnull,
+                   GIT_AUTHOR_NAME=author, GIT_AUTHOR_EMAIL=email,
+                   GIT_AUTHOR_DATE=date, GIT_COMMITTER_NAME='committer',
+                   GIT_COMMITTER_EMAIL='committer@example.com',
+                   GIT_COMMITTER_DATE=date)
+
+        process = subprocess.run(('git',) + args, cwd=self.path, env=env,
+                                 stdout=subprocess.PIPE,
+                                 stderr=subprocess.PIPE)
+        if check and process.returncode != 0:
+            raise subprocess.CalledProcessError(
+                process.returncode, process.args, process.stdout,
+                process.stderr)
+
+        return process.stdout.decode('utf-8')
+
+    def files(self):
+        """
+        Returns the paths of the files in the working tree
+        """
+        return sorted(
+            os.path.relpath(os.path.join(directory, name), self.path)
+            for directory, _, names in os.walk(self.path)
+            if '.git' not in os.path.relpath(directory, self.path).split(
+                os.sep)
+            for name in names)
+
+    def read(self, path):
+        with open(os.path.join(self.path, path)) as file:
+            return file.read().splitlines()
+
+    def write(self, path, lines):
+        full_path = os.path.join(self.path, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+        with open(full_path, 'w') as file:
+            file.write(''.join(line + '\n' for line in lines))
+
+    def remove(self, path):
+        os.remove(os.path.join(self.path, path))
+
+    def commit(self, author, message='change'):
+        """
+        Commits all the changes of the working tree, returning the hash
+        of the commit
+        """
+        self.time += 3600
+        self.git('add', '-A')
+        self.git('commit', '-q', '--allow-empty', '-m', message,
+                 author=author)
+        return self.git('rev-parse', 'HEAD').strip()
+
+    def head(self):
+        return self.git('rev-parse', 'HEAD').strip()
+
+
+class RandomHistory(object):
+    """
+    Builds a random history in a GitRepo, given the seed of the random
+    generator
+    """
+
+    def __init__(self, repo, seed):
+        self.repo = repo
+        self.random = random.Random(seed)
+        self.counter = 0
+
+    def new_line(self, prefix):
+        self.counter += 1
+        return '{}{}'.format(prefix, self.counter)
+
+    def edit(self, path):
+        """
+        Inserts, deletes or changes a few lines of the file
+        """
+        lines = self.repo.read(path)
+
+        for _ in range(self.random.randint(1, 3)):
+            index = self.random.randint(0, len(lines))
+            operation = self.random.random()
+
+            if operation < 0.4 or not lines:
+                lines.insert(index, self.new_line('line'))
+            elif operation < 0.7:
+                del lines[min(index, len(lines) - 1)]
+            else:
+                lines[min(index, len(lines) - 1)] = self.new_line('changed')
+
+        self.repo.write(path, lines)
+
+    def change(self, author, message='change'):
+        """
+        Makes a commit that edits, adds or renames a file
+        """
+        files = self.repo.files()
+        operation = self.random.random()
+
+        if operation < 0.05 or not files:
+            self.repo.write('src/New{}.java'.format(self.counter),
+                            [self.new_line('new') for _ in range(5)])
+            self.counter += 1
+        elif operation < 0.1:
+            path = self.random.choice(files)
+            new_path = 'src/Renamed{}.java'.format(self.counter)
+            self.counter += 1
+            self.repo.write(new_path, self.repo.read(path))
+            self.repo.remove(path)
+        else:
+            self.edit(self.random.choice(files))
+
+        return self.repo.commit(author, message)
+
+    def resolve_conflicts(self):
+        """
+        Resolves the conflicts of a merge by keeping the lines of both
+        sides, and a new line written by the author of the merge
+        """
+        conflicts = self.repo.git('diff', '--name-only', '-z',
+                                  '--diff-filter=U').split('\0')[:-1]
+
+        for path in conflicts:
+            sides = []
+            for stage in (2, 3):
+                content = self.repo.git('show', ':{}:{}'.format(stage, path),
+                                        check=False)
+                sides.append(content.splitlines())
+
+            ours, theirs = sides
+            lines = ours + [line for line in theirs if line not in ours]
+            lines.append(self.new_line('resolved'))
+            self.repo.write(path, lines)
+
+    def merge(self, branch):
+        """
+        Merges the branch into the current one, resolving the conflicts
+        and sometimes also changing another file in the merge itself
+        """
+        self.repo.time += 3600
+        result = self.repo.git('merge', '-q', '--no-ff', '--no-commit',
+                               branch, author=merge_author, check=False)
+
+        if 'CONFLICT' in result or self.repo.git('diff', '--name-only',
+                                                 '--diff-filter=U'):
+            self.resolve_conflicts()
+        elif self.random.random() < 0.3:
+            self.edit(self.random.choice(self.repo.files()))
+
+        self.repo.git('add', '-A')
+        self.repo.git('commit', '-q', '--no-edit', author=merge_author)
+
+    def build(self, n_commits=60, tag_every=10):
+        """
+        Makes the commits, tagging the history every tag_every commits,
+        and returns the list of the tags
+        """
+        repo = self.repo
+        repo.write('src/Main.java', [self.new_line('main') for _ in range(20)])
+        repo.write('src/Util.java', [self.new_line('util') for _ in range(10)])
+        repo.write('src/My File.java',
+                   [self.new_line('space') for _ in range(10)])
+        repo.commit('alice', 'initial commit')
+
+        tags = []
+
+        for index in range(n_commits):
+            if self.random.random() < 0.2:
+                branch = 'branch{}'.format(index)
+                repo.git('checkout', '-q', '-b', branch)
+                for _ in range(self.random.randint(1, 3)):
+                    self.change(self.random.choice(authors), 'side change')
+
+                repo.git('checkout', '-q', 'main')
+                self.change(self.random.choice(authors), 'main change')
+                self.merge(branch)
+            else:
+                self.change(self.random.choice(authors))
+
+            if index % tag_every == tag_every - 1:
+                tag = 'release{}'.format(len(tags) + 1)
+                repo.git('tag', tag)
+                tags.append(tag)
+
+        return tags
+
+
+def random_repo(path, seed, n_commits=60):
+    """
+    Returns a GitRepo with a random history and the list of its tags
+    """
+    repo = GitRepo(path)
+    tags = RandomHistory(repo, seed).build(n_commits)
+    return repo, tags
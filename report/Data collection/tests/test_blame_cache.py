@@ -0,0 +1,90 @@
+"""
+Checks of the blame cache used by the worker processes of the executor
+"""
+
+import os
+import pytest
+from git_repos import random_repo
+from blame_cache import BlameCache
+from git_executor import GitTaskExecutor
+
+# Cache used by the tasks, inherited by the forked workers like the one
+# of the scripts
+blame_cache = None
+
+
+def blame_file(revision, path):
+    return len(blame_cache.blame(revision, path))
+
+
+def disk_usage(cache_dir):
+    """
+    Returns the number and the total size of the entries on disk
+    """
+    sizes = [os.path.getsize(os.path.join(root, name))
+             for root, _, names in os.walk(cache_dir) for name in names]
+    return len(sizes), sum(sizes)
+
+
+@pytest.mark.parametrize('jobs', [1, 4])
+def test_shared_limit_and_stats(tmp_path, jobs):
+    global blame_cache
+
+    repo, tags = random_repo(str(tmp_path / 'repo'), seed=0)
+    cache_dir = str(tmp_path / 'cache')
+
+    tasks = [(tag, path) for tag in tags
+             for path in repo.git('ls-tree', '-r', '-z', '--name-only',
+                                  tag).split('\0')[:-1]]
+
+    # Find out how much room all the entries take
+    blame_cache = BlameCache(repo.path, cache_dir)
+    with GitTaskExecutor(jobs) as executor:
+        lengths = dict(executor.map(blame_file, tasks))
+    _, full_size = disk_usage(cache_dir)
+    assert blame_cache.stats()['misses'] == len(tasks)
+
+    # Then blame everything twice with room for a third of them
+    for root, _, names in os.walk(cache_dir):
+        for name in names:
+            os.remove(os.path.join(root, name))
+
+    blame_cache = BlameCache(repo.path, cache_dir, max_bytes=full_size // 3)
+    with GitTaskExecutor(jobs) as executor:
+        for _ in range(2):
+            assert dict(executor.map(blame_file, tasks)) == lengths
+
+    stats = blame_cache.stats()
+    n_entries, size = disk_usage(cache_dir)
+
+    assert stats['hits'] + stats['misses'] == 2 * len(tasks)
+    assert stats['evictions'] > 0
+    assert stats['entries'] == n_entries
+    assert stats['bytes'] == size <= full_size // 3
+
+
+def test_eviction_leaves_room(tmp_path, monkeypatch):
+    cache = BlameCache(str(tmp_path), str(tmp_path / 'cache'),
+                       max_bytes=100 * 1000)
+
+    # Count the walks of the cache directory
+    walks = []
+    entries = BlameCache._entries
+
+    def count_walks(self):
+        walks.append(None)
+        return entries(self)
+
+    monkeypatch.setattr(BlameCache, '_entries', count_walks)
+
+    # Once the cache is full, each eviction makes room for a tenth of it
+    for number in range(300):
+        cache._store(cache._entry_path('{:040x}'.format(number), 'File.java'),
+                     bytes(1000))
+
+    stats = cache.stats()
+    assert (stats['entries'], stats['bytes']) == \
+        disk_usage(str(tmp_path / 'cache'))
+    assert 90 <= stats['entries'] <= 100
+    assert stats['evictions'] == 300 - stats['entries']
+    assert len(walks) <= 25
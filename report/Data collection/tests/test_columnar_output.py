@@ -0,0 +1,109 @@
+"""
+Checks that the CSV files written by the scripts keep their format, and
+that the typed columnar formats hold the same rows
+"""
+
+import io
+import csv
+import gzip
+import numpy as np
+import pytest
+from release_metrics import ReleaseMetrics
+from columnar_output import ColumnarWriter, pyarrow, zstandard
+
+# Fields like the ones of assignment2, whose empty values are None
+fields = [('commit_hash', str), ('file_name', str), ('total', np.int32),
+          ('ownership', np.float64), ('owner', np.bool_)]
+
+rows = [
+    {'commit_hash': 'a' * 40, 'file_name': 'Main.java', 'total': 3,
+     'ownership': 0.5, 'owner': True},
+    {'commit_hash': 'b' * 40, 'file_name': 'My File, "quoted".java',
+     'total': None, 'ownership': None, 'owner': None},
+    {'commit_hash': 'c' * 40, 'file_name': 'Util.java', 'total': 0,
+     'ownership': 1 / 3, 'owner': False},
+]
+
+
+def test_release_csv_is_pinned(tmp_path):
+    metrics = ReleaseMetrics(['src/Main.java', 'src/My File, "quoted".java',
+                              'src/Util.java'])
+    metrics.set('comm', ['src/Main.java', 'src/Util.java'], [3, 1])
+    metrics.set('adev', ['src/Main.java', 'src/Util.java'], [2, 1])
+    metrics.set('ddev', ['src/Main.java', 'src/Util.java'], [4, 1])
+    metrics.set('add', ['src/Main.java'], [2 / 3])
+    metrics.set('del', ['src/Util.java'], [0.125])
+    metrics.set('own', ['src/Main.java'], [1 / 7])
+    metrics.set('minor', ['src/Main.java'], [1])
+    metrics.set('buggy', ['src/Util.java'], True)
+
+    path = str(tmp_path / 'release.csv')
+    metrics.write_csv(path)
+
+    # The per-release CSV files read by the R scripts
+    with open(path, 'rb') as file:
+        assert file.read() == (
+            b'file_name,comm,adev,ddev,add,del,own,minor,buggy,'
+            b'bug_discovered_after_next_release\r\n'
+            b'src/Main.java,3,2,4,0.666667,0.000000,0.142857,1,False,False\r\n'
+            b'"src/My File, ""quoted"".java",0,0,0,0.000000,0.000000,'
+            b'0.000000,0,False,False\r\n'
+            b'src/Util.java,1,1,1,0.000000,0.125000,0.000000,0,True,False\r\n')
+
+
+def test_csv_rows_match_dict_writer(tmp_path):
+    path = str(tmp_path / 'rows.csv')
+    with ColumnarWriter(path, fields, 'csv') as writer:
+        for row in rows:
+            writer.write_row(row)
+
+    # The rows as assignment2 used to write them, with '' for the empty
+    # values
+    expected = io.StringIO(newline='')
+    dict_writer = csv.DictWriter(expected, [name for name, _ in fields])
+    dict_writer.writeheader()
+    for row in rows:
+        dict_writer.writerow({name: '' if value is None else value
+                              for name, value in row.items()})
+
+    with open(path, newline='') as file:
+        assert file.read() == expected.getvalue()
+
+
+@pytest.mark.parametrize('file_format', ['csv.gz', 'csv.zst'])
+def test_compressed_csv_matches_csv(tmp_path, file_format):
+    if file_format == 'csv.zst' and zstandard is None:
+        pytest.skip('zstandard is not installed')
+
+    for name, current_format in (('rows.csv', 'csv'),
+                                 ('rows.' + file_format, file_format)):
+        with ColumnarWriter(str(tmp_path / name), fields,
+                            current_format) as writer:
+            writer.write_columns({name: [row[name] for row in rows]
+                                  for name, _ in fields})
+
+    if file_format == 'csv.gz':
+        with gzip.open(str(tmp_path / 'rows.csv.gz'), 'rb') as file:
+            compressed = file.read()
+    else:
+        with zstandard.open(str(tmp_path / 'rows.csv.zst'), 'rb') as file:
+            compressed = file.read()
+
+    with open(str(tmp_path / 'rows.csv'), 'rb') as file:
+        assert compressed == file.read()
+
+
+def test_parquet_keeps_the_types(tmp_path):
+    if pyarrow is None:
+        pytest.skip('pyarrow is not installed')
+
+    path = str(tmp_path / 'rows.parquet')
+    with ColumnarWriter(path, fields, 'parquet') as writer:
+        for row in rows:
+            writer.write_row(row)
+
+    table = pyarrow.parquet.read_table(path)
+
+    assert [str(field.type) for field in table.schema] == \
+        ['string', 'string', 'int32', 'double', 'bool']
+    assert table.to_pylist() == rows
@@ -0,0 +1,87 @@
+"""
+Checks of the streaming blame parser and of the forward blame engine
+against git blame
+"""
+
+import subprocess
+import pytest
+import sh
+import blame_cache
+from git_repos import random_repo
+from blame_cache import stream_line_porcelain
+from forward_blame import ForwardBlame
+
+
+def reference_blame(repo, revision, path):
+    """
+    Returns the (commit, line_number, author_email, author_time, filename)
+    tuples of git blame, parsed one line at a time, or None if the file
+    doesn't exist at the revision
+    """
+    try:
+        output = repo.git('blame', '--line-porcelain', revision, '--', path)
+    except subprocess.CalledProcessError:
+        return None
+
+    # The headers of each line come before its content
+    commit = line_number = author_email = author_time = filename = None
+
+    lines = []
+    for line in output.splitlines():
+        if line.startswith('\t'):
+            lines.append((commit, line_number, author_email, author_time,
+                          filename))
+        elif line.startswith('author-mail '):
+            author_email = line[len('author-mail '):].strip('<>')
+        elif line.startswith('author-time '):
+            author_time = int(line[len('author-time '):])
+        elif line.startswith('filename '):
+            filename = line[len('filename '):]
+        elif len(line.split()[0]) == 40 and len(line.split()) >= 3:
+            commit, _, line_number = line.split()[:3]
+            line_number = int(line_number)
+
+    return lines
+
+
+def repo_files(repo, revisions):
+    """
+    Returns all the paths that exist at any of the revisions
+    """
+    return sorted(set().union(*(
+        repo.git('ls-tree', '-r', '-z', '--name-only',
+                 revision).split('\0')[:-1]
+        for revision in revisions)))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+def test_streaming_parser(tmp_path, monkeypatch, chunk_size):
+    repo, _ = random_repo(str(tmp_path / 'repo'), seed=1, n_commits=20)
+    monkeypatch.setattr(blame_cache, 'chunk_size', chunk_size)
+
+    for path in repo_files(repo, ['HEAD']):
+        assert list(stream_line_porcelain(repo.path, 'HEAD', '--', path)) \
+            == reference_blame(repo, 'HEAD', path)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_forward_blame_matches_git_blame(tmp_path, seed):
+    repo, _ = random_repo(str(tmp_path / 'repo'), seed, n_commits=20)
+    git = sh.git.bake(_cwd=repo.path)
+
+    # The histories of these seeds have conflicting merges and renames
+    assert repo.git('log', '--merges', '-c', '--name-only', '--format=')
+    assert repo.git('log', '-M', '--diff-filter=R', '--format=%H')
+
+    commits = repo.git('rev-list', '--all').split()
+
+    for path in repo_files(repo, commits):
+        engine = ForwardBlame(git, path, commits)
+
+        for commit in commits:
+            result = engine.blame(commit)
+            lines = None if result is None else \
+                [tuple(line) for line in result.lines()]
+
+            assert lines == reference_blame(repo, commit, path), \
+                (commit, path)
@@ -0,0 +1,44 @@
+"""
+Checks of the repository backends against the git commands that they
+replace
+"""
+
+from datetime import datetime
+import pytest
+from git_repos import random_repo
+from git_backend import GitBackend, open_backend, pygit2
+
+kinds = ['cat-file'] + (['pygit2'] if pygit2 is not None else [])
+
+
+def test_backend_is_abstract():
+    with pytest.raises(TypeError):
+        GitBackend()
+
+
+@pytest.mark.parametrize('kind', kinds)
+def test_backend_matches_git(tmp_path, kind):
+    repo, tags = random_repo(str(tmp_path / 'repo'), seed=2, n_commits=30)
+    commits = repo.git('rev-list', '--all').split()
+
+    with open_backend(repo.path, kind) as backend:
+        for tag in tags:
+            assert backend.tag_date(tag) == datetime.strptime(
+                repo.git('log', '-1', '--format=%ai', 'tags/' + tag).strip(),
+                '%Y-%m-%d %H:%M:%S %z')
+            assert backend.list_files(tag) == repo.git(
+                'ls-tree', '--name-only', '-r', '-z', tag).split('\0')[:-1]
+
+        for commit in commits:
+            info = backend.commit_info(commit)
+            assert info['hash'] == commit
+            assert info['parents'] == repo.git(
+                'log', '-1', '--format=%P', commit).split()
+            assert info['author_email'] == repo.git(
+                'log', '-1', '--format=%ae', commit).strip()
+
+            # Abbreviated hashes are accepted too, like in assignment2
+            assert backend.changed_files(commit[:29]) == [
+                path for path in repo.git(
+                    'show', '-M', '--cc', '--name-only', '--pretty=',
+                    '-z', commit).split('\0') if path]
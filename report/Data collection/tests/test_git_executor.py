@@ -0,0 +1,40 @@
+"""
+Checks of the process pool of the git tasks
+"""
+
+import os
+from git_executor import GitTaskExecutor
+
+
+def square(number):
+    return number * number, os.getpid()
+
+
+def test_results_in_task_order():
+    tasks = [(number,) for number in range(50)]
+
+    with GitTaskExecutor(4, max_pending=3) as executor:
+        results = list(executor.map(square, tasks))
+
+    assert [task for task, _ in results] == tasks
+    assert [result for _, (result, _) in results] == \
+        [number * number for number in range(50)]
+
+    # The tasks ran in the workers, not in the main process
+    assert os.getpid() not in {pid for _, (_, pid) in results}
+
+
+def test_functions_defined_after_a_map():
+    global increment
+
+    with GitTaskExecutor(2) as executor:
+        assert [result for _, (result, _) in executor.map(
+            square, [(2,), (3,)])] == [4, 9]
+
+        # Like the task functions of the scripts defined after the
+        # first map, which the workers must know
+        def increment(number):
+            return number + 1
+
+        assert list(executor.map(increment, [(1,), (2,)])) == \
+            [((1,), 2), ((2,), 3)]
@@ -0,0 +1,162 @@
+"""
+Checks of the single-walk metrics of git_history against the git commands
+that they replace
+"""
+
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+import pytest
+import sh
+from git_repos import random_repo
+from git_history import compute_ddev, compute_release_changes
+from identities import AuthorTable
+
+
+def shortlog_ddev(repo, revision_range, path, authors=None):
+    """
+    Returns the DDEV of a file as it was computed with git shortlog, or,
+    given an AuthorTable, the number of distinct ids of the emails that
+    shortlog lists
+    """
+    lines = repo.git('--no-pager', 'shortlog', '-s', '--email',
+                     revision_range, '--', path).splitlines()
+
+    if authors is None:
+        return len(lines)
+
+    return len({authors.id(line.rsplit('<', 1)[1].rstrip('>'))
+                for line in lines})
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_ddev_matches_shortlog(tmp_path, seed):
+    repo, tags = random_repo(str(tmp_path / 'repo'), seed)
+
+    # The repositories must have merges that changed files with respect
+    # to all their parents (e.g. conflicts) for the check to be meaningful
+    assert repo.git('log', '--merges', '-c', '--name-only', '--format=')
+
+    git = sh.git.bake(_cwd=repo.path)
+    base = tags[0]
+    releases = tags[1:]
+
+    ddev = compute_ddev(git, releases, AuthorTable(), base=base)
+
+    for release in releases:
+        paths = repo.git('ls-tree', '-r', '-z', '--name-only',
+                         release).split('\0')[:-1]
+
+        for path in paths:
+            expected = shortlog_ddev(
+                repo, '{}..{}'.format(base, release), path)
+            assert ddev[release].get(path, 0) == expected, (release, path)
+
+
+def test_ddev_merges_aliases(tmp_path):
+    repo, tags = random_repo(str(tmp_path / 'repo'), seed=0)
+
+    # Bob also commits with another email, in upper case, which is his
+    # alias, and carol is an alias of alice
+    path = repo.files()[0]
+    repo.write(path, repo.read(path) + ['by bob'])
+    repo.time += 3600
+    repo.git('add', '-A')
+    repo.git('commit', '-q', '-m', 'change', '--author',
+             'Bob <Robert@Example.com>')
+    repo.git('tag', 'aliases')
+
+    authors = AuthorTable(aliases=[
+        ['bob@example.com', 'robert@example.com'],
+        ['alice@example.com', 'carol@example.com']])
+
+    git = sh.git.bake(_cwd=repo.path)
+    ddev = compute_ddev(git, tags + ['aliases'], authors, base=None)
+
+    for release in tags + ['aliases']:
+        for release_path in repo.git('ls-tree', '-r', '-z', '--name-only',
+                                     release).split('\0')[:-1]:
+            assert ddev[release].get(release_path, 0) == shortlog_ddev(
+                repo, release, release_path, authors), (release, release_path)
+
+    # Without the aliases, the new email would be a new developer
+    assert ddev['aliases'][path] < shortlog_ddev(repo, 'aliases', path)
+
+
+def log_changes(repo, start_date, end_date):
+    """
+    Returns the commits, the authors and the added and removed lines of
+    each file changed between the dates, as given by one "git log" of the
+    release like Project_Analysis.py used to run
+    """
+    output = repo.git('log', '--numstat', '-M', '-z', '--format=%x01%ae',
+                      '--after=@{}'.format(int(start_date.timestamp())),
+                      '--before=@{}'.format(int(end_date.timestamp())))
+
+    commits, authors = Counter(), defaultdict(set)
+    added_lines, removed_lines = Counter(), Counter()
+
+    for commit in output.split('\x01')[1:]:
+        author_email, *fields = commit.split('\0')
+        fields = iter(field.lstrip('\n') for field in fields)
+
+        for field in fields:
+            if not field:
+                continue
+
+            added, removed, path = field.split('\t', 2)
+            if not path:
+                # Renames are followed by the old and the new path
+                _, path = next(fields), next(fields)
+
+            commits[path] += 1
+            authors[path].add(author_email)
+            if added != '-':
+                added_lines[path] += int(added)
+                removed_lines[path] += int(removed)
+
+    return commits, authors, added_lines, removed_lines
+
+
+def tag_date(repo, tag):
+    return datetime.fromtimestamp(
+        int(repo.git('log', '-1', '--format=%ct', tag)), timezone.utc)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_release_changes_match_log(tmp_path, seed):
+    repo, tags = random_repo(str(tmp_path / 'repo'), seed)
+
+    # A binary file, which has no added and removed lines
+    with open(str(tmp_path / 'repo' / 'logo.png'), 'wb') as file:
+        file.write(bytes(range(256)))
+    repo.commit('bob', 'add the logo')
+    repo.git('tag', 'binary')
+    tags.append('binary')
+
+    dates = [tag_date(repo, tag) for tag in tags]
+    releases = list(zip(tags[1:], dates, dates[1:]))
+
+    # Overlapping releases, and one whose start and end are the same
+    releases.append(('whole', dates[0], dates[-1]))
+    releases.append(('single', dates[2], dates[2]))
+
+    authors = AuthorTable()
+    changes = compute_release_changes(repo.path, releases, authors)
+
+    assert changes['binary'].commits['logo.png'] == 1
+
+    for release, start_date, end_date in releases:
+        commits, emails, added_lines, removed_lines = log_changes(
+            repo, start_date, end_date)
+        release_changes = changes[release]
+
+        assert release_changes.commits == commits, release
+        assert release_changes.authors == {
+            path: {authors.id(email) for email in path_emails}
+            for path, path_emails in emails.items()}, release
+        assert release_changes.added_lines == added_lines, release
+        assert release_changes.removed_lines == removed_lines, release
+        assert release_changes.total_added_lines == \
+            sum(added_lines.values()), release
+        assert release_changes.total_removed_lines == \
+            sum(removed_lines.values()), release
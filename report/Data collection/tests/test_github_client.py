@@ -0,0 +1,212 @@
+"""
+Checks of the GitHub client against a local stub server with the rate
+limit of GitHub
+"""
+
+import time
+import random
+import asyncio
+from aiohttp import web
+from github_cache import GitHubCache
+from github_client import GitHubClient
+
+contributors_path = '/repos/{owner}/{name}/contributors'
+
+
+class StubGitHub(object):
+    """
+    Local GitHub server with the contributors of the given repositories
+    (a dictionary from "owner/name" to the list of their contributions),
+    paginated like GitHub. Missing repositories get 404, and the ones
+    without contributors 204.
+
+    Only window_size requests are allowed in each window of the rate limit
+    (the others are refused with 403), some of the responses fail with 502,
+    and the responses have an ETag to which unchanged pages answer with
+    304, without counting the request
+    """
+
+    def __init__(self, repos, window_size=15, window_length=1,
+                 failure_rate=0.1, seed=0):
+        self.repos = repos
+        self.window_size = window_size
+        self.window_length = window_length
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+
+        self.remaining = window_size
+        self.reset = int(time.time()) + window_length
+        self.requests = 0
+        self.refused = 0
+        self.not_modified = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.port = None
+        self._runner = None
+
+    def rate_limit_headers(self):
+        return {'X-RateLimit-Remaining': str(self.remaining),
+                'X-RateLimit-Reset': str(self.reset)}
+
+    async def contributors(self, request):
+        self.requests += 1
+        repo = '{owner}/{name}'.format(**request.match_info)
+        per_page = int(request.query.get('per_page', 30))
+        page = int(request.query.get('page', 1))
+        etag = '"{}-{}-{}"'.format(repo, per_page, page)
+
+        if request.headers.get('If-None-Match') == etag:
+            self.not_modified += 1
+            return web.Response(status=304,
+                                headers=self.rate_limit_headers())
+
+        if time.time() >= self.reset:
+            self.remaining = self.window_size
+            self.reset = int(time.time()) + self.window_length
+
+        if self.remaining == 0:
+            self.refused += 1
+            return web.Response(status=403,
+                                headers=self.rate_limit_headers())
+
+        self.remaining -= 1
+        headers = self.rate_limit_headers()
+
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.in_flight -= 1
+
+        if self.random.random() < self.failure_rate:
+            return web.Response(status=502, headers=headers)
+
+        if repo not in self.repos:
+            return web.Response(status=404, headers=headers)
+
+        contributions = self.repos[repo]
+        if not contributions:
+            return web.Response(status=204, headers=headers)
+
+        last_page = (len(contributions) + per_page - 1) // per_page
+        if last_page > 1:
+            url = request.url.with_query({})
+            links = []
+            if page < last_page:
+                links.append('<{}?per_page={}&page={}>; rel="next"'.format(
+                    url, per_page, page + 1))
+            links.append('<{}?per_page={}&page={}>; rel="last"'.format(
+                url, per_page, last_page))
+            headers['Link'] = ', '.join(links)
+
+        headers['ETag'] = etag
+        return web.json_response(
+            [{'contributions': number} for number in
+             contributions[(page - 1) * per_page:page * per_page]],
+            headers=headers)
+
+    async def start(self, port=0):
+        """
+        Starts the server on the port (by default a free one), returning
+        its base URL
+        """
+        app = web.Application()
+        app.router.add_get(contributors_path, self.contributors)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', port)
+        await site.start()
+
+        self.port = site._server.sockets[0].getsockname()[1]
+        return 'http://127.0.0.1:{}'.format(self.port)
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+def random_repos(n_repos=20, seed=0):
+    """
+    Returns the contributions of the contributors of random repositories,
+    with up to a few pages of 10 contributors
+    """
+    generator = random.Random(seed)
+    return {'owner/repo{}'.format(number): [
+        generator.randint(1, 500) for _ in range(
+            generator.choice([0, 1, 9, 10, 11, 25, 42]))]
+        for number in range(n_repos)}
+
+
+def fetch_all(stub, names, port=0, **options):
+    """
+    Returns the contributions of all the repositories, requested
+    concurrently from the stub server with a GitHubClient
+    """
+    options.setdefault('backoff_base', 0.01)
+
+    async def main():
+        base_url = await stub.start(port)
+        try:
+            async with GitHubClient(base_url=base_url, **options) as github:
+                return await asyncio.gather(
+                    *(github.contributions(name, per_page=10)
+                      for name in names))
+        finally:
+            await stub.stop()
+
+    return asyncio.run(main())
+
+
+def test_contributions_match_the_repositories():
+    repos = random_repos()
+    names = sorted(repos) + ['owner/missing']
+    stub = StubGitHub(repos)
+
+    results = fetch_all(stub, names, concurrency=4)
+
+    assert results == [repos[name] or None for name in sorted(repos)] + \
+        [None]
+    assert 1 < stub.max_in_flight <= 4
+
+    # The client waited for the resets of the rate limit instead of going
+    # over it
+    assert stub.requests > 2 * stub.window_size
+    assert stub.refused == 0
+
+
+def test_exhausted_rate_limit_is_retried():
+    repos = random_repos(5)
+    stub = StubGitHub(repos, failure_rate=0)
+
+    # The client doesn't know yet that no request is left
+    stub.remaining = 0
+
+    results = fetch_all(stub, sorted(repos))
+
+    assert results == [repos[name] or None for name in sorted(repos)]
+    assert stub.refused > 0
+
+
+def test_cached_responses_are_revalidated(tmp_path):
+    repos = random_repos()
+    cache_path = str(tmp_path / 'cache.sqlite')
+
+    # The URLs of the cache include the port of the server, which must
+    # then be the same
+    with GitHubCache(cache_path) as cache:
+        stub = StubGitHub(repos)
+        first = fetch_all(stub, sorted(repos), cache=cache)
+        port = stub.port
+
+    with GitHubCache(cache_path) as cache:
+        stub = StubGitHub(repos, window_size=3)
+        second = fetch_all(stub, sorted(repos), port=port, cache=cache)
+
+    assert first == second == [repos[name] or None for name in sorted(repos)]
+
+    # Every cached page is revalidated, with a 304 response that doesn't
+    # count against the rate limit, while the repositories without
+    # contributors (which are not cached) are requested again
+    assert stub.not_modified == sum(
+        (len(contributions) + 9) // 10 for contributions in repos.values())
+    assert stub.refused == 0
@@ -0,0 +1,187 @@
+"""
+Checks of the JIRA client against a local stub server
+"""
+
+import time
+import asyncio
+import pytest
+from aiohttp import web
+from jira_client import JiraClient, JiraError
+
+search_path = '/jira/rest/api/2/search'
+dev_status_path = '/jira/rest/dev-status/1.0/issue/detail'
+
+
+class StubJira(object):
+    """
+    Local JIRA server answering the requests with the responses given for
+    each path, one after another (the last one is then repeated). The
+    times of the requests and the number of concurrent requests are
+    recorded
+    """
+
+    def __init__(self, responses=None, delay=0.01):
+        self.responses = responses or {}
+        self.delay = delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._runner = None
+
+    async def handle(self, request):
+        self.requests.append((request.path, time.monotonic()))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        try:
+            await asyncio.sleep(self.delay)
+
+            responses = self.responses.get(request.path)
+            if responses:
+                response = responses.pop(0) if len(responses) > 1 \
+                    else responses[0]
+                if response is not None:
+                    return response()
+
+            if request.path == search_path:
+                return await self.search(request)
+            if request.path == dev_status_path:
+                return web.json_response(
+                    {'issueId': request.query['issueId']})
+            return web.Response(status=404)
+        finally:
+            self.in_flight -= 1
+
+    async def search(self, request, total=437, page_size=50):
+        start_at = (await request.json())['startAt']
+        return web.json_response({
+            'maxResults': page_size,
+            'total': total,
+            'issues': [{'key': 'X-{}'.format(number)} for number in
+                       range(start_at, min(total, start_at + page_size))]})
+
+    def count(self, path):
+        return sum(1 for request_path, _ in self.requests
+                   if request_path == path)
+
+    async def start(self):
+        """
+        Starts the server on a free port, returning its base URL
+        """
+        app = web.Application()
+        app.router.add_route('*', '/{path:.*}', self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+
+        port = site._server.sockets[0].getsockname()[1]
+        return 'http://127.0.0.1:{}/jira'.format(port)
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+def run_with_stub(stub, function, **options):
+    """
+    Runs function(jira) with a JiraClient of the stub server, returning
+    its result
+    """
+    options.setdefault('requests_per_second', 1000)
+    options.setdefault('backoff_base', 0.01)
+
+    async def main():
+        base_url = await stub.start()
+        try:
+            async with JiraClient(base_url, **options) as jira:
+                return await function(jira)
+        finally:
+            await stub.stop()
+
+    return asyncio.run(main())
+
+
+def error(status, **headers):
+    return lambda: web.Response(status=status, headers=headers)
+
+
+def test_retries_until_success():
+    stub = StubJira({dev_status_path: [error(429, **{'Retry-After': '0'}),
+                                       error(503), error(502), None]})
+
+    result = run_with_stub(stub, lambda jira: jira.dev_status('42'))
+
+    assert result == {'issueId': '42'}
+    assert stub.count(dev_status_path) == 4
+
+
+def test_waits_for_retry_after():
+    stub = StubJira({dev_status_path: [error(429, **{'Retry-After': '1'}),
+                                       None]})
+
+    result = run_with_stub(stub, lambda jira: jira.dev_status('42'))
+
+    assert result == {'issueId': '42'}
+    (_, first), (_, second) = stub.requests
+    assert second - first >= 1
+
+
+def test_retry_after_is_capped():
+    stub = StubJira({dev_status_path: [error(503, **{'Retry-After': '60'}),
+                                       None]})
+
+    start = time.monotonic()
+    run_with_stub(stub, lambda jira: jira.dev_status('42'), backoff_cap=0.1)
+
+    assert time.monotonic() - start < 5
+
+
+def test_gives_up_after_max_retries():
+    stub = StubJira({dev_status_path: [error(503)]})
+
+    with pytest.raises(JiraError):
+        run_with_stub(stub, lambda jira: jira.dev_status('42'),
+                      max_retries=3)
+
+    assert stub.count(dev_status_path) == 4
+
+
+def test_client_errors_are_not_retried():
+    stub = StubJira()
+
+    with pytest.raises(JiraError):
+        run_with_stub(stub, lambda jira: jira.request('GET', '/missing'))
+
+    assert len(stub.requests) == 1
+
+
+def test_search_pages_in_parallel():
+    # Some of the pages fail at first
+    stub = StubJira({search_path: [None, error(503), None, error(429),
+                                   None]})
+
+    issues = run_with_stub(stub, lambda jira: jira.search('project = X'),
+                           concurrency=4)
+
+    assert [issue['key'] for issue in issues] == \
+        ['X-{}'.format(number) for number in range(437)]
+    assert 1 < stub.max_in_flight <= 4
+
+
+def test_token_bucket_limits_the_rate():
+    stub = StubJira(delay=0)
+    rate, n_requests = 100, 150
+
+    results = run_with_stub(
+        stub, lambda jira: jira.dev_status_all(
+            [str(number) for number in range(n_requests)]),
+        requests_per_second=rate)
+
+    assert [result['issueId'] for result in results] == \
+        [str(number) for number in range(n_requests)]
+
+    # After a burst of rate requests, the others wait for the tokens
+    times = sorted(request_time for _, request_time in stub.requests)
+    assert times[-1] - times[0] >= (n_requests - rate) / rate * 0.9
+    assert max(sum(1 for other in times if start <= other < start + 0.5)
+               for start in times) <= rate + rate * 0.5 + 1
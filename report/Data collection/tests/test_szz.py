@@ -0,0 +1,60 @@
+"""
+Checks of the removed lines read by the SZZ algorithm against git show
+"""
+
+import re
+import pytest
+from git_repos import random_repo
+from szz import read_removed_lines
+
+hunk_header = re.compile(r'@@ -(\d+)(?:,(\d+))? ')
+
+
+def shown_removed_lines(repo, commit, path):
+    """
+    Returns the ranges of the lines removed from the file by the commit,
+    read from the hunk headers of "git show --unified=0"
+    """
+    output = repo.git('show', '--unified=0', '--no-renames', '--format=',
+                      commit, '--', path)
+
+    line_ranges = []
+    for line in output.splitlines():
+        match = hunk_header.match(line)
+        if match:
+            start_line = int(match.group(1))
+            n_lines = 1 if match.group(2) is None else int(match.group(2))
+            if n_lines != 0:
+                line_ranges.append((start_line, start_line + n_lines - 1))
+
+    return line_ranges
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_removed_lines_match_git_show(tmp_path, seed):
+    repo, _ = random_repo(str(tmp_path / 'repo'), seed, n_commits=30)
+
+    # Each commit with the files that exist before or after it, so the
+    # deleted and renamed files are requested too, as well as the merges
+    # (left out) and the same commit under two names
+    commit_files = []
+    for commit in repo.git('rev-list', '--all').split():
+        paths = set()
+        for revision in (commit, commit + '^@'):
+            for parent in repo.git('rev-parse', revision).split():
+                paths.update(repo.git('ls-tree', '-r', '-z', '--name-only',
+                                      parent).split('\0')[:-1])
+        for path in paths:
+            commit_files.append((commit, path))
+            commit_files.append((commit[:12], path))
+
+    removed_lines = read_removed_lines(repo.path, commit_files)
+
+    expected = {}
+    for commit, path in commit_files:
+        line_ranges = shown_removed_lines(repo, commit, path)
+        if line_ranges:
+            expected[(commit, path)] = line_ranges
+
+    assert removed_lines == expected
+    assert any(' ' in path for _, path in removed_lines)